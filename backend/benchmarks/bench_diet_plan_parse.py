@@ -0,0 +1,43 @@
+"""Cleaning up and parsing the model's diet plan answer.
+
+Run from this directory:
+    pytest bench_diet_plan_parse.py --benchmark-autosave
+"""
+import copy
+import json
+
+import pytest
+
+from routes.dietplan import get_fallback_diet_plan
+from utils.llm_output import DAY_NAMES, parse_diet_plan
+
+
+def make_answer(days: int, fenced: bool = True, trailing: bool = False) -> str:
+    """A plan answer the way the model writes it: a full week of meals, usually in a json code fence"""
+    plan = get_fallback_diet_plan(1800, "weight_loss")
+    plan.pop("shopping_list", None)
+    first_day = plan["weekly_plan"][0]
+    plan["weekly_plan"] = []
+    for day in range(days):
+        entry = copy.deepcopy(first_day)
+        entry["day"] = day + 1
+        entry["day_name"] = DAY_NAMES[day]
+        plan["weekly_plan"].append(entry)
+    text = json.dumps(plan, indent=2)
+    if trailing:
+        # A second object cut off at max_tokens after the plan; parsing trims back to the last closing brace
+        text += '\n{"notes": {"hydration": "Drink'
+    return f"```json\n{text}\n```" if fenced else text
+
+
+@pytest.mark.parametrize("case", ["plain", "fenced", "trailing", "padded"])
+def bench_parse_diet_plan(benchmark, case):
+    text = {
+        "plain": make_answer(7, fenced=False),
+        "fenced": make_answer(7),
+        "trailing": make_answer(7, trailing=True),
+        "padded": make_answer(3),
+    }[case]
+    benchmark.extra_info["characters"] = len(text)
+    plan = benchmark(parse_diet_plan, text)
+    assert len(plan["weekly_plan"]) == 7
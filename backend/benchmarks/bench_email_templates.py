@@ -0,0 +1,43 @@
+"""Rendering the HTML email templates sent on sign-up, contact and booking.
+
+Run from this directory:
+    pytest bench_email_templates.py --benchmark-autosave
+"""
+from datetime import datetime
+
+import pytest
+
+from utils.email_service import EmailService
+
+CONSULTATION = {
+    "dietitian_name": "Dr. Priya Singh",
+    "date": "2025-03-14",
+    "time": "10:30",
+    "method": "Video Call",
+    "price": "1500",
+    "booking_id": "65f0c2a1b4d3e2f1a0b9c8d7",
+}
+ADMIN_DATA = {
+    "full_name": "Asha Verma",
+    "email": "asha@example.com",
+    "phone": "+91 98765 43210",
+    "city": "Pune",
+    "state": "Maharashtra",
+    "user_id": 1042,
+    "timestamp": datetime(2025, 3, 14, 10, 30).isoformat(),
+}
+
+
+@pytest.mark.parametrize("template", ["contact_confirmation", "registration_welcome", "consultation_confirmation", "admin_notification"])
+def bench_email_template(benchmark, template):
+    service = EmailService()
+    render = {
+        "contact_confirmation": lambda: service._get_contact_confirmation_template(
+            "Asha Verma", "Question about my plan", "Can I swap lunch and dinner on training days?"
+        ),
+        "registration_welcome": lambda: service._get_registration_welcome_template("Asha Verma"),
+        "consultation_confirmation": lambda: service._get_consultation_confirmation_template("Asha Verma", CONSULTATION),
+        "admin_notification": lambda: service._get_admin_notification_template("New User Registration", ADMIN_DATA),
+    }[template]
+    benchmark.extra_info["characters"] = len(render())
+    benchmark(render)
@@ -0,0 +1,126 @@
+"""Weight analytics, weekly summary and weight log responses, the CPU work behind the goal tracker.
+
+Run from this directory:
+    pytest bench_goal_tracking.py --benchmark-autosave
+    pytest bench_goal_tracking.py --benchmark-compare   (against the last saved run)
+"""
+import asyncio
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from models.goal_tracking import WeightLogResponse, WeightTrendAnalytics
+from routes.goal_tracking import WEIGHT_LOGS_RESPONSE, router, weight_log_fields
+from utils.goal_analytics import weekly_summary, weight_trend_analytics
+
+
+def make_weight_logs(count: int, seed: int = 7):
+    """Weight logs as stored, oldest first, with a drifting weight so trends change direction"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, 7, 30)
+    weight = 82.0
+    logs = []
+    for i in range(count):
+        weight += rng.uniform(-0.6, 0.5)
+        logged_at = start + timedelta(hours=12 * i)
+        logs.append({
+            "_id": ObjectId(),
+            "user_id": 1,
+            "weight": round(weight, 1),
+            "bmi": round(weight / 1.78 ** 2, 1) if rng.random() < 0.8 else None,
+            "body_fat_percentage": round(rng.uniform(18, 30), 1) if rng.random() < 0.3 else None,
+            "muscle_mass": None,
+            "notes": "after run" if rng.random() < 0.1 else None,
+            "measurement_time": rng.choice(["morning", "evening"]),
+            "logged_at": logged_at,
+            "created_at": logged_at,
+        })
+    return logs
+
+
+def make_week(seed: int = 7):
+    """Seven goal_tracking documents with meals, water and a few workouts each"""
+    rng = random.Random(seed)
+    week = []
+    for day in range(7):
+        week.append({
+            "user_id": 1,
+            "tracking_date": (date(2025, 3, 3) + timedelta(days=day)).isoformat(),
+            "meals": [
+                {"meal_type": meal, "completed": rng.random() < 0.7, "calories": rng.randint(200, 800)}
+                for meal in ["breakfast", "lunch", "dinner", "snacks"]
+            ],
+            "water_intake": {"glasses": rng.randint(2, 10), "goal": 8} if day % 3 else None,
+            "weight_entry": {"weight": round(rng.uniform(70, 72), 1)} if day % 2 else None,
+            "exercises": [
+                {"exercise_name": "Run", "duration_minutes": rng.randint(10, 60), "calories_burned": rng.randint(80, 500)}
+                for _ in range(rng.randint(0, 3))
+            ],
+            "mood": rng.choice(["good", "okay", None]),
+        })
+    return week
+
+
+@pytest.mark.parametrize("count", [90, 1000])
+def bench_weight_trend_analytics(benchmark, count):
+    logs = make_weight_logs(count)
+    benchmark.extra_info["logs"] = count
+    benchmark(lambda: WeightTrendAnalytics(**weight_trend_analytics(logs, 90)))
+
+
+def bench_weekly_summary(benchmark):
+    week = make_week()
+    benchmark(weekly_summary, week)
+
+
+def weight_log_responses(logs):
+    """What GET /goal-tracking/weight-logs used to build from its query results"""
+    return [
+        WeightLogResponse(
+            id=str(log["_id"]),
+            user_id=log["user_id"],
+            weight=log["weight"],
+            bmi=log.get("bmi"),
+            body_fat_percentage=log.get("body_fat_percentage"),
+            muscle_mass=log.get("muscle_mass"),
+            notes=log.get("notes"),
+            measurement_time=log["measurement_time"],
+            logged_at=log["logged_at"],
+            created_at=log["created_at"]
+        )
+        for log in logs
+    ]
+
+
+def bench_build_weight_log_responses(benchmark):
+    logs = make_weight_logs(1000)
+    benchmark.extra_info["logs"] = 1000
+    benchmark(weight_log_responses, logs)
+
+
+def bench_weight_logs_body(benchmark):
+    """Query results to response body the default way: models, checked against response_model again, then json"""
+    logs = make_weight_logs(1000)
+    route = next(r for r in router.routes if r.path.endswith("/weight-logs"))
+    loop = asyncio.new_event_loop()
+
+    def body():
+        content = loop.run_until_complete(serialize_response(field=route.response_field, response_content=weight_log_responses(logs)))
+        return JSONResponse(content).body
+    benchmark.extra_info["logs"] = 1000
+    benchmark.extra_info["bytes"] = len(body())
+    benchmark(body)
+    loop.close()
+
+
+def bench_weight_logs_body_fast(benchmark):
+    """The same with FAST_RESPONSES: dicts validated and encoded once by the precompiled serializer"""
+    logs = make_weight_logs(1000)
+    body = lambda: WEIGHT_LOGS_RESPONSE.dump([weight_log_fields(log) for log in logs])
+    benchmark.extra_info["logs"] = 1000
+    benchmark.extra_info["bytes"] = len(body())
+    benchmark(body)
@@ -0,0 +1,63 @@
+"""Scalar vs NumPy-batched nutrition targets.
+
+Run from this directory:
+    pytest --benchmark-json=results/nutrition.json
+"""
+import random
+
+import pytest
+
+from utils.nutrition import calculate_targets, calculate_targets_batch, ACTIVITY_MULTIPLIERS
+
+GOALS = ["weight_loss", "weight_gain", "maintain", "muscle_gain", "general_health"]
+
+
+def make_profiles(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        {
+            "age": rng.randint(18, 80),
+            "gender": rng.choice(["male", "female"]),
+            "weight": rng.uniform(45, 140),
+            "height": rng.uniform(150, 200),
+            "activity_level": rng.choice(list(ACTIVITY_MULTIPLIERS)),
+            "primary_goal": rng.choice(GOALS),
+            "target_weight": rng.uniform(45, 140),
+        }
+        for _ in range(count)
+    ]
+
+
+def to_columns(profiles):
+    return {
+        "ages": [p["age"] for p in profiles],
+        "genders": [p["gender"] for p in profiles],
+        "weights": [p["weight"] for p in profiles],
+        "heights": [p["height"] for p in profiles],
+        "activity_levels": [p["activity_level"] for p in profiles],
+        "primary_goals": [p["primary_goal"] for p in profiles],
+        "target_weights": [p["target_weight"] for p in profiles],
+    }
+
+
+@pytest.mark.parametrize("count", [100, 10_000])
+def bench_scalar_targets(benchmark, count):
+    profiles = make_profiles(count)
+    benchmark.extra_info["profiles"] = count
+    benchmark(lambda: [calculate_targets(**p) for p in profiles])
+
+
+@pytest.mark.parametrize("count", [100, 10_000])
+def bench_batched_targets(benchmark, count):
+    columns = to_columns(make_profiles(count))
+    benchmark.extra_info["profiles"] = count
+    benchmark(calculate_targets_batch, **columns)
+
+
+def bench_batched_matches_scalar(benchmark):
+    profiles = make_profiles(500)
+    batch = benchmark.pedantic(calculate_targets_batch, kwargs=to_columns(profiles), rounds=1)
+    for i, profile in enumerate(profiles):
+        scalar = calculate_targets(**profile)
+        assert batch["daily_calories"][i] == scalar["daily_calories"]
+        assert batch["protein_grams"][i] == scalar["protein_grams"]
@@ -0,0 +1,54 @@
+"""Per-request cost of the request metrics middleware.
+
+Run from this directory:
+    pytest bench_request_metrics.py --benchmark-json=results/request_metrics.json
+
+Each round sends a batch of requests straight through the ASGI stack, without a server,
+so the difference between the two benchmarks divided by the batch size is the
+middleware's overhead per request.
+"""
+import asyncio
+
+import pytest
+from starlette.routing import Route
+
+from utils.request_metrics import RequestMetricsMiddleware
+
+BATCH = 1000
+PATHS = ["/health", "/api/goal-tracking/weight-logs", "/api/jobs/4f1c2a", "/api/dietplan/plans/65a1b2c3"]
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+ROUTES = [
+    Route(path, endpoint) for path in [
+        "/health", "/api/goal-tracking/weight-logs", "/api/jobs/metrics",
+        "/api/jobs/{job_id}", "/api/jobs/{job_id}/events", "/api/dietplan/plans/{plan_id}",
+    ]
+]
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def run_batch(app):
+    async def batch():
+        for i in range(BATCH):
+            scope = {"type": "http", "method": "GET", "path": PATHS[i % len(PATHS)]}
+            await app(scope, receive, send)
+    asyncio.run(batch())
+
+
+@pytest.mark.parametrize("app", ["bare", "metrics"])
+def bench_request_batch(benchmark, app):
+    asgi_app = endpoint if app == "bare" else RequestMetricsMiddleware(endpoint, routes=ROUTES)
+    benchmark.extra_info["requests_per_round"] = BATCH
+    benchmark(run_batch, asgi_app)
@@ -0,0 +1,77 @@
+"""Response bodies in each format and compression, for a seven-day diet plan and 1,000 weight logs.
+
+Run from this directory:
+    pytest bench_response_encoding.py --benchmark-autosave
+
+Each benchmark records the bytes it produces in extra_info, so the saved JSON has size on the
+wire next to encode CPU time.
+"""
+import copy
+
+import pytest
+
+from bench_goal_tracking import make_weight_logs
+from routes.dietplan import get_fallback_diet_plan
+from routes.goal_tracking import WEIGHT_LOGS_RESPONSE, weight_log_fields
+from utils.llm_output import DAY_NAMES
+from utils.recipe_index import get_recipe_catalogue
+from utils import response_encoding
+from utils.response_compression import compress
+from utils.response_encoding import JSON_MEDIA_TYPE, encode
+
+# Name -> (media type, FAST_RESPONSES)
+FORMATS = {
+    "json": (JSON_MEDIA_TYPE, False),
+    "orjson": (JSON_MEDIA_TYPE, True),
+    "msgpack": ("application/msgpack", False),
+    "cbor": ("application/cbor", False),
+}
+
+
+def make_week_plan():
+    """A seven-day plan like the model writes: the fallback day, with each meal swapped for a different similar recipe every day"""
+    catalogue = get_recipe_catalogue()
+    plan = get_fallback_diet_plan(1800, "weight_loss")
+    first_day = plan["weekly_plan"][0]
+    plan["weekly_plan"] = []
+    for day in range(7):
+        entry = copy.deepcopy(first_day)
+        entry["day"] = day + 1
+        entry["day_name"] = DAY_NAMES[day]
+        for slot, meal in entry["meals"].items():
+            swaps = catalogue.nearest(meal, k=7, meal_type=slot)
+            if swaps:
+                swap = swaps[day % len(swaps)]
+                meal.update({key: value for key, value in swap.items() if key in meal})
+        plan["weekly_plan"].append(entry)
+    return plan
+
+
+PAYLOADS = {
+    "diet_plan": make_week_plan,
+    "weight_logs": lambda: WEIGHT_LOGS_RESPONSE.adapter.dump_python(
+        WEIGHT_LOGS_RESPONSE.adapter.validate_python([weight_log_fields(log) for log in make_weight_logs(1000)]), mode="json"
+    ),
+}
+
+
+@pytest.mark.parametrize("fmt", list(FORMATS))
+@pytest.mark.parametrize("payload", list(PAYLOADS))
+def bench_encode(benchmark, monkeypatch, payload, fmt):
+    media_type, fast = FORMATS[fmt]
+    monkeypatch.setattr(response_encoding, "FAST_RESPONSES", fast)
+    data = PAYLOADS[payload]()
+    benchmark.extra_info["bytes"] = len(encode(data, media_type))
+    benchmark(encode, data, media_type)
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+@pytest.mark.parametrize("media_type", [JSON_MEDIA_TYPE, "application/msgpack"])
+@pytest.mark.parametrize("payload", list(PAYLOADS))
+def bench_compress(benchmark, payload, media_type, encoding):
+    body = encode(PAYLOADS[payload](), media_type)
+    json_bytes = len(encode(PAYLOADS[payload](), JSON_MEDIA_TYPE))
+    compressed = compress(body, encoding)
+    benchmark.extra_info["bytes"] = len(compressed)
+    benchmark.extra_info["ratio_to_json"] = round(json_bytes / len(compressed), 2)
+    benchmark(compress, body, encoding)
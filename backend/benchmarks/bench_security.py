@@ -0,0 +1,31 @@
+"""Password hashing and JWT handling on the login path.
+
+Run from this directory:
+    pytest bench_security.py --benchmark-autosave
+
+hash_password runs on the event loop thread during registration, so its time is time
+every other request on that worker waits.
+"""
+from datetime import timedelta
+
+from utils.security import create_access_token, hash_password, verify_password, verify_token
+
+PASSWORD = "Correct1Horse"
+
+
+def bench_hash_password(benchmark):
+    benchmark.pedantic(hash_password, args=(PASSWORD,), rounds=10, iterations=1)
+
+
+def bench_verify_password(benchmark):
+    hashed = hash_password(PASSWORD)
+    benchmark.pedantic(verify_password, args=(PASSWORD, hashed), rounds=10, iterations=1)
+
+
+def bench_create_access_token(benchmark):
+    benchmark(create_access_token, {"sub": "asha@example.com"}, timedelta(minutes=30))
+
+
+def bench_verify_token(benchmark):
+    token = create_access_token({"sub": "asha@example.com"}, timedelta(minutes=30))
+    assert benchmark(verify_token, token) == "asha@example.com"
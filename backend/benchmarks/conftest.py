@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Benchmarks import backend modules directly, the same way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that read these at import time refuse to load without them; nothing here connects anywhere
+for name, value in {
+    "MONGODB_URL": "mongodb://localhost:27017",
+    "GROQ_API_KEY": "bench",
+    "MAIL_USERNAME": "bench",
+    "MAIL_PASSWORD": "bench",
+    "MAIL_FROM": "bench@example.com",
+    "NOTIFICATION_EMAIL": "admin@example.com",
+}.items():
+    os.environ.setdefault(name, value)
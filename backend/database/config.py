@@ -3,6 +3,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 
+from utils.db_monitoring import command_listeners
+
 # Load environment variables
 load_dotenv()
 
@@ -16,7 +18,8 @@ client: AsyncIOMotorClient = None
 async def connect_to_mongo():
     """Connect to MongoDB"""
     global client
-    client = AsyncIOMotorClient(MONGODB_URL)
+    # Listeners attribute each command to the request that sent it; see utils/db_monitoring.py
+    client = AsyncIOMotorClient(MONGODB_URL, event_listeners=command_listeners())
     
 async def close_mongo_connection():
     """Close MongoDB connection"""
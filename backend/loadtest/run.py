@@ -0,0 +1,228 @@
+"""End-to-end load test: the API with local stand-ins for MongoDB, Groq and SMTP, driven by async virtual users.
+
+Usage (from the backend directory):
+    python loadtest/run.py [--users 20] [--duration 60] [--ramp 10] [--mongo mongomock|mongod]
+                           [--groq-latency-ms 300] [--groq-chunk-delay-ms 5]
+                           [--json results.json] [--save-baseline loadtest/baselines/smoke.json]
+                           [--baseline loadtest/baselines/smoke.json --tolerance 0.25]
+
+The harness starts tools/fake_groq.py, an SMTP sink (loadtest/smtp_sink.py) and the API
+(loadtest/serve_app.py) on free local ports. The API runs against mongomock-motor (smoke
+runs), a throwaway mongod started in a temporary directory (--mongo mongod), or a server
+you name with --mongo-url. That server's Diet database gets filled with load-test users,
+so never point it at real data. Use --app-url to load an API that is already running instead.
+
+Each user registers and logs in, then runs sessions weighted by --mix (dashboard, log_day,
+chat, plan, contact) with --think-ms pauses, until --duration is up. The report gives
+throughput, error rate and p50/p95/p99 latency per route. With --baseline, the run fails
+(exit code 1) if any route's p95/p99 grew by more than --tolerance or its error rate rose.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from loadtest.scenarios import DEFAULT_MIX, VirtualUser, parse_mix, run_user
+from loadtest.smtp_sink import start_sink
+from loadtest.stats import LoadStats, compare, format_report
+
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, process: subprocess.Popen, what: str, log_path: str):
+    deadline = time.time() + STARTUP_TIMEOUT_SECONDS
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{what} exited with code {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{what} did not start within {STARTUP_TIMEOUT_SECONDS}s; see {log_path}")
+
+
+def start_process(stack: ExitStack, args, log_dir: str, name: str, env=None) -> subprocess.Popen:
+    log_path = os.path.join(log_dir, f"{name}.log")
+    log = stack.enter_context(open(log_path, "w"))
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT, env=env)
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    stack.callback(stop)
+    return process
+
+
+def start_mongod(stack: ExitStack, log_dir: str) -> str:
+    mongod = shutil.which("mongod")
+    if not mongod:
+        raise SystemExit("mongod not found on PATH; install MongoDB or use --mongo mongomock")
+    db_path = stack.enter_context(tempfile.TemporaryDirectory(prefix="loadtest-mongod-"))
+    port = free_port()
+    process = start_process(stack, [mongod, "--dbpath", db_path, "--port", str(port), "--bind_ip", "127.0.0.1"], log_dir, "mongod")
+    deadline = time.time() + STARTUP_TIMEOUT_SECONDS
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"mongod exited with code {process.returncode}; see {log_dir}/mongod.log")
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return f"mongodb://127.0.0.1:{port}"
+        time.sleep(0.2)
+    raise SystemExit(f"mongod did not start within {STARTUP_TIMEOUT_SECONDS}s")
+
+
+def start_stack(stack: ExitStack, args, log_dir: str) -> str:
+    """Start the stand-ins and the API; returns the API's base URL"""
+    groq_port = free_port()
+    groq = start_process(stack, [
+        sys.executable, "tools/fake_groq.py", "--port", str(groq_port),
+        "--latency-ms", str(args.groq_latency_ms), "--chunk-delay-ms", str(args.groq_chunk_delay_ms),
+        "--error-rate", str(args.groq_error_rate), "--seed", str(args.seed),
+    ], log_dir, "fake_groq")
+    wait_for(f"http://127.0.0.1:{groq_port}/_fake/stats", groq, "Fake Groq", f"{log_dir}/fake_groq.log")
+
+    smtp_port = free_port()
+    controller, mail = start_sink(port=smtp_port)
+    stack.callback(lambda: print(f"SMTP sink received {mail.messages} messages"))
+    stack.callback(controller.stop)
+
+    app_args = [sys.executable, "loadtest/serve_app.py", "--port", str(free_port()), "--workers", str(args.workers)]
+    if args.mongo_url:
+        mongo_url = args.mongo_url
+    elif args.mongo == "mongod":
+        mongo_url = start_mongod(stack, log_dir)
+    else:
+        mongo_url = "mongodb://mongomock"
+        app_args.append("--mongomock")
+    env = {
+        **os.environ,
+        "MONGODB_URL": mongo_url,
+        "GROQ_API_KEY": "loadtest",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_STARTTLS": "false",
+        "MAIL_USERNAME": "loadtest",
+        "MAIL_PASSWORD": "loadtest",
+        "MAIL_FROM": "noreply@example.com",
+        "NOTIFICATION_EMAIL": "admin@example.com",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", uuid.uuid4().hex),
+    }
+    port = app_args[app_args.index("--port") + 1]
+    app = start_process(stack, app_args, log_dir, "api", env=env)
+    wait_for(f"http://127.0.0.1:{port}/health", app, "API", f"{log_dir}/api.log")
+    return f"http://127.0.0.1:{port}"
+
+
+async def drive(base_url: str, args) -> dict:
+    stats = LoadStats()
+    run_id = uuid.uuid4().hex[:8]
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        tasks = []
+        for index in range(args.users):
+            user = VirtualUser(client, stats, index, run_id, random.Random(rng.random()), args.plan_timeout)
+            tasks.append(asyncio.create_task(run_user(user, deadline, mix, args.think_ms / 1000)))
+            # Spread arrivals over the ramp so sign-ups do not all land at once
+            await asyncio.sleep(args.ramp / args.users)
+        await asyncio.gather(*tasks)
+        return stats.report(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after the first user starts")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which users arrive")
+    parser.add_argument("--think-ms", type=float, default=1000, help="mean pause between a user's sessions")
+    parser.add_argument("--mix", help='session weights, e.g. "dashboard=5,log_day=3,chat=2,plan=1"')
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--plan-timeout", type=float, default=300, help="give up polling a plan job after this many seconds")
+    parser.add_argument("--app-url", help="load an already running API instead of starting one")
+    parser.add_argument("--mongo", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongo-url", help="use this disposable MongoDB server instead")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--groq-latency-ms", type=float, default=300)
+    parser.add_argument("--groq-chunk-delay-ms", type=float, default=5, help="delay per streamed word, i.e. token rate")
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--log-dir", help="where stand-in and API logs go; a temporary directory by default")
+    parser.add_argument("--json", help="write the full report here")
+    parser.add_argument("--save-baseline", help="write the report here as the baseline for later runs")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95/p99 growth over the baseline")
+    args = parser.parse_args()
+
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="loadtest-")
+    os.makedirs(log_dir, exist_ok=True)
+    with ExitStack() as stack:
+        base_url = args.app_url or start_stack(stack, args, log_dir)
+        print(f"Loading {base_url} with {args.users} users for {args.duration:.0f}s (logs in {log_dir})")
+        report = asyncio.run(drive(base_url, args))
+
+    report["config"] = {
+        "users": args.users, "duration": args.duration, "ramp": args.ramp, "think_ms": args.think_ms,
+        "mix": parse_mix(args.mix) if args.mix else DEFAULT_MIX, "seed": args.seed,
+        "mongo": "url" if args.mongo_url else args.mongo, "workers": args.workers,
+        "groq_latency_ms": args.groq_latency_ms, "groq_chunk_delay_ms": args.groq_chunk_delay_ms,
+        "groq_error_rate": args.groq_error_rate,
+    }
+    report["environment"] = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+    }
+    print(format_report(report))
+
+    for path in filter(None, [args.json, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with different settings; comparing anyway")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""What each virtual user does: sign up and log in, then a weighted mix of realistic sessions."""
+import asyncio
+import random
+import time
+from typing import Dict, Any, Optional
+
+import httpx
+
+from loadtest.stats import LoadStats
+
+PASSWORD = "Loadtest123"
+CHAT_QUESTIONS = [
+    "How much protein should I eat to lose weight?",
+    "Is oatmeal a good breakfast for diabetics?",
+    "What are healthy snacks high in fiber?",
+    "How many glasses of water should I drink a day?",
+    "Which vegetables are rich in iron?",
+    "Is it okay to eat carbs at dinner when trying to lose fat?",
+]
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snacks"]
+JOB_POLL_SECONDS = 1.0
+JOB_TERMINAL_STATUSES = {"succeeded", "failed"}
+
+
+class VirtualUser:
+    """One simulated person with their own account, session token and chat session"""
+
+    def __init__(self, client: httpx.AsyncClient, stats: LoadStats, index: int, run_id: str, rng: random.Random,
+                 plan_timeout: float = 300):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.email = f"load-{run_id}-{index}@example.com"
+        # Registration rejects reused phone numbers too
+        self.phone = f"+1 {int(run_id, 16) % 10 ** 6:06d} {index:05d}"
+        self.weight = round(rng.uniform(55, 110), 1)
+        self.height = round(rng.uniform(150, 195), 1)
+        # The Authorization header added after login also keys this user's chat budget to their account
+        self.headers: Dict[str, str] = {}
+        self.chat_session: Optional[str] = None
+        self.plan_timeout = plan_timeout
+
+    async def call(self, name: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        """Send one request and record it under ``name``; connection failures count as errors with status 0"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(name, (time.perf_counter() - started) * 1000, 0, True)
+            return None
+        self.stats.record(name, (time.perf_counter() - started) * 1000, response.status_code, response.status_code >= 400)
+        return response
+
+    async def onboard(self) -> bool:
+        await self.call("POST /api/auth/register", "POST", "/api/auth/register", json={
+            "full_name": f"Load Tester {self.email.split('@')[0][-6:]}",
+            "email": self.email,
+            "phone": self.phone,
+            "date_of_birth": f"{self.rng.randint(1960, 2004)}-0{self.rng.randint(1, 9)}-1{self.rng.randint(0, 9)}",
+            "city": "Springfield",
+            "state": "Illinois",
+            "password": PASSWORD,
+        })
+        response = await self.call("POST /api/auth/login", "POST", "/api/auth/login", json={"email": self.email, "password": PASSWORD})
+        if response is None or response.status_code != 200:
+            return False
+        self.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        return True
+
+    async def dashboard(self):
+        """What the dashboard and goal tracker load when opened"""
+        await self.call("GET /api/profile/me", "GET", "/api/profile/me")
+        await self.call("GET /api/goal-tracking/today", "GET", "/api/goal-tracking/today")
+        await self.call("GET /api/goal-tracking/weight-logs", "GET", "/api/goal-tracking/weight-logs")
+        await self.call("GET /api/goal-tracking/weight-analytics", "GET", "/api/goal-tracking/weight-analytics")
+        await self.call("GET /api/goal-tracking/analytics", "GET", "/api/goal-tracking/analytics")
+        await self.call("GET /api/goal-tracking/weekly-summary", "GET", "/api/goal-tracking/weekly-summary")
+        await self.call("GET /api/dietplan/user-plans", "GET", "/api/dietplan/user-plans")
+        await self.call("GET /api/consultations/my-bookings", "GET", "/api/consultations/my-bookings")
+
+    async def log_day(self):
+        """Tick off a meal, water and exercise, and weigh in"""
+        await self.call("GET /api/goal-tracking/today", "GET", "/api/goal-tracking/today")
+        await self.call("PUT /api/goal-tracking/meal", "PUT", "/api/goal-tracking/meal", json={
+            "meal_type": self.rng.choice(MEAL_TYPES), "completed": True, "calories": self.rng.randint(250, 800),
+        })
+        await self.call("PUT /api/goal-tracking/water-intake", "PUT", "/api/goal-tracking/water-intake", json={
+            "glasses": self.rng.randint(1, 10), "goal": 8,
+        })
+        self.weight = round(self.weight + self.rng.uniform(-0.6, 0.5), 1)
+        await self.call("POST /api/goal-tracking/weight-log", "POST", "/api/goal-tracking/weight-log", json={
+            "weight": self.weight, "height": self.height, "measurement_time": "morning",
+        })
+        await self.call("POST /api/goal-tracking/exercise", "POST", "/api/goal-tracking/exercise", json={
+            "exercise_name": "Brisk walk", "duration_minutes": self.rng.randint(10, 60),
+            "calories_burned": self.rng.randint(50, 400), "exercise_type": "cardio", "intensity": "moderate",
+        })
+
+    async def plan(self):
+        """Queue a diet plan and poll until it is done, as the diet plan page does"""
+        started = time.perf_counter()
+        response = await self.call("POST /api/jobs", "POST", "/api/jobs", json={"type": "diet_plan", "payload": {
+            "age": self.rng.randint(20, 65),
+            "gender": self.rng.choice(["female", "male"]),
+            "weight": self.weight,
+            "height": self.height,
+            "activityLevel": self.rng.choice(["sedentary", "light", "moderate", "active"]),
+            "primaryGoal": self.rng.choice(["weight_loss", "maintain", "muscle_gain"]),
+            "allergies": self.rng.choice([[], [], ["nuts"], ["dairy"]]),
+            "dietaryPreferences": self.rng.choice([[], ["vegetarian"]]),
+        }})
+        if response is None or response.status_code != 202:
+            return
+        job_id = response.json()["job_id"]
+        status = None
+        while time.perf_counter() - started < self.plan_timeout:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            response = await self.call("GET /api/jobs/{job_id}", "GET", f"/api/jobs/{job_id}")
+            if response is not None and response.status_code == 200:
+                status = response.json()["status"]
+                if status in JOB_TERMINAL_STATUSES:
+                    break
+        # Submit to result as the user waits for it, kept apart from the HTTP routes
+        self.stats.record("JOB diet_plan", (time.perf_counter() - started) * 1000, 200, status != "succeeded")
+
+    async def chat(self):
+        """Ask the chatbot a question, continuing the same conversation"""
+        response = await self.call("POST /api/chatbot/nutrition-advice", "POST", "/api/chatbot/nutrition-advice", json={
+            "message": self.rng.choice(CHAT_QUESTIONS), "session_id": self.chat_session,
+        })
+        if response is not None and response.status_code == 200:
+            self.chat_session = response.json().get("session_id")
+
+    async def contact(self):
+        """Send the contact form, which mails both the user and the admin"""
+        await self.call("POST /api/contact/submit", "POST", "/api/contact/submit", json={
+            "name": "Load Tester", "email": self.email, "subject": "Question about my plan",
+            "message": "Can I swap lunch and dinner on training days?",
+        })
+
+
+# Session name -> relative weight in the mix
+DEFAULT_MIX = {"dashboard": 5, "log_day": 3, "chat": 2, "plan": 1, "contact": 0.2}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """"dashboard=5,chat=2" -> {"dashboard": 5.0, "chat": 2.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown session {name.strip()!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def run_user(user: VirtualUser, deadline: float, mix: Dict[str, float], think_seconds: float):
+    """Sign up, then run sessions picked by weight, pausing between them, until the deadline"""
+    if not await user.onboard():
+        return
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        session = user.rng.choices(names, weights)[0]
+        await getattr(user, session)()
+        await asyncio.sleep(think_seconds * user.rng.uniform(0.5, 1.5))
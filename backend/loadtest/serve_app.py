@@ -0,0 +1,52 @@
+"""Run the API for a load test, optionally on an in-memory MongoDB.
+
+Usage (from the backend directory; run.py normally starts this for you):
+    python loadtest/serve_app.py [--port 8200] [--mongomock] [--workers 1]
+
+Settings come from the environment as usual (MONGODB_URL, GROQ_BASE_URL, SMTP_SERVER, ...).
+With --mongomock the app talks to mongomock-motor instead of a server. That is enough for
+smoke runs, but the latencies it produces say nothing about a real mongod.
+"""
+import argparse
+import logging
+import os
+import sys
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def use_mongomock():
+    from mongomock_motor import AsyncMongoMockClient
+    import database.config as config
+
+    # One shared in-memory client; command listeners do not apply to it
+    mock_client = AsyncMongoMockClient()
+    config.AsyncIOMotorClient = lambda url, **kwargs: mock_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory MongoDB")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers; mongomock needs 1")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    os.chdir(BACKEND_DIR)
+    logging.basicConfig(level=args.log_level.upper())
+    if args.mongomock:
+        if args.workers != 1:
+            parser.error("--mongomock keeps data in one process; use --workers 1")
+        use_mongomock()
+        from main import app
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+    else:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
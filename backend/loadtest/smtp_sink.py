@@ -0,0 +1,63 @@
+"""SMTP server that accepts every message and keeps only a count, standing in for Gmail under load.
+
+Usage (from the backend directory; run.py normally starts this for you):
+    python loadtest/smtp_sink.py [--port 8025]
+
+Point the API at it with SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 SMTP_STARTTLS=false; any
+username and password are accepted.
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+
+class CountingHandler:
+    def __init__(self):
+        self.messages = 0
+        self.recipients: Counter = Counter()
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.messages += 1
+            self.recipients.update(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def accept_any_login(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def start_sink(host: str = "127.0.0.1", port: int = 8025):
+    """Start the sink on a background thread; returns (controller, handler)"""
+    handler = CountingHandler()
+    controller = Controller(
+        handler, hostname=host, port=port,
+        authenticator=accept_any_login, auth_require_tls=False, auth_exclude_mechanism=["CRAM-MD5"],
+    )
+    controller.start()
+    return controller, handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    controller, handler = start_sink(args.host, args.port)
+    print(f"SMTP sink listening on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"{handler.messages} messages received")
+    except KeyboardInterrupt:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
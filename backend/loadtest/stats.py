@@ -0,0 +1,108 @@
+"""Latency and error figures per route for a load-test run, and comparison against a baseline."""
+import math
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+# Latency regressions smaller than this are noise at load-test resolution
+MIN_REGRESSION_MS = 5.0
+ERROR_RATE_SLACK = 0.01
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "rps": round(count / seconds, 2) if seconds else None,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "mean_ms": round(sum(latencies) / count, 1) if count else None,
+            "p50_ms": _round(percentile(latencies, 50)),
+            "p95_ms": _round(percentile(latencies, 95)),
+            "p99_ms": _round(percentile(latencies, 99)),
+            "max_ms": _round(latencies[-1] if latencies else None),
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+class LoadStats:
+    """Every timed call of a run, by route name such as "GET /api/jobs/{job_id}" """
+
+    def __init__(self):
+        self.routes: Dict[str, RouteStats] = {}
+
+    def record(self, name: str, latency_ms: float, status: int, error: bool):
+        stats = self.routes.get(name)
+        if stats is None:
+            stats = self.routes[name] = RouteStats()
+        stats.latencies_ms.append(latency_ms)
+        stats.statuses[status] += 1
+        if error:
+            stats.errors += 1
+
+    def report(self, seconds: float) -> Dict[str, Any]:
+        total = RouteStats()
+        for stats in self.routes.values():
+            total.latencies_ms.extend(stats.latencies_ms)
+            total.statuses.update(stats.statuses)
+            total.errors += stats.errors
+        return {
+            "seconds": round(seconds, 1),
+            "total": total.summary(seconds),
+            "routes": {name: stats.summary(seconds) for name, stats in sorted(self.routes.items())},
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    header = f"{'route':<52} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}"
+    lines = [header, "-" * len(header)]
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for name, row in rows:
+        lines.append(
+            f"{name[:52]:<52} {row['requests']:>6} {row['rps'] or 0:>7.2f} {row['error_rate'] * 100:>6.1f} "
+            f"{_ms(row['p50_ms'])} {_ms(row['p95_ms'])} {_ms(row['p99_ms'])}"
+        )
+    return "\n".join(lines)
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Routes whose p95/p99 latency grew by more than ``tolerance`` (0.25 = 25%) or whose error rate rose"""
+    regressions = []
+    for name, base in baseline["routes"].items():
+        current = report["routes"].get(name)
+        if current is None or not current["requests"]:
+            regressions.append(f"{name}: no requests in this run (baseline had {base['requests']})")
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] is None or current[key] is None:
+                continue
+            limit = max(base[key] * (1 + tolerance), base[key] + MIN_REGRESSION_MS)
+            if current[key] > limit:
+                regressions.append(f"{name}: {key[:3]} {current[key]:.1f} ms vs baseline {base[key]:.1f} ms")
+        if current["error_rate"] > base["error_rate"] + ERROR_RATE_SLACK:
+            regressions.append(
+                f"{name}: error rate {current['error_rate'] * 100:.1f}% vs baseline {base['error_rate'] * 100:.1f}%"
+            )
+    return regressions
@@ -13,19 +13,36 @@ from routes.user_profile import router as user_profile_router  # Add this import
 from routes.goal_tracking import router as goal_tracking_router  # Add this import
 from routes.contact import router as contact_router  # Add this import
 from routes.chatbot import router as chatbot_router  # Add this import
+from routes.jobs import router as jobs_router
+from routes.llm import router as llm_router
+from routes.profiles import router as profiles_router
+from utils.job_worker import JOB_WORKERS_IN_PROCESS, start_job_workers, stop_job_workers
+from utils.llm_metrics import start_metrics_flush, stop_metrics_flush
+from utils.request_metrics import RequestMetricsMiddleware, metrics_response, start_snapshots, stop_snapshots
+from utils.request_profiler import PROFILING_ENABLED, RequestProfilerMiddleware
+from utils.response_compression import COMPRESSION_ENABLED, CompressionMiddleware
+from utils.response_encoding import ContentNegotiationMiddleware, DefaultResponse
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    start_metrics_flush()
+    start_snapshots()
+    if JOB_WORKERS_IN_PROCESS:
+        await start_job_workers()
     yield
     # Shutdown
+    await stop_job_workers()
+    await stop_metrics_flush()
     await close_mongo_connection()
+    stop_snapshots()
 
 app = FastAPI(
     title="NutriWise API",
     description="A comprehensive nutrition and diet management platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=DefaultResponse
 )
 
 # Configure CORS
@@ -45,6 +62,19 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Sets the response format from the Accept header for the endpoint to render with
+app.add_middleware(ContentNegotiationMiddleware)
+
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Left out entirely unless enabled, so unprofiled deployments pay nothing for it
+if PROFILING_ENABLED:
+    app.add_middleware(RequestProfilerMiddleware)
+
+# Added last so it wraps everything else and times whole requests
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers
 app.include_router(auth_router, prefix="/api")
 app.include_router(quiz_router, prefix="/api")
@@ -55,6 +85,9 @@ app.include_router(user_profile_router, prefix="/api")  # Add this line
 app.include_router(goal_tracking_router, prefix="/api")  # Add this line
 app.include_router(contact_router, prefix="/api")  # Add this line
 app.include_router(chatbot_router, prefix="/api")  # Add this line
+app.include_router(jobs_router, prefix="/api")
+app.include_router(llm_router, prefix="/api")
+app.include_router(profiles_router, prefix="/api")
 @app.get("/")
 async def root():
     return {"message": "Welcome to NutriWise API"}
@@ -63,6 +96,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request counts, latencies and in-flight requests per route, for Prometheus to scrape"""
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
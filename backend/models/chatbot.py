@@ -1,12 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
 class ChatbotRequest(BaseModel):
-    message: str
+    # Empty messages are accepted so the topic gate can answer them
+    message: str = Field(..., max_length=2000)
     context: Optional[str] = "nutrition_diet_health"
+    session_id: Optional[str] = None
 
 class ChatbotResponse(BaseModel):
     response: str
     timestamp: datetime
-    context: str 
\ No newline at end of file
+    context: str
+    session_id: Optional[str] = None 
\ No newline at end of file
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, validator
+from typing import Optional, List, Dict, Any
+
+class MealSwapRequest(BaseModel):
+    meal: Dict[str, Any] = Field(..., description="Meal from a generated plan, with calories, protein, carbs and fat")
+    meal_type: Optional[str] = Field(default=None, description="breakfast, morning_snack, lunch, afternoon_snack, dinner")
+    allergies: List[str] = Field(default_factory=list)
+    dietary_preferences: List[str] = Field(default_factory=list)
+    exclude: List[str] = Field(default_factory=list, description="Meal names already in the plan")
+    k: int = Field(default=5, ge=1, le=20)
+
+class MealSwapResponse(BaseModel):
+    meal_type: Optional[str]
+    alternatives: List[Dict[str, Any]]
+
+class PlanValidationRequest(BaseModel):
+    plan: Dict[str, Any] = Field(..., description="Diet plan with a weekly_plan list")
+    allergies: List[str] = Field(default_factory=list)
+    dietary_preferences: List[str] = Field(default_factory=list)
+
+class NutritionProfile(BaseModel):
+    age: float = Field(..., gt=0, le=120)
+    gender: str = Field(default="female")
+    weight: float = Field(..., ge=20, le=500, description="Weight in kg")
+    height: float = Field(..., ge=50, le=300, description="Height in cm")
+    activity_level: str = Field(default="moderate", description="sedentary, light, moderate, active, very_active")
+    primary_goal: str = Field(default="maintain")
+    target_weight: Optional[float] = Field(default=None, ge=20, le=500)
+
+class BatchTargetsRequest(BaseModel):
+    profiles: List[NutritionProfile] = Field(..., min_length=1, max_length=10000)
+    formula: str = Field(default="harris_benedict", description="harris_benedict or mifflin_st_jeor")
+
+    @validator('formula')
+    def validate_formula(cls, v):
+        allowed_formulas = ['harris_benedict', 'mifflin_st_jeor']
+        if v not in allowed_formulas:
+            raise ValueError(f'Formula must be one of {allowed_formulas}')
+        return v
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+class JobRequest(BaseModel):
+    type: str = Field(..., description="Job type, e.g. diet_plan")
+    payload: Dict[str, Any] = Field(default_factory=dict, description="Inputs for the job, as the matching endpoint takes them")
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    deduplicated: bool = False
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    type: str
+    status: str
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
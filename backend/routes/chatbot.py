@@ -1,80 +1,103 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+import asyncio
 import logging
 import json
+import time
 
 from models.chatbot import ChatbotRequest, ChatbotResponse
-from utils.groq_client import get_groq_client
+from utils.llm_gateway import BudgetExceeded, estimate_prompt_tokens, get_llm_gateway, get_route, requester_key
+from utils.chat_memory import get_or_create_session, build_context, append_turn
+from utils.prompt_templates import get_template
+from utils.topic_gate import classify, decision_counts
+from utils.answer_cache import lookup_answer, store_answer, record_outcome, get_answer_cache
+from database.config import get_database
+from routes.profiles import require_profile_token
 
 router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 logger = logging.getLogger(__name__)
 
-# Get shared Groq client
-client = get_groq_client()
+# Comprehensive nutrition-focused prompt
+NUTRITION_CHAT_PROMPT = get_template("nutrition_chat")
+
+def build_chat_messages(session, message: str):
+    """System prompt, conversation context and the new question, in the order the model sees them"""
+    context = build_context(session)
+    user_message = {"role": "user", "content": NUTRITION_CHAT_PROMPT.render_user(message=message)}
+    system_allowance = get_llm_gateway().prompt_allowance("chat") - estimate_prompt_tokens([*context, user_message])
+    return [
+        {"role": "system", "content": NUTRITION_CHAT_PROMPT.system_within(system_allowance)},
+        *context,
+        user_message,
+    ]
+
+def clean_response(text: str) -> str:
+    """Strip the "NutriBot:" prefix the model sometimes adds"""
+    text = text.strip()
+    if text.startswith("NutriBot:"):
+        text = text[9:].strip()
+    return text
+
+def has_history(session) -> bool:
+    """Answers in an ongoing conversation depend on it, so they are not cached"""
+    return bool(session.get("messages") or session.get("summary"))
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/nutrition-advice", response_model=ChatbotResponse)
-async def get_nutrition_advice(request: ChatbotRequest):
+async def get_nutrition_advice(request: ChatbotRequest, http_request: Request):
     """Get AI-powered nutrition advice using Groq"""
     try:
-        # Create a comprehensive nutrition-focused prompt
-        nutrition_prompt = f"""You are NutriBot, an expert AI nutritionist and dietitian assistant. You specialize in providing evidence-based nutrition advice, diet planning, and healthy eating guidance.
-
-Your expertise includes:
-- Weight management and healthy weight loss
-- Meal planning and nutrition
-- Dietary requirements and restrictions
-- Vitamins, minerals, and supplements
-- Sports nutrition and fitness
-- Medical nutrition therapy
-- Food safety and preparation
-- Reading nutrition labels
-- Healthy cooking and recipes
-
-IMPORTANT GUIDELINES:
-1. Always provide evidence-based, scientific nutrition advice
-2. Be encouraging and supportive, never judgmental
-3. Recommend consulting healthcare professionals for medical conditions
-4. Focus on whole foods and balanced nutrition
-5. Consider individual needs and preferences
-6. Provide practical, actionable advice
-7. Use clear, easy-to-understand language
-8. Include specific food recommendations when relevant
-9. Mention portion sizes and moderation
-10. Emphasize the importance of hydration
-
-User Question: {request.message}
-
-Please provide a helpful, informative, and encouraging response that addresses their nutrition question. Keep your response conversational but professional, and aim for 2-4 paragraphs of helpful information."""
-
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": nutrition_prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
-            max_tokens=800,
-            temperature=0.7,
-        )
+        # Load the conversation so follow-up questions keep their context
+        db = get_database()
+        session = await get_or_create_session(db, request.session_id)
+        started = time.perf_counter()
 
-        # Extract response
-        response_text = chat_completion.choices[0].message.content.strip()
-        
-        # Clean up response if needed
-        if response_text.startswith("NutriBot:"):
-            response_text = response_text[9:].strip()
+        # Off-topic questions and small talk get a canned reply without calling the LLM
+        decision = classify(request.message, has_history(session))
+        decision_counts[decision.label] += 1
+        if decision.response:
+            logger.info(f"Topic gate answered locally ({decision.label}): {request.message[:50]}...")
+            return ChatbotResponse(
+                response=decision.response,
+                timestamp=datetime.utcnow(),
+                context=request.context,
+                session_id=session["_id"]
+            )
+
+        # General questions that were answered before are served from the semantic cache
+        response_text, similarity, cache_outcome = await lookup_answer(db, request.message, has_history(session))
+        if response_text is None:
+            # Call Groq through the gateway, which enforces the caller's token budget
+            chat_completion = await get_llm_gateway().complete(
+                "chat",
+                build_chat_messages(session, request.message),
+                user=requester_key(http_request),
+            )
+
+            # Extract response
+            response_text = clean_response(chat_completion.choices[0].message.content)
+            if cache_outcome == "miss":
+                await store_answer(db, request.message, response_text, chat_completion.model)
+        else:
+            logger.info(f"Chatbot answer served from cache (similarity {similarity:.3f})")
+        await record_outcome(db, cache_outcome, (time.perf_counter() - started) * 1000)
         
+        await append_turn(db, session, request.message, response_text)
         logger.info(f"Chatbot response generated successfully for: {request.message[:50]}...")
         
         return ChatbotResponse(
             response=response_text,
             timestamp=datetime.utcnow(),
-            context=request.context
+            context=request.context,
+            session_id=session["_id"]
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating nutrition advice: {str(e)}")
         raise HTTPException(
@@ -82,6 +105,141 @@ Please provide a helpful, informative, and encouraging response that addresses t
             detail="Failed to generate nutrition advice. Please try again."
         )
 
+@router.post("/nutrition-advice/stream")
+async def stream_nutrition_advice(request: ChatbotRequest, http_request: Request):
+    """Stream nutrition advice as server-sent events.
+
+    Events: ``session`` (session id), ``token`` (text deltas), ``usage`` (token counts
+    and timings, sent last on success) and ``error``. The upstream completion is
+    cancelled as soon as the client disconnects.
+    """
+    user = requester_key(http_request)
+    try:
+        db = get_database()
+        session = await get_or_create_session(db, request.session_id)
+        messages = build_chat_messages(session, request.message)
+        # Refuse with a 429 up front rather than in the middle of an event stream
+        await get_llm_gateway().budget.check("chat", user, estimate_prompt_tokens(messages) + get_route("chat")["max_tokens"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error preparing streamed nutrition advice: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to generate nutrition advice. Please try again."
+        )
+
+    async def event_stream():
+        yield sse_event("session", {"session_id": session["_id"]})
+
+        started = time.perf_counter()
+
+        decision = classify(request.message, has_history(session))
+        decision_counts[decision.label] += 1
+        if decision.response:
+            logger.info(f"Topic gate answered locally ({decision.label}): {request.message[:50]}...")
+            yield sse_event("token", {"text": decision.response})
+            yield sse_event("usage", {
+                "model": None,
+                "cached": False,
+                "gated": decision.label,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_tokens": 0,
+                "time_to_first_token_ms": 0.0,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+            return
+
+        try:
+            cached_text, similarity, cache_outcome = await lookup_answer(db, request.message, has_history(session))
+            if cached_text is not None:
+                await append_turn(db, session, request.message, cached_text)
+                total_ms = (time.perf_counter() - started) * 1000
+                await record_outcome(db, cache_outcome, total_ms)
+                yield sse_event("token", {"text": cached_text})
+                yield sse_event("usage", {
+                    "model": None,
+                    "cached": True,
+                    "similarity": round(similarity, 3),
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                    "time_to_first_token_ms": round(total_ms, 1),
+                    "total_ms": round(total_ms, 1)
+                })
+                return
+        except Exception as e:
+            logger.error(f"Error checking chatbot answer cache: {str(e)}")
+            cache_outcome = "bypass"
+
+        first_token_ms = None
+        parts = []
+        stream = None
+        try:
+            stream = await get_llm_gateway().stream(
+                "chat",
+                messages,
+                user=user,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                    parts.append(delta)
+                    yield sse_event("token", {"text": delta})
+
+            usage = stream.usage
+            response_text = clean_response("".join(parts))
+            await append_turn(db, session, request.message, response_text)
+            if cache_outcome == "miss":
+                await store_answer(db, request.message, response_text, stream.model)
+            await record_outcome(db, cache_outcome, (time.perf_counter() - started) * 1000)
+
+            yield sse_event("usage", {
+                "model": stream.model,
+                "cached": False,
+                "prompt_tokens": usage.prompt_tokens if usage else None,
+                "completion_tokens": usage.completion_tokens if usage else None,
+                "total_tokens": usage.total_tokens if usage else None,
+                "time_to_first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+            logger.info(f"Streamed chatbot response for: {request.message[:50]}...")
+
+        except asyncio.CancelledError:
+            # Client went away; closing the stream below stops the upstream generation
+            logger.info(f"Client disconnected after {len(parts)} streamed chunks")
+            raise
+        except BudgetExceeded as e:
+            yield sse_event("error", {"detail": e.detail, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming nutrition advice: {str(e)}")
+            yield sse_event("error", {"detail": "Failed to generate nutrition advice. Please try again."})
+        finally:
+            if stream is not None:
+                await stream.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache-stats", dependencies=[Depends(require_profile_token)])
+async def get_cache_stats():
+    """Hit rate and latency of the chatbot answer cache, plus topic gate decisions"""
+    try:
+        cache = await get_answer_cache(get_database())
+        return {**cache.metrics(), "topic_gate": dict(decision_counts)}
+    except Exception as e:
+        logger.error(f"Error fetching chatbot cache stats: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error fetching cache stats"
+        )
+
 @router.get("/health")
 async def chatbot_health():
     """Check if chatbot service is healthy"""
@@ -16,6 +16,7 @@ from utils.security import verify_token
 from utils.counter import get_next_sequence_value
 from database.config import get_database
 from utils.email_service import email_service
+from utils.response_encoding import ResponseSerializer
 
 router = APIRouter(prefix="/consultations", tags=["Consultations"])
 security = HTTPBearer()
@@ -23,6 +24,8 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MY_BOOKINGS_RESPONSE = ResponseSerializer(List[ConsultationBookingResponse])
+
 @router.get("/dietitians", response_model=List[dict])
 async def get_available_dietitians():
     """Get list of available dietitians"""
@@ -294,23 +297,22 @@ async def get_my_bookings(
             # Get dietitian info (you'll need to implement proper lookup later)
             dietitian_info = list(sample_dietitians_data.values())[0]  # Default for now
             
-            booking_response = ConsultationBookingResponse(
-                id=str(booking["_id"]),
-                booking_id=booking["booking_id"],
-                patient_user_id=booking["patient_user_id"],
-                dietitian=dietitian_info,
-                consultation_type=booking["consultation_type"],
-                appointment_date=booking["appointment_date"],
-                appointment_time=booking["appointment_time"],
-                duration=booking["duration"],
-                notes=booking["notes"],
-                status=booking["status"],
-                meeting_link=booking.get("meeting_link"),
-                created_at=booking["created_at"]
-            )
-            booking_responses.append(booking_response)
-        
-        return booking_responses
+            booking_responses.append({
+                "id": str(booking["_id"]),
+                "booking_id": booking["booking_id"],
+                "patient_user_id": booking["patient_user_id"],
+                "dietitian": dietitian_info,
+                "consultation_type": booking["consultation_type"],
+                "appointment_date": booking["appointment_date"],
+                "appointment_time": booking["appointment_time"],
+                "duration": booking["duration"],
+                "notes": booking["notes"],
+                "status": booking["status"],
+                "meeting_link": booking.get("meeting_link"),
+                "created_at": booking["created_at"]
+            })
+        
+        return MY_BOOKINGS_RESPONSE.respond(booking_responses)
         
     except HTTPException:
         raise
@@ -1,11 +1,25 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime  
+import asyncio
 import json
 import logging
 from typing import Dict, Any, List
+from models.dietplan import MealSwapRequest, MealSwapResponse, BatchTargetsRequest, PlanValidationRequest
 from utils.security import verify_token
-from utils.groq_client import get_groq_client
+from utils.llm_gateway import BudgetExceeded, get_llm_gateway
+from utils.llm_metrics import PARSE_INVALID_JSON, PARSE_INVALID_SHAPE, PARSE_OK, get_llm_metrics
+from utils.llm_output import parse_diet_plan
+from utils.recipe_index import get_recipe_catalogue, meal_macros
+from utils.shopping_list import build_shopping_list
+from utils.allergen_validator import find_violations, meal_violations, offending_meals, restriction_preferences
+from utils.nutrition import calculate_targets, calculate_targets_batch
+from utils.plan_store import (
+    save_plan, list_plans, claim_prefetched_plan, create_pending_plan, complete_plan, get_plan
+)
+from utils.plan_similarity import get_plan_index, rescale_plan
+from utils.prompt_templates import get_template
+from database.config import get_database
 
 router = APIRouter(prefix="/dietplan", tags=["Diet Plan"])
 security = HTTPBearer()
@@ -13,19 +27,140 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Get shared Groq client
-client = get_groq_client()
+DIET_PLAN_PROMPT = get_template("diet_plan")
+DIET_PLAN_RETRY_PROMPT = get_template("diet_plan_retry")
+
+# Keeps background personalization tasks referenced until they finish
+_background_tasks = set()
 
 @router.post("/generate")
 async def generate_diet_plan(
     plan_data: Dict[str, Any],
+    provisional: bool = False,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """Generate AI-powered personalized diet plan"""
+    """Generate AI-powered personalized diet plan.
+
+    With ``provisional=true`` a stored plan for a similar profile is returned right away,
+    rescaled to the user's calorie target, and the personalized plan is generated in the
+    background. Poll ``/dietplan/plans/{plan_id}`` until its status is "ready".
+    """
+    email = verify_token(credentials.credentials)
+    db = get_database()
+
+    prefetched = await take_prefetched_plan(db, plan_data, email)
+    if prefetched:
+        return prefetched
+
+    if provisional:
+        try:
+            provisional_plan = await get_provisional_plan(db, plan_data, email)
+            if provisional_plan:
+                return provisional_plan
+        except Exception as e:
+            logger.error(f"Error building provisional diet plan: {str(e)}")
+
+    return await generate_and_save_plan(db, plan_data, email)
+
+async def run_diet_plan_job(plan_data: Dict[str, Any], email: str) -> Dict[str, Any]:
+    """Job handler behind ``POST /jobs`` with type "diet_plan"; the plan becomes the job's result"""
+    db = get_database()
+    prefetched = await take_prefetched_plan(db, plan_data, email)
+    if prefetched:
+        return prefetched
+    return await generate_and_save_plan(db, plan_data, email)
+
+async def take_prefetched_plan(db, plan_data: Dict[str, Any], email: str):
+    """A plan pre-generated after a profile change for exactly these inputs, if one is waiting"""
+    try:
+        prefetched = await claim_prefetched_plan(db, email, plan_data)
+        if prefetched:
+            logger.info(f"Serving prefetched diet plan for {email}")
+            diet_plan = checked_plan(
+                prefetched["plan"], plan_data.get('allergies', []), plan_data.get('dietaryPreferences', [])
+            )
+            diet_plan.setdefault("user_info", {})["prefetched"] = True
+            return diet_plan
+    except Exception as e:
+        logger.error(f"Error checking prefetched diet plans: {str(e)}")
+    return None
+
+async def generate_and_save_plan(db, plan_data: Dict[str, Any], email: str) -> Dict[str, Any]:
+    """Generate a plan and keep it for reuse"""
+    diet_plan = await create_diet_plan(plan_data, email)
+
+    # Only AI-generated plans carry user_info; template fallbacks are not worth keeping
+    try:
+        if "user_info" in diet_plan:
+            diet_plan["user_info"]["plan_id"] = await save_plan(db, email, diet_plan, plan_data)
+    except Exception as e:
+        logger.error(f"Error saving diet plan: {str(e)}")
+
+    return diet_plan
+
+async def get_provisional_plan(db, plan_data: Dict[str, Any], email: str):
+    """Rescaled copy of the most similar stored plan, with personalization queued in the background"""
+    index = await get_plan_index(db)
+    match = index.nearest(plan_data)
+    if not match:
+        return None
+    source_id, distance = match
+    source = await get_plan(db, source_id)
+    if not source:
+        return None
+
+    # The stored plan was made for someone else's allergies and restrictions
+    diet_plan = checked_plan(
+        rescale_plan(source["plan"], plan_data), plan_data.get('allergies', []), plan_data.get('dietaryPreferences', [])
+    )
+    diet_plan["user_info"] = {
+        "email": email,
+        "bmi": round(calculate_targets(
+            plan_data.get('age', 25), plan_data.get('gender', 'female'), plan_data.get('weight', 70),
+            plan_data.get('height', 170), plan_data.get('activityLevel', 'moderate'),
+            plan_data.get('primaryGoal', 'weight_loss')
+        )["bmi"], 1),
+        "goal": plan_data.get('primaryGoal', 'weight_loss'),
+        "generated_at": datetime.utcnow().isoformat(),
+        "provisional": True,
+        "similarity_distance": round(distance, 3)
+    }
+    plan_id = await create_pending_plan(db, email, diet_plan, plan_data)
+    diet_plan["user_info"]["plan_id"] = plan_id
+
+    task = asyncio.create_task(personalize_pending_plan(plan_id, plan_data, email))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    logger.info(f"Serving provisional diet plan for {email} (distance {distance:.3f})")
+    return diet_plan
+
+async def personalize_pending_plan(plan_id: str, plan_data: Dict[str, Any], email: str):
+    """Generate the personalized plan that replaces a provisional one"""
+    db = get_database()
+    try:
+        try:
+            diet_plan = await create_diet_plan(plan_data, email)
+        except BudgetExceeded:
+            logger.info(f"Token budget exhausted, keeping provisional plan {plan_id}")
+            diet_plan = {}
+        if "user_info" in diet_plan:
+            diet_plan["user_info"]["plan_id"] = plan_id
+            await complete_plan(db, plan_id, diet_plan, plan_data)
+        else:
+            # Generation failed; the provisional plan stays as the final answer
+            pending = await get_plan(db, plan_id)
+            provisional_plan = pending["plan"]
+            provisional_plan["user_info"]["provisional"] = False
+            await complete_plan(db, plan_id, provisional_plan)
+    except Exception as e:
+        logger.error(f"Error personalizing provisional plan {plan_id}: {str(e)}")
+
+async def create_diet_plan(plan_data: Dict[str, Any], email: str, budget: str = "diet_plan") -> Dict[str, Any]:
+    """Generate a diet plan for the given plan inputs, falling back to a template plan on failure.
+
+    Raises BudgetExceeded when ``email`` has used up their ``budget`` bucket.
+    """
     try:
-        # Verify token
-        email = verify_token(credentials.credentials)
-        
         # Extract user data
         age = plan_data.get('age', 25)
         gender = plan_data.get('gender', 'female')
@@ -39,226 +174,47 @@ async def generate_diet_plan(
         health_conditions = plan_data.get('healthConditions', [])
         
         # Calculate BMI and daily calorie needs
-        bmi = weight / ((height/100) ** 2)
-        
-        # Activity multipliers
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'active': 1.725,
-            'very_active': 1.9
-        }
-        
-        # Calculate BMR (Basal Metabolic Rate)
-        if gender.lower() == 'male':
-            bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
-        else:
-            bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
-        
-        # Calculate daily calories
-        multiplier = activity_multipliers.get(activity_level, 1.55)
-        maintenance_calories = int(bmr * multiplier)
-        
-        # Adjust calories based on goal
-        if primary_goal == 'weight_loss':
-            daily_calories = maintenance_calories - 500
-        elif primary_goal == 'weight_gain':
-            daily_calories = maintenance_calories + 500
-        else:
-            daily_calories = maintenance_calories
-
-        # Create comprehensive prompt for Groq AI
-        prompt = f"""You are a professional nutritionist and chef. Generate a CREATIVE, personalized 7-day diet plan in JSON format for:
-
-**User Profile:**
-- Age: {age}, Gender: {gender}
-- Current Weight: {weight}kg, Height: {height}cm
-- BMI: {bmi:.1f}
-- Activity Level: {activity_level}
-- Primary Goal: {primary_goal}
-- Target Weight: {target_weight}kg
-- Daily Calories: {daily_calories}
-- Dietary Preferences: {', '.join(dietary_preferences) if dietary_preferences else 'None'}
-- Allergies: {', '.join(allergies) if allergies else 'None'}
-- Health Conditions: {', '.join(health_conditions) if health_conditions else 'None'}
-
-**Required JSON Structure:**
-{{
-  "plan_summary": {{
-    "daily_calories": {daily_calories},
-    "protein_grams": 120,
-    "carbs_grams": 200,
-    "fat_grams": 65,
-    "fiber_grams": 25,
-    "water_glasses": 8
-  }},
-  "weekly_plan": [
-    {{
-      "day": 1,
-      "day_name": "Monday",
-      "meals": {{
-        "breakfast": {{
-          "name": "Meal Name",
-          "ingredients": ["ingredient1", "ingredient2"],
-          "calories": 350,
-          "protein": 20,
-          "carbs": 40,
-          "fat": 12,
-          "preparation_time": "15 min",
-          "instructions": "Brief cooking instructions"
-        }},
-        "morning_snack": {{
-          "name": "Snack Name",
-          "ingredients": ["ingredient1"],
-          "calories": 150,
-          "protein": 8,
-          "carbs": 20,
-          "fat": 5,
-          "preparation_time": "5 min",
-          "instructions": "Simple preparation"
-        }},
-        "lunch": {{
-          "name": "Meal Name",
-          "ingredients": ["ingredient1", "ingredient2", "ingredient3"],
-          "calories": 450,
-          "protein": 25,
-          "carbs": 50,
-          "fat": 18,
-          "preparation_time": "25 min",
-          "instructions": "Cooking instructions"
-        }},
-        "afternoon_snack": {{
-          "name": "Snack Name",
-          "ingredients": ["ingredient1"],
-          "calories": 120,
-          "protein": 6,
-          "carbs": 15,
-          "fat": 4,
-          "preparation_time": "5 min",
-          "instructions": "Simple preparation"
-        }},
-        "dinner": {{
-          "name": "Meal Name",
-          "ingredients": ["ingredient1", "ingredient2", "ingredient3"],
-          "calories": 400,
-          "protein": 30,
-          "carbs": 35,
-          "fat": 15,
-          "preparation_time": "30 min",
-          "instructions": "Detailed cooking steps"
-        }}
-      }},
-      "total_calories": 1470,
-      "daily_tips": "Helpful tip for the day"
-    }}
-  ],
-  "shopping_list": {{
-    "proteins": ["chicken breast", "eggs", "greek yogurt"],
-    "vegetables": ["spinach", "broccoli", "tomatoes"],
-    "fruits": ["apples", "berries", "bananas"],
-    "grains": ["oats", "quinoa", "brown rice"],
-    "dairy": ["milk", "cheese"],
-    "others": ["olive oil", "nuts", "herbs"]
-  }},
-  "nutrition_tips": [
-    "Stay hydrated with 8-10 glasses of water daily",
-    "Include protein in every meal for satiety",
-    "Eat vegetables first to increase fiber intake"
-  ],
-  "meal_prep_suggestions": [
-    "Prepare overnight oats for quick breakfasts",
-    "Cook grains in batches for the week",
-    "Pre-cut vegetables for easy cooking"
-  ]
-}}
-
-**CRITICAL CREATIVITY REQUIREMENTS:**
-- Use CREATIVE, DESCRIPTIVE meal names (NOT generic like "Greek Yogurt Bowl" or "Apple Slices")
-- Include DIVERSE cuisines (Mediterranean, Asian, Mexican, Indian, etc.)
-- Use VARIED ingredients across all 7 days
-- Create INTERESTING flavor combinations
-- Make shopping lists SPECIFIC with quantities
-- Provide DETAILED, HELPFUL tips and suggestions
-
-**Important Guidelines:**
-- Create exactly 7 days of meals
-- Ensure meals align with dietary preferences and avoid allergies
-- Balance macronutrients appropriately
-- Include variety and realistic portions
-- Provide practical cooking instructions
-- Consider the user's goal ({primary_goal})
-- Make meals culturally appropriate and accessible
-- Include healthy snacks between main meals
-
-**CREATIVITY EXAMPLES:**
-- Instead of "Greek Yogurt Bowl" use "Moroccan Spiced Shakshuka with Feta"
-- Instead of "Apple Slices" use "Cinnamon-Spiced Apple Chips with Almond Butter"
-- Instead of "Chicken Salad" use "Thai-Inspired Grilled Chicken with Mango Salsa"
-
-Create 7 COMPLETE days with DIFFERENT meals each day. Be CREATIVE and SPECIFIC.
-
-Return only the JSON object, no additional text."""
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
-            temperature=0.7,
-            max_tokens=8000,  # Increased token limit for complete JSON
+        targets = calculate_targets(age, gender, weight, height, activity_level, primary_goal, target_weight)
+        bmi = targets["bmi"]
+        daily_calories = targets["daily_calories"]
+
+        # Fixed instructions go in the system message; this user's data follows in the user message.
+        # Optional guidance is dropped only if the prompt would crowd out the expected output
+        messages = DIET_PLAN_PROMPT.render_within(
+            get_llm_gateway().prompt_allowance("diet_plan"),
+            age=age,
+            gender=gender,
+            weight=weight,
+            height=height,
+            bmi=f"{bmi:.1f}",
+            activity_level=activity_level,
+            primary_goal=primary_goal,
+            target_weight=target_weight,
+            dietary_preferences=', '.join(dietary_preferences) if dietary_preferences else 'None',
+            allergies=', '.join(allergies) if allergies else 'None',
+            health_conditions=', '.join(health_conditions) if health_conditions else 'None',
+            daily_calories=daily_calories,
+            protein_grams=targets["protein_grams"],
+            carbs_grams=targets["carbs_grams"],
+            fat_grams=targets["fat_grams"]
         )
 
+        chat_completion = await get_llm_gateway().complete("diet_plan", messages, user=email, budget=budget)
+
         # Parse the response
         response_content = chat_completion.choices[0].message.content.strip()
-        logger.info(f"AI Response received: {response_content[:200]}...")
+        logger.info(f"AI Response received: {len(response_content)} characters from {chat_completion.model}")
         
         try:
-            # Remove any potential markdown formatting
-            if response_content.startswith("```json"):
-                response_content = response_content.replace("```json", "").replace("```json", "").replace("```", "")
-            elif response_content.startswith("```"):
-                response_content = response_content.replace("```","")
-            
-            # Clean up the response
-            response_content = response_content.strip()
-            
-            # Try to fix truncated JSON by finding the last complete object
-            if response_content.count('{') > response_content.count('}'):
-                # JSON is truncated, try to find the last complete object
-                last_brace = response_content.rfind('}')
-                if last_brace > 0:
-                    response_content = response_content[:last_brace + 1]
-                    logger.info("Fixed truncated JSON response")
+            diet_plan = parse_diet_plan(response_content)
             
-            diet_plan = json.loads(response_content)
-            
-            # Validate the required structure
-            required_fields = ["plan_summary", "weekly_plan", "shopping_list", "nutrition_tips", "meal_prep_suggestions"]
-            missing_fields = [field for field in required_fields if field not in diet_plan]
-            if missing_fields:
-                logger.error(f"Missing required fields: {missing_fields}")
-                raise ValueError("Invalid diet plan structure")
-            
-            # Validate weekly plan has at least some days (be more flexible)
-            if not diet_plan.get("weekly_plan") or len(diet_plan["weekly_plan"]) < 3:
-                logger.error(f"Weekly plan has {len(diet_plan.get('weekly_plan', []))} days, need at least 3")
-                raise ValueError("Weekly plan must have at least 3 days")
+            get_llm_metrics().record_parse("diet_plan", PARSE_OK, chat_completion.model)
+
+            # Replace any meals that conflict with allergies or dietary restrictions
+            enforce_dietary_restrictions(diet_plan, allergies, dietary_preferences)
             
-            # If we have less than 7 days, pad with additional days
-            if len(diet_plan["weekly_plan"]) < 7:
-                logger.info(f"Padding diet plan from {len(diet_plan['weekly_plan'])} to 7 days")
-                while len(diet_plan["weekly_plan"]) < 7:
-                    # Copy the last day and modify it slightly
-                    last_day = diet_plan["weekly_plan"][-1].copy()
-                    last_day["day"] = len(diet_plan["weekly_plan"]) + 1
-                    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                    last_day["day_name"] = day_names[len(diet_plan["weekly_plan"])]
-                    diet_plan["weekly_plan"].append(last_day)
+            # Shopping list is compiled locally so it always matches the meals
+            diet_plan["shopping_list"] = build_shopping_list(diet_plan["weekly_plan"])
             
             # Add user metadata
             diet_plan["user_info"] = {
@@ -272,16 +228,27 @@ Return only the JSON object, no additional text."""
             return diet_plan
             
         except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Failed to parse diet plan response: {str(e)}")
-            logger.error(f"Raw response: {response_content}")
+            # The raw output is not logged: it is long and describes the user's health
+            outcome = PARSE_INVALID_JSON if isinstance(e, json.JSONDecodeError) else PARSE_INVALID_SHAPE
+            get_llm_metrics().record_parse("diet_plan", outcome, chat_completion.model)
+            logger.error(
+                f"Failed to parse diet plan response ({len(response_content)} characters, "
+                f"finish reason {chat_completion.choices[0].finish_reason}): {str(e)}"
+            )
             # Try to retry with a simpler prompt
-            return await retry_with_simpler_prompt(plan_data, email, daily_calories, primary_goal, bmi)
+            return await retry_with_simpler_prompt(plan_data, email, daily_calories, primary_goal, bmi, budget)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Diet plan generation error: {str(e)}")
-        return get_fallback_diet_plan(1500, 'weight_loss')
+        return checked_plan(
+            get_fallback_diet_plan(1500, 'weight_loss'),
+            plan_data.get('allergies', []),
+            plan_data.get('dietaryPreferences', [])
+        )
 
-async def retry_with_simpler_prompt(plan_data: Dict[str, Any], email: str, daily_calories: int, primary_goal: str, bmi: float):
+async def retry_with_simpler_prompt(plan_data: Dict[str, Any], email: str, daily_calories: int, primary_goal: str, bmi: float, budget: str = "diet_plan"):
     """Retry with a simpler prompt if the main one fails"""
     try:
         age = plan_data.get('age', 25)
@@ -289,131 +256,30 @@ async def retry_with_simpler_prompt(plan_data: Dict[str, Any], email: str, daily
         dietary_preferences = plan_data.get('dietaryPreferences', [])
         allergies = plan_data.get('allergies', [])
         
-        simpler_prompt = f"""Create a simple 7-day diet plan in JSON format for:
-Age: {age}, Gender: {gender}, Calories: {daily_calories}, Goal: {primary_goal}
-Dietary preferences: {dietary_preferences}
-Allergies: {allergies}
-
-Return a JSON object with this exact structure:
-{{
-  "plan_summary": {{
-    "daily_calories": {daily_calories},
-    "protein_grams": 120,
-    "carbs_grams": 200,
-    "fat_grams": 65,
-    "fiber_grams": 25,
-    "water_glasses": 8
-  }},
-  "weekly_plan": [
-    {{
-      "day": 1,
-      "day_name": "Monday",
-      "meals": {{
-        "breakfast": {{
-          "name": "Creative breakfast name",
-          "ingredients": ["ingredient1", "ingredient2"],
-          "calories": 350,
-          "protein": 20,
-          "carbs": 40,
-          "fat": 12,
-          "preparation_time": "15 min",
-          "instructions": "Simple cooking instructions"
-        }},
-        "morning_snack": {{
-          "name": "Creative snack name",
-          "ingredients": ["ingredient1"],
-          "calories": 150,
-          "protein": 8,
-          "carbs": 20,
-          "fat": 5,
-          "preparation_time": "5 min",
-          "instructions": "Simple preparation"
-        }},
-        "lunch": {{
-          "name": "Creative lunch name",
-          "ingredients": ["ingredient1", "ingredient2", "ingredient3"],
-          "calories": 450,
-          "protein": 25,
-          "carbs": 50,
-          "fat": 18,
-          "preparation_time": "25 min",
-          "instructions": "Cooking instructions"
-        }},
-        "afternoon_snack": {{
-          "name": "Creative snack name",
-          "ingredients": ["ingredient1"],
-          "calories": 120,
-          "protein": 6,
-          "carbs": 15,
-          "fat": 4,
-          "preparation_time": "5 min",
-          "instructions": "Simple preparation"
-        }},
-        "dinner": {{
-          "name": "Creative dinner name",
-          "ingredients": ["ingredient1", "ingredient2", "ingredient3"],
-          "calories": 400,
-          "protein": 30,
-          "carbs": 35,
-          "fat": 15,
-          "preparation_time": "30 min",
-          "instructions": "Detailed cooking steps"
-        }}
-      }},
-      "total_calories": 1470,
-      "daily_tips": "Helpful tip for the day"
-    }}
-  ],
-  "shopping_list": {{
-    "proteins": ["protein1", "protein2", "protein3"],
-    "vegetables": ["vegetable1", "vegetable2", "vegetable3"],
-    "fruits": ["fruit1", "fruit2", "fruit3"],
-    "grains": ["grain1", "grain2", "grain3"],
-    "dairy": ["dairy1", "dairy2"],
-    "others": ["other1", "other2", "other3"]
-  }},
-  "nutrition_tips": [
-    "Tip 1",
-    "Tip 2", 
-    "Tip 3"
-  ],
-  "meal_prep_suggestions": [
-    "Suggestion 1",
-    "Suggestion 2",
-    "Suggestion 3"
-  ]
-}}
-
-Create 7 days with different meals each day. Be creative with meal names and ingredients."""
-
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": simpler_prompt}],
-            model="llama-3.3-70b-versatile",
-            stream=False,
-            temperature=0.8,
-            max_tokens=6000,  # Increased token limit for retry
+        messages = DIET_PLAN_RETRY_PROMPT.render_within(
+            get_llm_gateway().prompt_allowance("diet_plan_retry"),
+            age=age,
+            gender=gender,
+            daily_calories=daily_calories,
+            primary_goal=primary_goal,
+            dietary_preferences=', '.join(dietary_preferences) if dietary_preferences else 'None',
+            allergies=', '.join(allergies) if allergies else 'None'
         )
 
+        chat_completion = await get_llm_gateway().complete("diet_plan_retry", messages, user=email, budget=budget)
+
         response_content = chat_completion.choices[0].message.content.strip()
-        logger.info(f"Retry AI Response received: {response_content[:200]}...")
-        
-        # Clean up response
-        if response_content.startswith("```json"):
-            response_content = response_content.replace("```json", "").replace("```", "")
-        elif response_content.startswith("```"):
-            response_content = response_content.replace("```", "")
-        
-        response_content = response_content.strip()
+        logger.info(f"Retry AI Response received: {len(response_content)} characters from {chat_completion.model}")
         
-        # Try to fix truncated JSON by finding the last complete object
-        if response_content.count('{') > response_content.count('}'):
-            # JSON is truncated, try to find the last complete object
-            last_brace = response_content.rfind('}')
-            if last_brace > 0:
-                response_content = response_content[:last_brace + 1]
-                logger.info("Fixed truncated JSON response in retry")
-        
-        diet_plan = json.loads(response_content)
+        try:
+            diet_plan = parse_diet_plan(response_content, "diet_plan_retry")
+        except (json.JSONDecodeError, ValueError) as e:
+            outcome = PARSE_INVALID_JSON if isinstance(e, json.JSONDecodeError) else PARSE_INVALID_SHAPE
+            get_llm_metrics().record_parse("diet_plan_retry", outcome, chat_completion.model)
+            raise
+        get_llm_metrics().record_parse("diet_plan_retry", PARSE_OK, chat_completion.model)
+        enforce_dietary_restrictions(diet_plan, allergies, dietary_preferences)
+        diet_plan["shopping_list"] = build_shopping_list(diet_plan["weekly_plan"])
         
         # Add user metadata
         diet_plan["user_info"] = {
@@ -426,13 +292,89 @@ Create 7 days with different meals each day. Be creative with meal names and ing
         logger.info("Diet plan generated successfully with retry")
         return diet_plan
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Retry failed: {str(e)}")
-        return get_fallback_diet_plan(daily_calories, primary_goal)
+        return checked_plan(
+            get_fallback_diet_plan(daily_calories, primary_goal),
+            plan_data.get('allergies', []),
+            plan_data.get('dietaryPreferences', [])
+        )
+
+def enforce_dietary_restrictions(diet_plan: Dict[str, Any], allergies: List[str], dietary_preferences: List[str]):
+    """Swap meals that conflict with allergies or restrictions for compliant catalogue meals"""
+    violations = find_violations(diet_plan, allergies, dietary_preferences)
+    replaced = []
+    unresolved = []
+
+    if violations:
+        catalogue = get_recipe_catalogue()
+        restrictions = restriction_preferences(dietary_preferences)
+        plan_meal_names = [
+            meal.get("name", "")
+            for day in diet_plan["weekly_plan"]
+            for meal in day.get("meals", {}).values()
+            if isinstance(meal, dict)
+        ]
+
+        for day_index, meal_type in offending_meals(violations):
+            day = diet_plan["weekly_plan"][day_index]
+            meal = day["meals"][meal_type]
+            candidates = catalogue.nearest(
+                meal,
+                k=5,
+                meal_type=meal_type,
+                allergies=allergies,
+                preferences=restrictions,
+                exclude_names=plan_meal_names
+            )
+            replacement = next(
+                (c for c in candidates if not meal_violations(c, allergies, dietary_preferences)),
+                None
+            )
+            if replacement is None:
+                unresolved.append({"day": day.get("day", day_index + 1), "meal_type": meal_type, "meal_name": meal.get("name")})
+                continue
+
+            replacement.pop("distance", None)
+            day["meals"][meal_type] = replacement
+            plan_meal_names.append(replacement["name"])
+            day["total_calories"] = sum(
+                m.get("calories", 0) or 0 for m in day["meals"].values() if isinstance(m, dict)
+            )
+            replaced.append({
+                "day": day.get("day", day_index + 1),
+                "meal_type": meal_type,
+                "original": meal.get("name"),
+                "replacement": replacement["name"]
+            })
+
+        logger.info(f"Plan validation: {len(violations)} violations, {len(replaced)} meals replaced, {len(unresolved)} unresolved")
+
+    diet_plan["validation"] = {
+        "violations": violations,
+        "replaced_meals": replaced,
+        "unresolved_meals": unresolved
+    }
+    return diet_plan
+
+def checked_plan(diet_plan: Dict[str, Any], allergies: List[str], dietary_preferences: List[str]) -> Dict[str, Any]:
+    """Run the allergy and restriction check on a plan that was not generated for these inputs just now"""
+    enforce_dietary_restrictions(diet_plan, allergies, dietary_preferences)
+    if diet_plan["validation"]["replaced_meals"]:
+        diet_plan["shopping_list"] = build_shopping_list(diet_plan["weekly_plan"])
+    return diet_plan
+
+async def current_restrictions(db, email: str):
+    """Allergies and dietary restrictions from the user's health profile as it is now"""
+    user = await db.users.find_one({"email": email}, {"health_profile": 1})
+    profile = (user or {}).get("health_profile") or {}
+    return list(profile.get("allergies") or []), list(profile.get("dietary_restrictions") or [])
 
 def get_fallback_diet_plan(calories: int, goal: str):
     """Fallback diet plan if AI generation fails"""
-    return {
+    diet_plan = {
         "plan_summary": {
             "daily_calories": calories,
             "protein_grams": 120,
@@ -501,13 +443,6 @@ def get_fallback_diet_plan(calories: int, goal: str):
                 "daily_tips": "Start your day with protein to boost metabolism and maintain energy levels"
             }
         ],
-        "shopping_list": {
-            "proteins": ["Greek yogurt", "chicken breast", "salmon", "almonds"],
-            "vegetables": ["mixed greens", "tomatoes", "cucumber", "carrots", "bell peppers", "broccoli"],
-            "fruits": ["berries", "apple", "lemon"],
-            "grains": ["granola", "quinoa"],
-            "others": ["honey", "olive oil", "hummus"]
-        },
         "nutrition_tips": [
             "Drink water before meals to help with portion control",
             "Include a source of protein at each meal",
@@ -519,6 +454,121 @@ def get_fallback_diet_plan(calories: int, goal: str):
             "Marinate proteins the night before cooking"
         ]
     }
+    diet_plan["shopping_list"] = build_shopping_list(diet_plan["weekly_plan"])
+    return diet_plan
+
+@router.post("/swap-meal", response_model=MealSwapResponse)
+async def swap_meal(
+    swap_data: MealSwapRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Suggest similar meals from the recipe catalogue without calling the AI"""
+    try:
+        verify_token(credentials.credentials)
+
+        if all(value is None for value in meal_macros(swap_data.meal)):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Meal needs a numeric calories, protein, carbs or fat value"
+            )
+
+        candidates = get_recipe_catalogue().nearest(
+            swap_data.meal,
+            k=swap_data.k * 2,
+            meal_type=swap_data.meal_type,
+            allergies=swap_data.allergies,
+            preferences=swap_data.dietary_preferences,
+            exclude_names=swap_data.exclude
+        )
+        # Catalogue tags only cover the common allergens; free-text ones are checked here
+        alternatives = [
+            c for c in candidates
+            if not meal_violations(c, swap_data.allergies, swap_data.dietary_preferences)
+        ][:swap_data.k]
+
+        return MealSwapResponse(meal_type=swap_data.meal_type, alternatives=alternatives)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Meal swap error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error finding meal alternatives"
+        )
+
+@router.post("/validate")
+async def validate_diet_plan(
+    validation_data: PlanValidationRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Check an existing plan against allergies and dietary restrictions"""
+    try:
+        verify_token(credentials.credentials)
+
+        violations = find_violations(
+            validation_data.plan,
+            validation_data.allergies,
+            validation_data.dietary_preferences
+        )
+        return {
+            "valid": not violations,
+            "violations": violations,
+            "offending_meals": [
+                {"day_index": day_index, "meal_type": meal_type}
+                for day_index, meal_type in offending_meals(violations)
+            ]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Plan validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error validating diet plan"
+        )
+
+@router.post("/targets/batch")
+async def calculate_batch_targets(
+    batch_data: BatchTargetsRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Calculate calorie and macro targets for many profiles in one call"""
+    try:
+        verify_token(credentials.credentials)
+
+        profiles = batch_data.profiles
+        results = calculate_targets_batch(
+            ages=[p.age for p in profiles],
+            genders=[p.gender for p in profiles],
+            weights=[p.weight for p in profiles],
+            heights=[p.height for p in profiles],
+            activity_levels=[p.activity_level for p in profiles],
+            primary_goals=[p.primary_goal for p in profiles],
+            # NaN for a missing target comes back as None, as calculate_targets returns
+            target_weights=[p.target_weight if p.target_weight is not None else float("nan") for p in profiles],
+            formula=batch_data.formula
+        )
+
+        # Column-wise lists keep the response compact for large batches
+        return {
+            "count": len(profiles),
+            "formula": batch_data.formula,
+            "targets": {
+                field: [None if v != v else round(v, 2) for v in values.tolist()]
+                for field, values in results.items()
+            }
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch targets error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculating nutrition targets"
+        )
 
 @router.get("/user-plans")
 async def get_user_diet_plans(
@@ -527,12 +577,62 @@ async def get_user_diet_plans(
     """Get user's saved diet plans"""
     try:
         email = verify_token(credentials.credentials)
-        # In a real app, you'd fetch from database
-        # For now, return empty array
-        return {"plans": []}
+        db = get_database()
+
+        plans = await list_plans(db, email)
+        # Stored plans are checked again in case allergies or restrictions changed since
+        allergies, dietary_preferences = await current_restrictions(db, email)
+        return {
+            "plans": [
+                {
+                    "id": str(plan["_id"]),
+                    "source": plan.get("source", "request"),
+                    "status": plan.get("status", "ready"),
+                    "created_at": plan["created_at"].isoformat(),
+                    "plan": checked_plan(plan["plan"], allergies, dietary_preferences)
+                }
+                for plan in plans
+            ]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user plans: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error fetching diet plans"
         )
+
+@router.get("/plans/{plan_id}")
+async def get_diet_plan(
+    plan_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Get one stored diet plan, e.g. to pick up the personalized version of a provisional plan"""
+    try:
+        email = verify_token(credentials.credentials)
+        db = get_database()
+
+        plan = await get_plan(db, plan_id, email)
+        if not plan:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Diet plan not found"
+            )
+
+        allergies, dietary_preferences = await current_restrictions(db, email)
+        return {
+            "id": str(plan["_id"]),
+            "status": plan.get("status", "ready"),
+            "source": plan.get("source", "request"),
+            "created_at": plan["created_at"].isoformat(),
+            "plan": checked_plan(plan["plan"], allergies, dietary_preferences)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching diet plan: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching diet plan"
+        )
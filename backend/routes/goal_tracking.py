@@ -16,6 +16,9 @@ from models.goal_tracking import (
     WeeklySummaryResponse
 )
 from utils.security import verify_token
+from utils.nutrition import bmi as calculate_bmi
+from utils.goal_analytics import weight_trend_analytics, weekly_summary
+from utils.response_encoding import ResponseSerializer
 from database.config import get_database
 
 router = APIRouter(prefix="/goal-tracking", tags=["Goal Tracking"])
@@ -24,6 +27,24 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+WEIGHT_LOGS_RESPONSE = ResponseSerializer(List[WeightLogResponse])
+TODAY_RESPONSE = ResponseSerializer(DailyGoalResponse)
+
+def weight_log_fields(log: Dict[str, Any]) -> Dict[str, Any]:
+    """A stored weight log in WeightLogResponse's shape"""
+    return {
+        "id": str(log["_id"]),
+        "user_id": log["user_id"],
+        "weight": log["weight"],
+        "bmi": log.get("bmi"),
+        "body_fat_percentage": log.get("body_fat_percentage"),
+        "muscle_mass": log.get("muscle_mass"),
+        "notes": log.get("notes"),
+        "measurement_time": log["measurement_time"],
+        "logged_at": log["logged_at"],
+        "created_at": log["created_at"]
+    }
+
 async def get_user_by_email(email: str, db):
     """Helper function to get user by email"""
     users_collection = db.users
@@ -48,9 +69,7 @@ async def add_weight_log(
         user = await get_user_by_email(email, db)
         
         # Calculate BMI if height is provided
-        bmi = None
-        if weight_data.height:
-            bmi = weight_data.weight / ((weight_data.height / 100) ** 2)
+        bmi = calculate_bmi(weight_data.weight, weight_data.height)
         
         # Create weight log entry
         weight_log_dict = {
@@ -141,21 +160,7 @@ async def get_weight_logs(
         
         weight_logs = await cursor.to_list(length=None)
         
-        return [
-            WeightLogResponse(
-                id=str(log["_id"]),
-                user_id=log["user_id"],
-                weight=log["weight"],
-                bmi=log.get("bmi"),
-                body_fat_percentage=log.get("body_fat_percentage"),
-                muscle_mass=log.get("muscle_mass"),
-                notes=log.get("notes"),
-                measurement_time=log["measurement_time"],
-                logged_at=log["logged_at"],
-                created_at=log["created_at"]
-            )
-            for log in weight_logs
-        ]
+        return WEIGHT_LOGS_RESPONSE.respond([weight_log_fields(log) for log in weight_logs])
         
     except HTTPException:
         raise
@@ -255,36 +260,25 @@ async def get_today_tracking(credentials: HTTPAuthorizationCredentials = Depends
         
         latest_weight_response = None
         if latest_weight_log:
-            latest_weight_response = WeightLogResponse(
-                id=str(latest_weight_log["_id"]),
-                user_id=latest_weight_log["user_id"],
-                weight=latest_weight_log["weight"],
-                bmi=latest_weight_log.get("bmi"),
-                body_fat_percentage=latest_weight_log.get("body_fat_percentage"),
-                muscle_mass=latest_weight_log.get("muscle_mass"),
-                notes=latest_weight_log.get("notes"),
-                measurement_time=latest_weight_log["measurement_time"],
-                logged_at=latest_weight_log["logged_at"],
-                created_at=latest_weight_log["created_at"]
-            )
+            latest_weight_response = weight_log_fields(latest_weight_log)
         
         # Calculate totals
         total_calories_burned = sum(ex.get("calories_burned", 0) for ex in tracking_data.get("exercises", []))
         total_exercise_minutes = sum(ex.get("duration_minutes", 0) for ex in tracking_data.get("exercises", []))
         
-        return DailyGoalResponse(
-            date=tracking_data["tracking_date"],
-            meals=tracking_data.get("meals", []),
-            water_intake=tracking_data.get("water_intake"),
-            weight_entry=tracking_data.get("weight_entry"),
-            latest_weight_log=latest_weight_response,
-            exercises=tracking_data.get("exercises", []),
-            mood=tracking_data.get("mood"),
-            sleep_hours=tracking_data.get("sleep_hours"),
-            daily_notes=tracking_data.get("daily_notes"),
-            total_calories_burned=total_calories_burned,
-            total_exercise_minutes=total_exercise_minutes
-        )
+        return TODAY_RESPONSE.respond({
+            "date": tracking_data["tracking_date"],
+            "meals": tracking_data.get("meals", []),
+            "water_intake": tracking_data.get("water_intake"),
+            "weight_entry": tracking_data.get("weight_entry"),
+            "latest_weight_log": latest_weight_response,
+            "exercises": tracking_data.get("exercises", []),
+            "mood": tracking_data.get("mood"),
+            "sleep_hours": tracking_data.get("sleep_hours"),
+            "daily_notes": tracking_data.get("daily_notes"),
+            "total_calories_burned": total_calories_burned,
+            "total_exercise_minutes": total_exercise_minutes
+        })
         
     except HTTPException:
         raise
@@ -400,9 +394,7 @@ async def add_weight_entry(
         user = await get_user_by_email(email, db)
         
         # Calculate BMI if height is provided
-        bmi = None
-        if weight_data.height:
-            bmi = weight_data.weight / ((weight_data.height / 100) ** 2)
+        bmi = calculate_bmi(weight_data.weight, weight_data.height)
         
         weight_entry = WeightEntry(
             weight=weight_data.weight,
@@ -582,116 +574,7 @@ async def get_weight_analytics(
                 bmi_trend=[]
             )
         
-        # Process weight entries for analytics
-        entries = []
-        bmi_trend = []
-        weights = []
-        
-        for log in weight_logs:
-            entry = {
-                "date": log["logged_at"].isoformat(),
-                "weight": log["weight"],
-                "bmi": log.get("bmi"),
-                "notes": log.get("notes"),
-                "measurement_time": log["measurement_time"]
-            }
-            entries.append(entry)
-            weights.append(log["weight"])
-            
-            if log.get("bmi"):
-                bmi_trend.append({
-                    "date": log["logged_at"].isoformat(),
-                    "bmi": log["bmi"]
-                })
-        
-        # Calculate trends
-        trend = "stable"
-        total_change = 0
-        average_weekly_change = 0
-        
-        if len(weights) >= 2:
-            total_change = weights[-1] - weights[0]
-            if total_change > 0.5:
-                trend = "increasing"
-            elif total_change < -0.5:
-                trend = "decreasing"
-            
-            # Calculate average weekly change
-            weeks = days / 7
-            average_weekly_change = total_change / weeks if weeks > 0 else 0
-        
-        # Find highest and lowest weights
-        highest_weight = {}
-        lowest_weight = {}
-        
-        if weights:
-            max_weight = max(weights)
-            min_weight = min(weights)
-            
-            for log in weight_logs:
-                if log["weight"] == max_weight and not highest_weight:
-                    highest_weight = {
-                        "weight": log["weight"],
-                        "date": log["logged_at"].isoformat(),
-                        "bmi": log.get("bmi")
-                    }
-                
-                if log["weight"] == min_weight and not lowest_weight:
-                    lowest_weight = {
-                        "weight": log["weight"],
-                        "date": log["logged_at"].isoformat(),
-                        "bmi": log.get("bmi")
-                    }
-        
-        # Identify weight loss and gain periods
-        weight_loss_periods = []
-        weight_gain_periods = []
-        
-        if len(weight_logs) >= 2:
-            current_trend = None
-            trend_start = weight_logs[0]
-            
-            for i in range(1, len(weight_logs)):
-                current_log = weight_logs[i]
-                prev_log = weight_logs[i-1]
-                
-                if current_log["weight"] < prev_log["weight"]:
-                    if current_trend != "loss":
-                        if current_trend == "gain" and trend_start:
-                            weight_gain_periods.append({
-                                "start_date": trend_start["logged_at"].isoformat(),
-                                "end_date": prev_log["logged_at"].isoformat(),
-                                "start_weight": trend_start["weight"],
-                                "end_weight": prev_log["weight"],
-                                "change": prev_log["weight"] - trend_start["weight"]
-                            })
-                        current_trend = "loss"
-                        trend_start = prev_log
-                
-                elif current_log["weight"] > prev_log["weight"]:
-                    if current_trend != "gain":
-                        if current_trend == "loss" and trend_start:
-                            weight_loss_periods.append({
-                                "start_date": trend_start["logged_at"].isoformat(),
-                                "end_date": prev_log["logged_at"].isoformat(),
-                                "start_weight": trend_start["weight"],
-                                "end_weight": prev_log["weight"],
-                                "change": prev_log["weight"] - trend_start["weight"]
-                            })
-                        current_trend = "gain"
-                        trend_start = prev_log
-        
-        return WeightTrendAnalytics(
-            entries=entries,
-            trend=trend,
-            total_change=round(total_change, 1),
-            average_weekly_change=round(average_weekly_change, 2),
-            highest_weight=highest_weight,
-            lowest_weight=lowest_weight,
-            weight_loss_periods=weight_loss_periods,
-            weight_gain_periods=weight_gain_periods,
-            bmi_trend=bmi_trend if bmi_trend else None
-        )
+        return WeightTrendAnalytics(**weight_trend_analytics(weight_logs, days))
         
     except HTTPException:
         raise
@@ -817,8 +700,8 @@ async def get_daily_summary(
                 "total_exercise_minutes": total_exercise_minutes,
                 "completed_meals": completed_meals,
                 "total_meals": len(tracking_data.get("meals", [])),
-                "water_glasses": tracking_data.get("water_intake", {}).get("glasses", 0),
-                "weight": tracking_data.get("weight_entry", {}).get("weight"),
+                "water_glasses": (tracking_data.get("water_intake") or {}).get("glasses", 0),
+                "weight": (tracking_data.get("weight_entry") or {}).get("weight"),
                 "mood": tracking_data.get("mood"),
                 "sleep_hours": tracking_data.get("sleep_hours")
             },
@@ -866,58 +749,12 @@ async def get_weekly_summary(
         
         tracking_data = await cursor.to_list(length=None)
         
-        # Calculate weekly totals
-        total_calories_burned = 0
-        total_exercise_minutes = 0
-        total_completed_meals = 0
-        total_meals = 0
-        total_water_glasses = 0
-        active_days = 0
-        daily_summaries = []
-        
-        for entry in tracking_data:
-            exercises = entry.get("exercises", [])
-            meals = entry.get("meals", [])
-            
-            day_calories = sum(ex.get("calories_burned", 0) for ex in exercises)
-            day_minutes = sum(ex.get("duration_minutes", 0) for ex in exercises)
-            day_completed_meals = sum(1 for meal in meals if meal.get("completed", False))
-            day_water = entry.get("water_intake", {}).get("glasses", 0)
-            
-            total_calories_burned += day_calories
-            total_exercise_minutes += day_minutes
-            total_completed_meals += day_completed_meals
-            total_meals += len(meals)
-            total_water_glasses += day_water
-            
-            if exercises:
-                active_days += 1
-            
-            daily_summaries.append({
-                "date": entry["tracking_date"],
-                "calories_burned": day_calories,
-                "exercise_minutes": day_minutes,
-                "completed_meals": day_completed_meals,
-                "total_meals": len(meals),
-                "water_glasses": day_water,
-                "weight": entry.get("weight_entry", {}).get("weight"),
-                "mood": entry.get("mood")
-            })
-        
-        meal_completion_rate = (total_completed_meals / total_meals * 100) if total_meals > 0 else 0
-        avg_daily_water = total_water_glasses / 7 if len(tracking_data) > 0 else 0
+        summary, daily_summaries = weekly_summary(tracking_data)
         
         return WeeklySummaryResponse(
             week_start=week_start.isoformat(),
             week_end=week_end.isoformat(),
-            summary={
-                "total_calories_burned": total_calories_burned,
-                "total_exercise_minutes": total_exercise_minutes,
-                "active_days": active_days,
-                "meal_completion_rate": round(meal_completion_rate, 1),
-                "average_daily_water": round(avg_daily_water, 1),
-                "days_tracked": len(tracking_data)
-            },
+            summary=summary,
             daily_summaries=daily_summaries
         )
         
@@ -0,0 +1,134 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+import json
+import logging
+from typing import Dict, Any
+
+from models.jobs import JobRequest, JobSubmitResponse, JobStatusResponse
+from utils.security import verify_token
+from utils.job_queue import (
+    JOB_BUDGETS, JOB_HANDLERS, JOB_MAX_ACTIVE_PER_OWNER, TERMINAL_STATUSES,
+    count_active_jobs, find_duplicate_job, get_job, queue_metrics, submit_job
+)
+from utils.job_worker import get_job_worker_pool
+from utils.llm_gateway import get_llm_gateway, get_route
+from database.config import get_database
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+security = HTTPBearer()
+logger = logging.getLogger(__name__)
+
+# How often the events stream re-reads the job
+EVENTS_POLL_SECONDS = 1.0
+
+def job_status(job: Dict[str, Any]) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job["_id"],
+        type=job["type"],
+        status=job["status"],
+        attempts=job.get("attempts", 0),
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        result=job.get("result"),
+        error=job.get("error"),
+    )
+
+@router.post("", response_model=JobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job_request: JobRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Queue a background job and return its id; poll ``/jobs/{job_id}`` for the result.
+
+    Submitting the same job again while it is queued or running, or shortly after it
+    succeeded, returns the existing job instead of queueing another.
+    """
+    email = verify_token(credentials.credentials)
+    if job_request.type not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job type: {job_request.type}")
+
+    try:
+        db = get_database()
+        duplicate = await find_duplicate_job(db, job_request.type, email, job_request.payload)
+        if duplicate:
+            return JobSubmitResponse(job_id=duplicate["_id"], status=duplicate["status"], deduplicated=True)
+
+        if await count_active_jobs(db, email) >= JOB_MAX_ACTIVE_PER_OWNER:
+            raise HTTPException(status_code=429, detail="Too many jobs in progress. Please wait for one to finish.")
+
+        # Refuse up front rather than queue a job the budget would keep deferring
+        budget = JOB_BUDGETS.get(job_request.type)
+        if budget:
+            await get_llm_gateway().budget.check(budget, email, get_route(budget)["max_tokens"])
+
+        job, deduplicated = await submit_job(db, job_request.type, email, job_request.payload)
+        return JobSubmitResponse(job_id=job["_id"], status=job["status"], deduplicated=deduplicated)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queueing job: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to queue job")
+
+@router.get("/metrics")
+async def get_job_metrics():
+    """Queue depth, jobs by type and status, and this process's workers"""
+    try:
+        metrics = await queue_metrics(get_database())
+        pool = get_job_worker_pool()
+        metrics["workers"] = pool.status() if pool else None
+        return metrics
+    except Exception as e:
+        logger.error(f"Error getting job metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get job metrics")
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(
+    job_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Status of a job, with its result once it has succeeded"""
+    email = verify_token(credentials.credentials)
+    try:
+        job = await get_job(get_database(), job_id, email)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job_status(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get job")
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Server-sent events with the job's status on every change, ending once it has finished"""
+    email = verify_token(credentials.credentials)
+    db = get_database()
+    if not await get_job(db, job_id, email):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last_status = None
+        while True:
+            job = await get_job(db, job_id, email)
+            if not job:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {job_status(job).model_dump_json()}\n\n"
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timedelta
+import logging
+from typing import Optional
+
+from utils.llm_gateway import get_llm_gateway
+from utils.llm_metrics import get_llm_metrics, metrics_history
+from database.config import get_database
+
+router = APIRouter(prefix="/llm", tags=["LLM"])
+logger = logging.getLogger(__name__)
+
+@router.get("/metrics")
+async def get_llm_call_metrics():
+    """Latency, tokens, cost and output validity per task since this process started, with gateway state"""
+    try:
+        gateway = get_llm_gateway()
+        return {
+            "tasks": get_llm_metrics().snapshot(),
+            "budgets": gateway.budget.metrics(),
+            **gateway.resilience_status(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting LLM metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get LLM metrics")
+
+@router.get("/metrics/history")
+async def get_llm_metrics_history(
+    hours: float = Query(24, gt=0, le=24 * 14),
+    until: Optional[datetime] = Query(None, description="End of the window (UTC); defaults to now"),
+    task: Optional[str] = None
+):
+    """Stored per-minute rollups summed per task and model over a window, e.g. yesterday's myth tokens"""
+    try:
+        end = until or datetime.utcnow()
+        start = end - timedelta(hours=hours)
+        return {
+            "since": start,
+            "until": end,
+            "tasks": await metrics_history(get_database(), start, end, task),
+        }
+    except Exception as e:
+        logger.error(f"Error getting LLM metrics history: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get LLM metrics history")
@@ -5,7 +5,9 @@ import logging
 from typing import Dict, Any, List
 from datetime import datetime
 from utils.security import verify_token
-from utils.groq_client import get_groq_client
+from utils.llm_gateway import get_llm_gateway
+from utils.prompt_templates import get_template
+from utils.llm_output import parse_task_output
 
 router = APIRouter(prefix="/myth", tags=["Myth"])
 security = HTTPBearer()
@@ -13,8 +15,17 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Get shared Groq client
-client = get_groq_client()
+MYTH_CARDS_PROMPT = get_template("myth_cards")
+RANDOM_MYTH_PROMPT = get_template("random_myth")
+
+# Topics rotated through by generate-myths
+MYTH_TOPICS = [
+    "WEIGHT LOSS misconceptions. Make them completely different from common myths about carbs, water, and fat. Focus on topics like meal timing, specific foods, exercise myths, or metabolism myths.",
+    "SUPPLEMENTS and VITAMINS. Focus on misconceptions about specific supplements, vitamin requirements, or supplement effectiveness.",
+    "FOOD TIMING and MEAL PATTERNS. Focus on when to eat, meal frequency, fasting myths, or eating windows.",
+    "SPECIFIC FOODS and SUPERFOODS. Focus on misconceptions about particular foods, superfood claims, or food combinations.",
+    "METABOLISM and BODY PROCESSES. Focus on how the body processes food, metabolic rate myths, or digestive misconceptions.",
+]
 
 @router.get("/generate-myths")
 async def generate_myth_facts(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -25,128 +36,26 @@ async def generate_myth_facts(credentials: HTTPAuthorizationCredentials = Depend
         
         import random
         
-        # Create dynamic prompts with different focuses
-        prompt_variations = [
-            """Generate 4 unique nutrition myths focusing on WEIGHT LOSS misconceptions. Make them completely different from common myths about carbs, water, and fat. Focus on topics like meal timing, specific foods, exercise myths, or metabolism myths. Use this JSON format:
-
-{
-  "myths": [
-    {
-      "id": 1,
-      "myth": "Myth: [unique weight loss myth]",
-      "fact": "Fact: [scientific truth]",
-      "explanation": "Detailed explanation with scientific backing"
-    }
-  ]
-}
-
-Be creative and avoid common myths. Return only JSON.""",
-            
-            """Generate 4 unique nutrition myths about SUPPLEMENTS and VITAMINS. Focus on misconceptions about specific supplements, vitamin requirements, or supplement effectiveness. Use this JSON format:
-
-{
-  "myths": [
-    {
-      "id": 1,
-      "myth": "Myth: [unique supplement/vitamin myth]",
-      "fact": "Fact: [scientific truth]",
-      "explanation": "Detailed explanation with scientific backing"
-    }
-  ]
-}
-
-Be creative and avoid common myths. Return only JSON.""",
-            
-            """Generate 4 unique nutrition myths about FOOD TIMING and MEAL PATTERNS. Focus on when to eat, meal frequency, fasting myths, or eating windows. Use this JSON format:
-
-{
-  "myths": [
-    {
-      "id": 1,
-      "myth": "Myth: [unique food timing myth]",
-      "fact": "Fact: [scientific truth]",
-      "explanation": "Detailed explanation with scientific backing"
-    }
-  ]
-}
-
-Be creative and avoid common myths. Return only JSON.""",
-            
-            """Generate 4 unique nutrition myths about SPECIFIC FOODS and SUPERFOODS. Focus on misconceptions about particular foods, superfood claims, or food combinations. Use this JSON format:
-
-{
-  "myths": [
-    {
-      "id": 1,
-      "myth": "Myth: [unique food/superfood myth]",
-      "fact": "Fact: [scientific truth]",
-      "explanation": "Detailed explanation with scientific backing"
-    }
-  ]
-}
-
-Be creative and avoid common myths. Return only JSON.""",
-            
-            """Generate 4 unique nutrition myths about METABOLISM and BODY PROCESSES. Focus on how the body processes food, metabolic rate myths, or digestive misconceptions. Use this JSON format:
-
-{
-  "myths": [
-    {
-      "id": 1,
-      "myth": "Myth: [unique metabolism myth]",
-      "fact": "Fact: [scientific truth]",
-      "explanation": "Detailed explanation with scientific backing"
-    }
-  ]
-}
-
-Be creative and avoid common myths. Return only JSON."""
-        ]
-        
-        # Randomly select a prompt variation
-        prompt = random.choice(prompt_variations)
+        # Randomly select a topic; the instructions themselves are the same for every request
+        topic = random.choice(MYTH_TOPICS)
 
         logger.info("Making Groq API call for myth generation...")
         
         # Add timestamp to ensure uniqueness
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        enhanced_prompt = f"{prompt}\n\nCurrent timestamp: {timestamp}\n\nIMPORTANT: Generate completely unique myths that are different from typical nutrition myths. Be creative and specific."
         
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": enhanced_prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
-            max_tokens=4000,
-            temperature=0.9
+        chat_completion = await get_llm_gateway().complete(
+            "myth_cards",
+            MYTH_CARDS_PROMPT.render(topic=topic, timestamp=timestamp),
+            user=email,
         )
 
         # Parse the response
         response_content = chat_completion.choices[0].message.content.strip()
         logger.info(f"Groq API response received: {len(response_content)} characters")
-        logger.info(f"Response preview: {response_content[:200]}...")
         
         try:
-            # Remove any potential markdown formatting
-            if response_content.startswith("```json"):
-                response_content = response_content.replace("```json", "").replace("```json", "").replace("```", "")
-            elif response_content.startswith("```"):
-                response_content = response_content.replace("```","")
-            
-            myths_data = json.loads(response_content)
-            
-            # Validate the required structure
-            if "myths" not in myths_data or not isinstance(myths_data["myths"], list):
-                raise ValueError("Invalid myths data structure")
-            
-            for myth in myths_data["myths"]:
-                required_fields = ["id", "myth", "fact", "explanation"]
-                if not all(field in myth for field in required_fields):
-                    raise ValueError("Missing required fields in myth data")
+            myths_data = parse_task_output("myth_cards", response_content, chat_completion.model)
             
             logger.info("Myth facts generated successfully")
             return myths_data
@@ -183,6 +92,8 @@ Be creative and avoid common myths. Return only JSON."""
                 ]
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Myth generation error: {str(e)}")
         logger.error(f"Error type: {type(e).__name__}")
@@ -230,37 +141,17 @@ async def get_random_myth(credentials: HTTPAuthorizationCredentials = Depends(se
         # Verify token
         email = verify_token(credentials.credentials)
         
-        # Generate a single myth
-        prompt = """Generate 1 nutrition myth with fact in JSON format:
 
-{
-  "myth": "Myth: [common nutrition misconception]",
-  "fact": "Fact: [scientific truth]",
-  "explanation": "Brief explanation with scientific backing"
-}
-
-Make it educational and surprising. Return only JSON."""
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
+        chat_completion = await get_llm_gateway().complete(
+            "random_myth",
+            RANDOM_MYTH_PROMPT.render(),
+            user=email,
         )
 
-        response_content = chat_completion.choices.message.content.strip()
+        response_content = chat_completion.choices[0].message.content.strip()
         
         try:
-            if response_content.startswith("```json"):
-                response_content = response_content.replace("```json", "").replace("```json", "").replace("```", "")
-            elif response_content.startswith("```"):
-                response_content = response_content.replace("```","")
-            
-            myth_data = json.loads(response_content)
+            myth_data = parse_task_output("random_myth", response_content, chat_completion.model)
             return myth_data
             
         except (json.JSONDecodeError, ValueError):
@@ -271,6 +162,8 @@ Make it educational and surprising. Return only JSON."""
                 "explanation": "Weight gain occurs when you consume more calories than you burn over time, regardless of when you eat. However, late-night eating may lead to poor food choices."
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Random myth error: {str(e)}")
         return {
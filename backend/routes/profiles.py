@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Header, Query, Depends
+from fastapi.responses import PlainTextResponse
+import logging
+from typing import Optional
+
+from utils.request_profiler import verify_profile_token
+from database.config import get_database
+
+router = APIRouter(prefix="/profiles", tags=["Profiles"])
+logger = logging.getLogger(__name__)
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    """Profiles show code paths and timings, so reading them takes the same signed token as recording them"""
+    if not verify_profile_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Valid X-Profile-Token header required")
+
+@router.get("", dependencies=[Depends(require_profile_token)])
+async def list_profiles(route: Optional[str] = None, limit: int = Query(50, gt=0, le=500)):
+    """Recent request profiles, newest first, optionally for one route template"""
+    try:
+        query = {"route": route} if route else {}
+        cursor = get_database().request_profiles.find(query, {"_id": 0, "folded": 0, "expires_at": 0})
+        return {"profiles": await cursor.sort("started_at", -1).to_list(length=limit)}
+    except Exception as e:
+        logger.error(f"Error listing request profiles: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to list request profiles")
+
+@router.get("/{request_id}", dependencies=[Depends(require_profile_token)])
+async def get_profile(request_id: str, format: str = Query("json", pattern="^(json|folded)$")):
+    """One request's profile; format=folded returns the stacks alone for flamegraph.pl or speedscope"""
+    try:
+        profile = await get_database().request_profiles.find_one({"request_id": request_id}, {"_id": 0, "expires_at": 0})
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        if format == "folded":
+            return PlainTextResponse(profile["folded"])
+        return profile
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting request profile: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get request profile")
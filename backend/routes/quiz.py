@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 import json
 import logging
 from typing import Dict, Any
 from utils.security import verify_token
-from utils.groq_client import get_groq_client
+from utils.llm_gateway import get_llm_gateway, requester_key
+from utils.prompt_templates import get_template
+from utils.llm_output import parse_task_output
 
 router = APIRouter(prefix="/quiz", tags=["Quiz"])
 security = HTTPBearer()
@@ -13,42 +15,18 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Get shared Groq client
-client = get_groq_client()
+TIP_PROMPT = get_template("tip_of_the_day")
+QUIZ_PROMPT = get_template("quiz_question")
 
 @router.get("/tip-of-the-day")
-async def generate_tip_of_the_day():
+async def generate_tip_of_the_day(request: Request):
     """Generate an AI-powered nutrition tip of the day"""
     try:
-        # Create a prompt for nutrition tips
-        prompt = """Generate a single nutrition and health tip of the day with the following JSON format:
-        {
-            "title": "A catchy, short title for the tip (max 50 characters)",
-            "tip": "A practical, actionable nutrition or health tip that users can implement today",
-            "category": "One of: Nutrition, Hydration, Exercise, Sleep, Mental Health, or General Wellness",
-            "difficulty": "Easy, Moderate, or Advanced",
-            "benefits": "Brief explanation of why this tip is beneficial (1-2 sentences)"
-        }
-        
-        Make sure the tip is:
-        - Practical and actionable
-        - Related to nutrition, diet, wellness, or healthy lifestyle
-        - Something users can implement today
-        - Motivational and positive
-        - Based on sound health principles
-        - Suitable for general audience
-        
-        Return only the JSON object, no additional text."""
 
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
+        chat_completion = await get_llm_gateway().complete(
+            "tip_of_the_day",
+            TIP_PROMPT.render(),
+            user=requester_key(request),
         )
 
         # Parse the response
@@ -56,18 +34,7 @@ async def generate_tip_of_the_day():
         
         # Try to extract JSON from the response
         try:
-            # Remove any potential markdown formatting
-            if response_content.startswith("```json"):
-                response_content = response_content.replace("```json", "").replace("```json", "").replace("```", "")
-            elif response_content.startswith("```"):
-                response_content = response_content.replace("```","")
-            
-            tip_data = json.loads(response_content)
-            
-            # Validate the required fields
-            required_fields = ["title", "tip", "category", "difficulty", "benefits"]
-            if not all(field in tip_data for field in required_fields):
-                raise ValueError("Missing required fields in tip data")
+            tip_data = parse_task_output("tip_of_the_day", response_content, chat_completion.model)
             
             logger.info("Tip of the day generated successfully")
             return tip_data
@@ -83,6 +50,8 @@ async def generate_tip_of_the_day():
                 "benefits": "Proper hydration improves energy levels, supports brain function, and helps maintain healthy skin."
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Tip generation error: {str(e)}")
         # Return fallback tip
@@ -101,32 +70,11 @@ async def generate_quiz_question(credentials: HTTPAuthorizationCredentials = Dep
         # Verify token (optional - remove if you want public access)
         email = verify_token(credentials.credentials)
         
-        # Create a prompt for nutrition-related quiz questions
-        prompt = """Generate a single nutrition and health quiz question with the following JSON format:
-        {
-            "question": "A clear, educational question about nutrition, diet, or health",
-            "options": ["Option A", "Option B", "Option C", "Option D"],
-            "correct_answer": 0,
-            "explanation": "A brief explanation of why this answer is correct and educational information"
-        }
-        
-        Make sure the question is:
-        - Educational and informative
-        - Related to nutrition, diet, wellness, or healthy lifestyle
-        - Not too difficult but engaging
-        - Suitable for people interested in improving their health
-        
-        Return only the JSON object, no additional text."""
 
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            stream=False,
+        chat_completion = await get_llm_gateway().complete(
+            "quiz_question",
+            QUIZ_PROMPT.render(),
+            user=email,
         )
 
         # Parse the response
@@ -134,21 +82,7 @@ async def generate_quiz_question(credentials: HTTPAuthorizationCredentials = Dep
         
         # Try to extract JSON from the response
         try:
-            # Remove any potential markdown formatting
-            if response_content.startswith("```json"):
-                response_content = response_content.replace("```json", "").replace("```json", "").replace("```", "")
-            elif response_content.startswith("```"):
-                response_content = response_content.replace("```","")
-            
-            quiz_data = json.loads(response_content)
-            
-            # Validate the required fields
-            required_fields = ["question", "options", "correct_answer", "explanation"]
-            if not all(field in quiz_data for field in required_fields):
-                raise ValueError("Missing required fields in quiz data")
-            
-            if len(quiz_data["options"]) != 4:
-                raise ValueError("Quiz must have exactly 4 options")
+            quiz_data = parse_task_output("quiz_question", response_content, chat_completion.model)
             
             logger.info("Quiz question generated successfully")
             return quiz_data
@@ -163,6 +97,8 @@ async def generate_quiz_question(credentials: HTTPAuthorizationCredentials = Dep
                 "explanation": "Protein is essential for building and repairing muscle tissue. It provides amino acids that serve as building blocks for muscle fibers."
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Quiz generation error: {str(e)}")
         # Return fallback quiz question
@@ -12,6 +12,7 @@ from models.user import (
 )
 from utils.security import verify_token
 from database.config import get_database
+from utils.plan_prefetch import PREFETCH_ENABLED, schedule_plan_prefetch
 
 router = APIRouter(prefix="/profile", tags=["User Profile"])
 security = HTTPBearer()
@@ -131,6 +132,12 @@ async def update_user_profile(
         
         update_dict["updated_at"] = datetime.utcnow()
 
+        # Previous health profile, needed to decide whether a new diet plan is worth prefetching
+        previous_profile = None
+        if "health_profile" in update_dict and PREFETCH_ENABLED:
+            previous_user = await users_collection.find_one({"email": email}, {"health_profile": 1})
+            previous_profile = (previous_user or {}).get("health_profile") or {}
+
         # Update user
         result = await users_collection.update_one(
             {"email": email},
@@ -143,6 +150,9 @@ async def update_user_profile(
                 detail="User not found"
             )
 
+        if previous_profile is not None:
+            schedule_plan_prefetch(email, previous_profile, update_dict["health_profile"])
+
         # Get updated user
         updated_user = await users_collection.find_one({"email": email})
         
@@ -0,0 +1,179 @@
+"""Exercise the LLM gateway's hedging, fallback chain and circuit breakers against the fake Groq server.
+
+Usage (from the backend directory):
+    python tools/check_llm_resilience.py [--calls 40]
+
+Starts tools/fake_groq.py in-process on a free port, runs one scenario per behaviour and
+exits non-zero if the gateway did not react as expected. The disconnect scenario streams through
+a StreamingResponse whose client leaves after the first chunk, with a budget store that
+suspends on every call like motor does, and checks the unused reservation is refunded.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from groq import AsyncGroq  # noqa: E402
+from starlette.responses import StreamingResponse  # noqa: E402
+
+from tools.fake_groq import create_app  # noqa: E402
+from utils.llm_gateway import DEFAULT_TASK_BUDGET, LLMGateway, LLMUnavailable, MemoryBucketStore, TokenBudget  # noqa: E402
+from utils.llm_metrics import LLMMetrics  # noqa: E402
+from utils.llm_resilience import FALLBACK_CHAIN, HEDGE_MIN_SAMPLES  # noqa: E402
+
+PRIMARY = FALLBACK_CHAIN[0]
+MESSAGES = [{"role": "system", "content": "You are NutriBot."}, {"role": "user", "content": "How much fibre per day?"}]
+
+
+def start_fake_server() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app({"latency_ms": 50, "jitter_ms": 10}, seed=7), port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/_fake/stats")
+            return base_url
+        except httpx.TransportError:
+            time.sleep(0.05)
+    raise RuntimeError("Fake Groq server did not start")
+
+
+def configure(base_url: str, config: dict):
+    httpx.post(f"{base_url}/_fake/reset")
+    httpx.put(f"{base_url}/_fake/config", json=config)
+
+
+async def run_calls(gateway: LLMGateway, task: str, calls: int):
+    models, unavailable, latencies = [], 0, []
+    for _ in range(calls):
+        started = time.perf_counter()
+        try:
+            completion = await gateway.complete(task, MESSAGES, model=PRIMARY, max_tokens=200)
+            models.append(completion.model)
+        except LLMUnavailable:
+            unavailable += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    return models, unavailable, sorted(latencies)
+
+
+class ExecutorBucketStore(MemoryBucketStore):
+    """In-process buckets that suspend on every call in a worker thread, the way motor's collection methods do"""
+
+    async def take(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.005)
+        return await super().take(key, capacity, rate, amount)
+
+    async def adjust(self, key: str, capacity: float, rate: float, delta: float):
+        await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.005)
+        await super().adjust(key, capacity, rate, delta)
+
+
+async def disconnect_after_first_chunk(gateway: LLMGateway, max_tokens: int):
+    """Stream a chat answer the way the chatbot route does, to a client that leaves after the first chunk"""
+
+    async def events():
+        stream = await gateway.stream("disconnect", MESSAGES, user="check", model=PRIMARY, max_tokens=max_tokens)
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield f"data: {delta}\n\n"
+        finally:
+            await stream.close()
+
+    first_chunk = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_chunk.set()
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""}
+    await StreamingResponse(events(), media_type="text/event-stream")(scope, receive, send)
+
+
+def report(name: str, ok: bool, detail: str) -> bool:
+    print(f"[{'ok' if ok else 'FAIL'}] {name}: {detail}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=40)
+    args = parser.parse_args()
+
+    base_url = start_fake_server()
+    client = AsyncGroq(api_key="fake-key", base_url=base_url, max_retries=0, timeout=10)
+    results = []
+
+    # Tail latency: once enough calls are timed, slow ones are hedged and the duplicate wins
+    gateway = LLMGateway(client=client)
+    configure(base_url, {"default": {"latency_ms": 50, "jitter_ms": 10, "slow_rate": 0.04, "slow_ms": 1500}})
+    _, _, latencies = await run_calls(gateway, "hedging", max(args.calls, HEDGE_MIN_SAMPLES) * 3)
+    tracker = gateway.latency[("hedging", PRIMARY)]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    results.append(report("hedging", tracker.hedges > 0, f"{tracker.hedges} hedged of {tracker.calls} calls, p99 {p99:.0f} ms"))
+
+    # Primary model failing: calls move to the next model and the primary's circuit opens
+    if len(FALLBACK_CHAIN) > 1:
+        gateway = LLMGateway(client=client)
+        configure(base_url, {"models": {PRIMARY: {"error_rate": 1.0, "latency_ms": 20}}})
+        models, unavailable, _ = await run_calls(gateway, "fallback", args.calls)
+        primary_requests = httpx.get(f"{base_url}/_fake/stats").json().get(PRIMARY, {}).get("requests", 0)
+        breaker = gateway.breaker(PRIMARY)
+        results.append(report(
+            "fallback",
+            unavailable == 0 and set(models) == {FALLBACK_CHAIN[1]} and breaker.state == "open" and primary_requests < args.calls,
+            f"served by {sorted(set(models))}, {PRIMARY} circuit {breaker.state} after {primary_requests} requests",
+        ))
+
+    # Every model down: calls fail fast once all circuits are open
+    gateway = LLMGateway(client=client)
+    configure(base_url, {"default": {"error_rate": 1.0, "latency_ms": 200}})
+    _, unavailable, latencies = await run_calls(gateway, "outage", args.calls)
+    results.append(report(
+        "outage",
+        unavailable == args.calls and latencies[len(latencies) // 2] < 50,
+        f"{unavailable} unavailable, median {latencies[len(latencies) // 2]:.1f} ms, "
+        f"breakers {[b['state'] for b in gateway.resilience_status()['breakers'].values()]}",
+    ))
+
+    # Client leaving mid-stream: the reservation is still settled and the call recorded, with a store that awaits
+    store = ExecutorBucketStore()
+    gateway = LLMGateway(client=client, budget=TokenBudget(store), metrics=LLMMetrics())
+    configure(base_url, {"default": {"error_rate": 0.0, "latency_ms": 20, "jitter_ms": 0, "chunk_delay_ms": 50}})
+    await disconnect_after_first_chunk(gateway, max_tokens=2000)
+    capacity = DEFAULT_TASK_BUDGET[0]
+    owed = capacity - store.buckets["disconnect:check"].tokens
+    stats = gateway.metrics.tasks.get("disconnect")
+    cancelled = stats.counts["cancelled"] if stats else 0
+    results.append(report(
+        "disconnect",
+        owed < 200 and cancelled == 1 and not gateway.breaker(PRIMARY).probe_in_flight,
+        f"{owed:.0f} of 2000+ reserved tokens still charged, {cancelled} cancelled call recorded",
+    ))
+
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""Report how often the NutriBot answer cache would answer the bundled sample questions.
+
+Usage (from the backend directory):
+    python tools/evaluate_answer_cache.py [--samples path/to/samples.jsonl] [--threshold 0.85] [--errors]
+
+Each sample group starts with a question the widget or the load test asks (the quick-question
+buttons among them), cached with a placeholder answer, followed by paraphrases that are looked up
+against it. Samples marked personal carry the asker's own measurements or health details. The
+script exits with status 1 if a general question is kept out of the cache or a personal one is not.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import answer_cache  # noqa: E402
+from utils.answer_cache import AnswerCache, is_personal  # noqa: E402
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "answer_cache_samples.jsonl")
+
+
+def load_samples(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", default=SAMPLES_PATH, help="JSONL file with text and either group or personal fields")
+    parser.add_argument("--threshold", type=float, default=answer_cache.SIMILARITY_THRESHOLD)
+    parser.add_argument("--errors", action="store_true", help="list paraphrases that missed or hit the wrong question")
+    args = parser.parse_args()
+    answer_cache.SIMILARITY_THRESHOLD = args.threshold
+
+    samples = load_samples(args.samples)
+    general = [s for s in samples if not s.get("personal")]
+    personal = [s for s in samples if s.get("personal")]
+
+    cache = AnswerCache()
+    cached = set()
+    for sample in general:
+        if sample["text"] == sample["group"] and not is_personal(sample["text"]):
+            cache.add(sample["text"], f"answer to {sample['group']}", {"group": sample["group"]})
+            cached.add(sample["group"])
+
+    outcomes = {"hit": 0, "wrong_hit": 0, "miss": 0, "bypass": 0}
+    errors = []
+    for sample in general:
+        if sample["text"] == sample["group"]:
+            if sample["group"] not in cached:
+                outcomes["bypass"] += 1
+                errors.append(("bypass", sample["text"], None))
+            continue
+        if is_personal(sample["text"]):
+            outcomes["bypass"] += 1
+            errors.append(("bypass", sample["text"], None))
+            continue
+        match = cache.search(sample["text"])
+        if match is None:
+            outcomes["miss"] += 1
+            errors.append(("miss", sample["text"], None))
+        elif match[0]["group"] == sample["group"]:
+            outcomes["hit"] += 1
+        else:
+            outcomes["wrong_hit"] += 1
+            errors.append(("wrong hit", sample["text"], match[0]["group"]))
+
+    looked_up = sum(1 for s in general if s["text"] != s["group"])
+    leaked = [s["text"] for s in personal if not is_personal(s["text"])]
+    print(f"threshold: {args.threshold}")
+    print(f"cached questions: {len(cached)} of {len({s['group'] for s in general})}")
+    print(f"paraphrases: {looked_up}")
+    for outcome, count in outcomes.items():
+        print(f"  {outcome:<10}{count:>5}{count / looked_up:>8.0%}" if looked_up else f"  {outcome:<10}{count:>5}")
+    print(f"personal questions kept out of the cache: {len(personal) - len(leaked)} of {len(personal)}")
+    if args.errors:
+        for kind, text, other in errors:
+            print(f"  {kind}: {text}" + (f" -> {other}" if other else ""))
+
+    bypassed = [text for kind, text, _ in errors if kind == "bypass"]
+    if bypassed or leaked:
+        for text in bypassed:
+            print(f"  general question treated as personal: {text!r}")
+        for text in leaked:
+            print(f"  personal question would be cached: {text!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
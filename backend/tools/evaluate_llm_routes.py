@@ -0,0 +1,161 @@
+"""Replay prompts against candidate models and compare latency, token cost and schema validity per task.
+
+Usage (from the backend directory):
+    python tools/evaluate_llm_routes.py [--prompts recorded.jsonl] [--models a,b] [--tasks t1,t2]
+                                        [--repeat 3] [--concurrency 4] [--json report.json]
+
+Prompts come from a file recorded with LLM_RECORD_PROMPTS_PATH, or are rendered from the
+prompt templates when no file is given. Each call uses the task's route from
+data/llm_routes.json with only the model swapped. Set GROQ_BASE_URL to run against
+tools/fake_groq.py instead of Groq.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from groq import AsyncGroq  # noqa: E402
+
+from utils.llm_gateway import get_route  # noqa: E402
+from utils.llm_metrics import PRICES_PER_MILLION  # noqa: E402
+from utils.llm_output import validate_output  # noqa: E402
+from utils.llm_resilience import FALLBACK_CHAIN  # noqa: E402
+from utils.prompt_templates import get_template  # noqa: E402
+
+DEFAULT_TASKS = ["tip_of_the_day", "quiz_question", "random_myth", "myth_cards"]
+
+SAMPLE_PLAN_INPUTS = {
+    "age": 34, "gender": "female", "weight": 72, "height": 165, "bmi": "26.4",
+    "activity_level": "moderate", "primary_goal": "weight_loss", "target_weight": 64,
+    "dietary_preferences": "vegetarian", "allergies": "nuts", "health_conditions": "None",
+    "daily_calories": 1650, "protein_grams": 103, "carbs_grams": 186, "fat_grams": 55,
+}
+
+
+def template_prompts() -> List[Dict[str, Any]]:
+    """One prompt per variant the routes can send, rendered from the templates"""
+    from routes.myth import MYTH_TOPICS
+
+    prompts = [
+        {"task": "tip_of_the_day", "messages": get_template("tip_of_the_day").render()},
+        {"task": "quiz_question", "messages": get_template("quiz_question").render()},
+        {"task": "random_myth", "messages": get_template("random_myth").render()},
+        {"task": "diet_plan", "messages": get_template("diet_plan").render(**SAMPLE_PLAN_INPUTS)},
+    ]
+    for topic in MYTH_TOPICS:
+        prompts.append({
+            "task": "myth_cards",
+            "messages": get_template("myth_cards").render(topic=topic, timestamp="2025-01-01 12:00:00"),
+        })
+    return prompts
+
+
+def load_prompts(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], p: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run_one(client: AsyncGroq, semaphore: asyncio.Semaphore, prompt: Dict[str, Any], model: str) -> Dict[str, Any]:
+    route = {**get_route(prompt["task"]), "model": model}
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            completion = await client.chat.completions.create(messages=prompt["messages"], stream=False, **route)
+        except Exception as e:
+            return {"task": prompt["task"], "model": model, "error": type(e).__name__}
+        latency_ms = (time.perf_counter() - started) * 1000
+    _, problem = validate_output(prompt["task"], completion.choices[0].message.content or "")
+    return {
+        "task": prompt["task"],
+        "model": model,
+        "latency_ms": latency_ms,
+        "prompt_tokens": completion.usage.prompt_tokens,
+        "completion_tokens": completion.usage.completion_tokens,
+        "valid": problem is None,
+        "truncated": completion.choices[0].finish_reason == "length",
+    }
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    groups = defaultdict(list)
+    for result in results:
+        groups[(result["task"], result["model"])].append(result)
+
+    summary = {}
+    for (task, model), group in sorted(groups.items()):
+        answered = [r for r in group if "error" not in r]
+        latencies = [r["latency_ms"] for r in answered]
+        prompt_tokens = sum(r["prompt_tokens"] for r in answered)
+        completion_tokens = sum(r["completion_tokens"] for r in answered)
+        input_price, output_price = PRICES_PER_MILLION.get(model, (None, None))
+        cost_per_1k = None
+        if answered and input_price is not None:
+            cost_per_1k = (prompt_tokens * input_price + completion_tokens * output_price) / len(answered) / 1000
+        summary[f"{task}:{model}"] = {
+            "task": task,
+            "model": model,
+            "calls": len(group),
+            "errors": len(group) - len(answered),
+            "valid_rate": round(sum(r["valid"] for r in answered) / len(answered), 3) if answered else None,
+            "truncated": sum(r["truncated"] for r in answered),
+            "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+            "avg_prompt_tokens": round(prompt_tokens / len(answered), 1) if answered else None,
+            "avg_completion_tokens": round(completion_tokens / len(answered), 1) if answered else None,
+            "usd_per_1k_calls": round(cost_per_1k, 4) if cost_per_1k is not None else None,
+        }
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", help="JSONL of recorded prompts (task and messages per line)")
+    parser.add_argument("--models", default=",".join(FALLBACK_CHAIN), help="comma-separated models to compare")
+    parser.add_argument("--tasks", default=",".join(DEFAULT_TASKS), help="comma-separated tasks to replay")
+    parser.add_argument("--repeat", type=int, default=3, help="calls per prompt and model")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--json", dest="json_path", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    tasks = set(args.tasks.split(","))
+    models = [m for m in args.models.split(",") if m]
+    prompts = [p for p in (load_prompts(args.prompts) if args.prompts else template_prompts()) if p["task"] in tasks]
+    if not prompts:
+        sys.exit("No prompts to replay for the selected tasks")
+
+    client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = await asyncio.gather(*[
+        run_one(client, semaphore, prompt, model)
+        for prompt in prompts for model in models for _ in range(args.repeat)
+    ])
+    summary = summarize(results)
+
+    header = f"{'task':<16}{'model':<26}{'calls':>6}{'err':>5}{'valid':>7}{'trunc':>6}{'p50 ms':>9}{'p95 ms':>9}{'in tok':>8}{'out tok':>8}{'$/1k':>9}"
+    print(header)
+    for row in summary.values():
+        print(
+            f"{row['task']:<16}{row['model']:<26}{row['calls']:>6}{row['errors']:>5}{str(row['valid_rate']):>7}"
+            f"{row['truncated']:>6}{str(row['p50_ms']):>9}{str(row['p95_ms']):>9}"
+            f"{str(row['avg_prompt_tokens']):>8}{str(row['avg_completion_tokens']):>8}{str(row['usd_per_1k_calls']):>9}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""Report precision and recall of the NutriBot topic gate on the bundled labelled sample.
+
+Usage (from the backend directory):
+    python tools/evaluate_topic_gate.py [--samples path/to/samples.jsonl] [--errors]
+
+The bundled sample includes empty, gibberish, spam and abusive messages. Those must never
+reach the LLM, so the script exits with status 1 if any of them is let through as on_topic.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.topic_gate import ABUSE, EMPTY, GIBBERISH, ON_TOPIC, SAMPLES_PATH, SPAM, evaluate, load_samples  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", default=SAMPLES_PATH, help="JSONL file with text and label fields")
+    parser.add_argument("--errors", action="store_true", help="list misclassified samples")
+    args = parser.parse_args()
+
+    report = evaluate(load_samples(args.samples))
+    print(f"accuracy: {report['accuracy']}")
+    print(f"{'label':<12}{'precision':>10}{'recall':>10}{'support':>10}")
+    for label, metrics in report["labels"].items():
+        print(f"{label:<12}{str(metrics['precision']):>10}{str(metrics['recall']):>10}{metrics['support']:>10}")
+    if args.errors:
+        for error in report["errors"]:
+            print(f"  expected {error['expected']}, got {error['predicted']}: {error['text']}")
+
+    leaked = [e for e in report["errors"] if e["expected"] in (EMPTY, GIBBERISH, SPAM, ABUSE) and e["predicted"] == ON_TOPIC]
+    if leaked:
+        print(f"{len(leaked)} junk messages would reach the LLM:")
+        for error in leaked:
+            print(f"  {error['expected']}: {error['text']!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
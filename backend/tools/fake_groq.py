@@ -0,0 +1,181 @@
+"""Fake Groq server speaking the OpenAI-compatible chat completions API, with injectable latency and errors.
+
+Usage (from the backend directory):
+    python tools/fake_groq.py [--port 8100] [--latency-ms 300] [--error-rate 0.2] [--error-status 503]
+
+Then start the backend with GROQ_BASE_URL=http://127.0.0.1:8100 so every LLM call goes here.
+Behaviour can be changed while running, per model:
+    PUT  /_fake/config  {"default": {...}, "models": {"llama-3.3-70b-versatile": {"latency_ms": 5000}}}
+    GET  /_fake/stats   request, error and stream counts per model
+    POST /_fake/reset   clear stats and per-model overrides
+Settings: latency_ms and jitter_ms (time to the full response, or to the first chunk when
+streaming), slow_rate and slow_ms (a share of calls that take slow_ms longer, for tail latency),
+chunk_delay_ms, error_rate, error_status and content.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_CONTENT = "Eating a variety of vegetables, whole grains and lean proteins covers most nutrient needs."
+
+DEFAULT_BEHAVIOUR = {
+    "latency_ms": 200,
+    "jitter_ms": 50,
+    "slow_rate": 0.0,
+    "slow_ms": 2000,
+    "chunk_delay_ms": 5,
+    "error_rate": 0.0,
+    "error_status": 503,
+    "content": DEFAULT_CONTENT,
+}
+
+
+def _tokens(text: str) -> int:
+    return max(1, (len(text) + 3) // 4)
+
+
+def create_app(default: Dict[str, Any] = None, seed: int = None) -> FastAPI:
+    """Build a fake server; ``default`` overrides DEFAULT_BEHAVIOUR for every model"""
+    app = FastAPI(title="Fake Groq")
+    state = {
+        "default": {**DEFAULT_BEHAVIOUR, **(default or {})},
+        "models": {},
+        "stats": {},
+        "random": random.Random(seed),
+    }
+
+    def behaviour(model: str) -> Dict[str, Any]:
+        return {**state["default"], **state["models"].get(model, {})}
+
+    def count(model: str, name: str):
+        state["stats"].setdefault(model, Counter())[name] += 1
+
+    async def wait(settings: Dict[str, Any]):
+        delay_ms = settings["latency_ms"] + state["random"].uniform(-1, 1) * settings["jitter_ms"]
+        if state["random"].random() < settings["slow_rate"]:
+            delay_ms += settings["slow_ms"]
+        await asyncio.sleep(max(0.0, delay_ms) / 1000)
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "unknown")
+        settings = behaviour(model)
+        count(model, "requests")
+
+        if state["random"].random() < settings["error_rate"]:
+            await wait(settings)
+            count(model, "errors")
+            return JSONResponse(
+                status_code=settings["error_status"],
+                content={"error": {"message": "Injected failure from fake Groq", "type": "fake_error"}},
+            )
+
+        content = settings["content"]
+        prompt_tokens = sum(_tokens(str(m.get("content", ""))) for m in body.get("messages", []))
+        completion_tokens = _tokens(content)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await wait(settings)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        count(model, "streams")
+
+        async def events():
+            await wait(settings)
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(settings["chunk_delay_ms"] / 1000)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"id": completion_id, "usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.put("/_fake/config")
+    async def configure(config: Dict[str, Any]):
+        state["default"].update(config.get("default", {}))
+        for model, settings in config.get("models", {}).items():
+            state["models"].setdefault(model, {}).update(settings)
+        return {"default": state["default"], "models": state["models"]}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {model: dict(counts) for model, counts in state["stats"].items()}
+
+    @app.post("/_fake/reset")
+    async def reset():
+        state["models"].clear()
+        state["stats"].clear()
+        return {"status": "reset"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_BEHAVIOUR["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_BEHAVIOUR["jitter_ms"])
+    parser.add_argument("--slow-rate", type=float, default=DEFAULT_BEHAVIOUR["slow_rate"])
+    parser.add_argument("--slow-ms", type=float, default=DEFAULT_BEHAVIOUR["slow_ms"])
+    parser.add_argument("--chunk-delay-ms", type=float, default=DEFAULT_BEHAVIOUR["chunk_delay_ms"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_BEHAVIOUR["error_rate"])
+    parser.add_argument("--error-status", type=int, default=DEFAULT_BEHAVIOUR["error_status"])
+    parser.add_argument("--content-file", help="file whose text every completion returns")
+    parser.add_argument("--seed", type=int, help="seed for jitter and injected errors")
+    args = parser.parse_args()
+
+    default = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "slow_rate": args.slow_rate,
+        "slow_ms": args.slow_ms,
+        "chunk_delay_ms": args.chunk_delay_ms,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+    }
+    if args.content_file:
+        with open(args.content_file, "r", encoding="utf-8") as f:
+            default["content"] = f.read()
+
+    import uvicorn
+    uvicorn.run(create_app(default, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
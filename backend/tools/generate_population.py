@@ -0,0 +1,393 @@
+"""Fill MongoDB with a synthetic, reproducible user population for benchmarks and load tests.
+
+Usage (from the backend directory):
+    python tools/generate_population.py --users 10000 --days 90 [--seed 42] [--mongo-url URL] [--database Diet]
+                                        [--batch-size 5000] [--concurrency 4] [--dry-run]
+
+Each user gets a health profile, one goal_tracking document per day for --days days up to
+today (meals, water, exercise, mood, sleep), a noisy weight_logs trajectory towards their
+goal, a few consultation bookings and, for some, a contact message. Documents are built with
+the app's Pydantic models, so they have the shape the API writes, and are inserted in
+unordered insert_many batches, several at a time.
+
+Every synthetic user can log in as synthetic<user_id>@example.com with the password
+Synthetic123. The same --seed gives the same population, ObjectIds included, for the same
+starting user_id and the same day (dates are relative to today).
+Only point this at a disposable database: it adds data and never removes any.
+"""
+import argparse
+import asyncio
+import calendar
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.consultation import ConsultationBookingInDB
+from models.contact import ContactRequest
+from models.goal_tracking import DailyGoalTracking, ExerciseEntry, MealEntry, WaterIntakeEntry, WeightEntry, WeightLog
+from models.user import DiseaseHistory, HealthCondition, HealthProfile, UserInDB
+from utils.counter import reserve_sequence_values
+from utils.nutrition import bmi as calculate_bmi
+from utils.security import hash_password
+
+PASSWORD = "Synthetic123"
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya", "Meera", "Neha", "Priya",
+    "Rahul", "Riya", "Rohan", "Saanvi", "Sara", "Vihaan", "Vikram", "Zara", "Emma", "Liam",
+]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Iyer", "Reddy", "Nair", "Gupta", "Singh", "Das", "Mehta", "Khan", "Joshi"]
+CITIES = [
+    ("Mumbai", "Maharashtra"), ("Pune", "Maharashtra"), ("Bengaluru", "Karnataka"), ("Chennai", "Tamil Nadu"),
+    ("Delhi", "Delhi"), ("Hyderabad", "Telangana"), ("Kolkata", "West Bengal"), ("Ahmedabad", "Gujarat"),
+    ("Jaipur", "Rajasthan"), ("Kochi", "Kerala"),
+]
+BLOOD_TYPES = (["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"], [37, 22, 32, 5, 1.5, 1, 1, 0.5])
+ALLERGIES = ["nuts", "peanuts", "dairy", "gluten", "shellfish", "eggs", "soy"]
+RESTRICTIONS = ["vegetarian", "vegan", "low_carb", "keto", "halal", "jain"]
+CONDITIONS = [
+    # name, share of users, chronic, usual medication
+    ("Type 2 Diabetes", 0.10, True, "Metformin"),
+    ("Hypertension", 0.15, True, "Amlodipine"),
+    ("Hypothyroidism", 0.07, True, "Levothyroxine"),
+    ("PCOS", 0.05, True, None),
+    ("High Cholesterol", 0.10, True, "Atorvastatin"),
+    ("Anemia", 0.06, False, "Iron supplements"),
+]
+PAST_DISEASES = ["Typhoid", "Dengue", "Jaundice", "Gestational Diabetes", "Malaria"]
+EXERCISES = [
+    # name, type, calories burned per minute
+    ("Brisk walk", "cardio", 5), ("Running", "cardio", 11), ("Cycling", "cardio", 8), ("Yoga", "flexibility", 3),
+    ("Weight training", "strength", 6), ("Swimming", "cardio", 9), ("Badminton", "sports", 7),
+]
+MEAL_CALORIES = {"breakfast": (250, 550), "lunch": (450, 850), "dinner": (400, 800), "snacks": (100, 350)}
+DIETITIAN_IDS = [ObjectId("507f1f77bcf86cd799439011"), ObjectId("507f1f77bcf86cd799439012")]
+CONTACT_SUBJECTS = [
+    ("Question about my diet plan", "Can I swap lunch and dinner on my training days?"),
+    ("Consultation rescheduling", "I need to move my consultation to next week, is that possible?"),
+    ("App feedback", "The weight chart is great, it would be nice to export it as a PDF."),
+    ("Billing question", "I was charged twice for my last consultation, please check."),
+]
+
+
+class PopulationGenerator:
+    """Builds one user's documents at a time from a seeded random generator"""
+
+    def __init__(self, seed: int, days: int, today: date, password_hash: str):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.today = today
+        self.password_hash = password_hash
+
+    def user(self, user_id: int) -> Dict[str, Any]:
+        rng = self.rng
+        joined = datetime.combine(self.today - timedelta(days=self.days), datetime.min.time()) + timedelta(
+            minutes=rng.randint(0, 24 * 60)
+        )
+        female = rng.random() < 0.5
+        height = rng.gauss(158 if female else 171, 7)
+        weight = max(40.0, min(160.0, math.exp(rng.gauss(math.log(25.5), 0.18)) * (height / 100) ** 2))
+        city, state = rng.choice(CITIES)
+        conditions = [
+            HealthCondition(
+                id=str(self._object_id(joined)),
+                condition_name=name,
+                diagnosed_date=self._past_date(3650),
+                severity=rng.choice(["Mild", "Moderate", "Severe"]),
+                medications=[medication] if medication else [],
+                is_chronic=chronic,
+                created_at=joined,
+                updated_at=joined,
+            )
+            for name, share, chronic, medication in CONDITIONS if rng.random() < share
+        ]
+        diseases = [
+            DiseaseHistory(
+                id=str(self._object_id(joined)),
+                disease_name=name,
+                onset_date=self._past_date(7300),
+                family_history=rng.random() < 0.2,
+                created_at=joined,
+                updated_at=joined,
+            )
+            for name in PAST_DISEASES if rng.random() < 0.04
+        ]
+        profile = HealthProfile(
+            blood_type=rng.choices(*BLOOD_TYPES)[0],
+            height=round(height, 1),
+            weight=round(weight, 1),
+            allergies=rng.sample(ALLERGIES, k=rng.choices([0, 1, 2], [70, 22, 8])[0]),
+            current_medications=[m for c in conditions for m in c.medications],
+            dietary_restrictions=rng.sample(RESTRICTIONS, k=rng.choices([0, 1], [65, 35])[0]),
+            exercise_frequency=rng.choice(["Daily", "Weekly", "Monthly", "Rarely", "Never"]),
+            smoking_status=rng.choices(["Never", "Former", "Current"], [75, 15, 10])[0],
+            alcohol_consumption=rng.choices(["Never", "Rarely", "Moderate", "Heavy"], [40, 35, 22, 3])[0],
+            health_conditions=conditions,
+            disease_history=diseases,
+            last_updated=joined,
+        )
+        user = UserInDB(
+            **{"_id": self._object_id(joined)},
+            full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            email=f"synthetic{user_id}@example.com",
+            phone=f"+91 9{user_id:09d}",
+            date_of_birth=self._past_date(365 * 60, 365 * 18),
+            city=city,
+            state=state,
+            user_id=user_id,
+            hashed_password=self.password_hash,
+            health_profile=profile,
+            created_at=joined,
+            updated_at=joined,
+        )
+        return user.model_dump(by_alias=True)
+
+    def activity(self, user: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """goal_tracking and weight_logs documents for every day of the period"""
+        rng = self.rng
+        user_id = user["user_id"]
+        height = user["health_profile"]["height"]
+        weight = user["health_profile"]["weight"]
+        # How diligent this user is, and how fast they are losing (or gaining) weight
+        adherence = rng.betavariate(5, 2)
+        weigh_in_rate = rng.choice([0.15, 0.4, 0.9])
+        drift = rng.gauss(-0.04, 0.03)
+        workout_rate = rng.betavariate(2, 4)
+
+        tracking, weight_logs = [], []
+        for offset in range(self.days, -1, -1):
+            day = self.today - timedelta(days=offset)
+            morning = datetime.combine(day, datetime.min.time()) + timedelta(hours=7, minutes=rng.randint(0, 90))
+            weight = max(35.0, weight + drift + rng.gauss(0, 0.35))
+
+            meals = []
+            for meal_type, (low, high) in MEAL_CALORIES.items():
+                completed = rng.random() < adherence
+                meals.append(MealEntry(
+                    meal_type=meal_type,
+                    completed=completed,
+                    completed_at=morning + timedelta(hours=rng.randint(1, 14)) if completed else None,
+                    calories=rng.randint(low, high) if completed else 0,
+                ))
+            exercises = []
+            if rng.random() < workout_rate:
+                name, kind, per_minute = rng.choice(EXERCISES)
+                minutes = rng.randint(15, 75)
+                exercises.append(ExerciseEntry(
+                    exercise_name=name,
+                    duration_minutes=minutes,
+                    calories_burned=min(2000, int(minutes * per_minute * rng.uniform(0.8, 1.2))),
+                    exercise_type=kind,
+                    intensity=rng.choice(["low", "moderate", "high"]),
+                    logged_at=morning + timedelta(hours=10),
+                ))
+
+            weight_entry = None
+            if rng.random() < weigh_in_rate:
+                bmi = calculate_bmi(weight, height)
+                log_id = self._object_id(morning)
+                log = WeightLog(
+                    id=str(log_id),
+                    user_id=user_id,
+                    weight=round(weight, 1),
+                    bmi=round(bmi, 1) if bmi else None,
+                    body_fat_percentage=round(rng.uniform(15, 38), 1) if rng.random() < 0.25 else None,
+                    measurement_time="morning" if rng.random() < 0.8 else "evening",
+                    logged_at=morning,
+                    created_at=morning,
+                )
+                # Stored with an ObjectId _id, as POST /goal-tracking/weight-log writes them
+                log_doc = log.model_dump(exclude={"id"})
+                log_doc["_id"] = log_id
+                weight_logs.append(log_doc)
+                weight_entry = WeightEntry(weight=log.weight, bmi=log.bmi, logged_at=morning)
+
+            logged_anything = any(m.completed for m in meals) or exercises or weight_entry
+            entry = DailyGoalTracking(
+                user_id=user_id,
+                tracking_date=day,
+                meals=meals,
+                water_intake=WaterIntakeEntry(glasses=rng.randint(2, 12), logged_at=morning + timedelta(hours=12))
+                if rng.random() < adherence else None,
+                weight_entry=weight_entry,
+                exercises=exercises,
+                mood=rng.choices(["good", "okay", "bad", None], [45, 30, 10, 15])[0] if logged_anything else None,
+                sleep_hours=round(min(12.0, max(3.0, rng.gauss(7, 1.1))), 1) if rng.random() < adherence else None,
+                created_at=morning,
+                updated_at=morning + timedelta(hours=14),
+            )
+            doc = entry.model_dump(by_alias=True)
+            doc["_id"] = self._object_id(morning)
+            doc["tracking_date"] = day.isoformat()
+            tracking.append(doc)
+        return {"goal_tracking": tracking, "weight_logs": weight_logs}
+
+    def bookings(self, user: Dict[str, Any], first_booking_id: int, count: int) -> List[Dict[str, Any]]:
+        rng = self.rng
+        bookings = []
+        for i in range(count):
+            appointment = self.today + timedelta(days=rng.randint(-self.days, 30))
+            consultation_type = rng.choice(["video_call", "phone_call", "in_person"])
+            status = "scheduled" if appointment >= self.today else rng.choices(["completed", "cancelled"], [85, 15])[0]
+            # Booked up to two weeks ahead, and never later than today
+            booked = min(appointment - timedelta(days=rng.randint(1, 14)), self.today)
+            created = datetime.combine(booked, datetime.min.time())
+            booking = ConsultationBookingInDB(
+                **{"_id": self._object_id(created)},
+                patient_id=user["_id"],
+                patient_user_id=user["user_id"],
+                dietitian_id=rng.choice(DIETITIAN_IDS),
+                consultation_type=consultation_type,
+                appointment_date=appointment.isoformat(),
+                appointment_time=f"{rng.randint(9, 17):02d}:{rng.choice(['00', '30'])}",
+                duration=rng.choice([30, 45, 60]),
+                notes=rng.choice(["", "", "Follow-up on my plan", "Want to discuss my blood sugar"]),
+                status=status,
+                booking_id=first_booking_id + i,
+                meeting_link=f"https://meet.nutriwise.com/room/{first_booking_id + i}" if consultation_type == "video_call" else None,
+                created_at=created,
+                updated_at=created,
+            )
+            bookings.append(booking.model_dump(by_alias=True))
+        return bookings
+
+    def contact(self, user: Dict[str, Any], contact_id: int) -> Dict[str, Any]:
+        subject, message = self.rng.choice(CONTACT_SUBJECTS)
+        request = ContactRequest(name=user["full_name"], email=user["email"], phone=user["phone"], subject=subject, message=message)
+        created = user["created_at"] + timedelta(days=self.rng.randint(0, self.days))
+        # Same fields POST /contact/submit stores
+        return {
+            "_id": self._object_id(created),
+            "id": str(contact_id),
+            **request.model_dump(),
+            "created_at": created,
+            "status": self.rng.choices(["pending", "resolved"], [30, 70])[0],
+        }
+
+    def _object_id(self, created: datetime) -> ObjectId:
+        """An ObjectId timestamped ``created`` (naive UTC), with the rest drawn from the seeded generator"""
+        seconds = calendar.timegm(created.timetuple())
+        return ObjectId(seconds.to_bytes(4, "big") + self.rng.getrandbits(64).to_bytes(8, "big"))
+
+    def _past_date(self, max_days: int, min_days: int = 0) -> str:
+        return (self.today - timedelta(days=self.rng.randint(min_days, max_days))).isoformat()
+
+
+class BatchWriter:
+    """Buffers documents per collection and inserts full batches unordered, a few batches at a time"""
+
+    def __init__(self, db, batch_size: int, concurrency: int, dry_run: bool = False):
+        self.db = db
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self.written: Counter = Counter()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+
+    async def add(self, collection: str, docs: List[Dict[str, Any]]):
+        buffer = self.buffers.setdefault(collection, [])
+        buffer.extend(docs)
+        while len(buffer) >= self.batch_size:
+            batch, self.buffers[collection] = buffer[:self.batch_size], buffer[self.batch_size:]
+            buffer = self.buffers[collection]
+            await self._submit(collection, batch)
+
+    async def _submit(self, collection: str, batch: List[Dict[str, Any]]):
+        # Wait for a free slot here, so generation never runs far ahead of the database
+        await self._slots.acquire()
+        task = asyncio.create_task(self._insert(collection, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _insert(self, collection: str, batch: List[Dict[str, Any]]):
+        try:
+            if not self.dry_run:
+                await self.db[collection].insert_many(batch, ordered=False)
+            self.written[collection] += len(batch)
+        finally:
+            self._slots.release()
+
+    async def flush(self):
+        for collection, buffer in self.buffers.items():
+            if buffer:
+                await self._submit(collection, buffer)
+        self.buffers = {}
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+
+async def generate(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.database]
+    started = time.perf_counter()
+
+    # Reserve id ranges up front, from the same counters the API uses
+    first_user_id = await reserve_sequence_values(db, "user_id", args.users) if not args.dry_run else 1
+    count_rng = random.Random(args.seed + 1)
+    booking_counts = [count_rng.choices([0, 1, 2, 3], [55, 25, 13, 7])[0] for _ in range(args.users)]
+    contact_flags = [count_rng.random() < args.contact_share for _ in range(args.users)]
+    next_booking_id = await reserve_sequence_values(db, "booking_id", sum(booking_counts) or 1) if not args.dry_run else 1
+    next_contact_id = await reserve_sequence_values(db, "contact", sum(contact_flags) or 1) if not args.dry_run else 1
+
+    generator = PopulationGenerator(args.seed, args.days, date.today(), hash_password(PASSWORD))
+    writer = BatchWriter(db, args.batch_size, args.concurrency, args.dry_run)
+    for index in range(args.users):
+        user = generator.user(first_user_id + index)
+        await writer.add("users", [user])
+        for collection, docs in generator.activity(user).items():
+            await writer.add(collection, docs)
+        if booking_counts[index]:
+            await writer.add("consultation_bookings", generator.bookings(user, next_booking_id, booking_counts[index]))
+            next_booking_id += booking_counts[index]
+        if contact_flags[index]:
+            await writer.add("contacts", [generator.contact(user, next_contact_id)])
+            next_contact_id += 1
+
+        if (index + 1) % args.progress_every == 0:
+            elapsed = time.perf_counter() - started
+            total = sum(writer.written.values())
+            print(f"{index + 1}/{args.users} users, {total} documents written ({total / elapsed:,.0f}/s)")
+    await writer.flush()
+    client.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(writer.written.values())
+    action = "Generated" if args.dry_run else "Inserted"
+    print(f"{action} {total:,} documents in {elapsed:.1f}s ({total / elapsed:,.0f}/s):")
+    for collection, count in sorted(writer.written.items()):
+        print(f"  {collection}: {count:,}")
+    if not args.dry_run:
+        print(f"Users synthetic{first_user_id}@example.com to synthetic{first_user_id + args.users - 1}@example.com, password {PASSWORD}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90, help="days of goal tracking per user, ending today")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGODB_URL"))
+    parser.add_argument("--database", default="Diet", help="the API uses Diet")
+    parser.add_argument("--contact-share", type=float, default=0.1, help="share of users who sent a contact message")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many batches in flight at once")
+    parser.add_argument("--progress-every", type=int, default=1000, help="print progress every this many users")
+    parser.add_argument("--dry-run", action="store_true", help="build the documents without a database")
+    args = parser.parse_args()
+    if not args.mongo_url and not args.dry_run:
+        parser.error("set MONGODB_URL or pass --mongo-url")
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Print a signed X-Profile-Token for profiling live requests.
+
+Usage (from the backend directory, with the same SECRET_KEY as the API):
+    python tools/profile_token.py [--minutes 15]
+
+Requests sent with the header are profiled when the API runs with
+REQUEST_PROFILING_ENABLED=true; the response's X-Profile-Id names the stored profile:
+    curl -H "X-Profile-Token: $TOKEN" https://api.example/api/goal-tracking/weight-analytics ...
+    curl -H "X-Profile-Token: $TOKEN" "https://api.example/api/profiles/<id>?format=folded" > out.folded
+    flamegraph.pl out.folded > out.svg   (or open out.folded in speedscope)
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.request_profiler import profile_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, default=15, help="How long the token stays valid")
+    args = parser.parse_args()
+    print(profile_token(args.minutes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, List, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "allergen_lexicon.json")
+
+# Pattern kinds stored in the automaton
+HIT, SAFE, MODIFIER = "hit", "safe", "modifier"
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every occurrence of every pattern in one pass over the text"""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def finditer(self, text: str):
+        """Yield (start, end, pattern index) for every match, end exclusive"""
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position + 1 - len(patterns[index]), position + 1, index
+
+
+def _is_word(text: str, start: int, end: int) -> bool:
+    """True when text[start:end] is a whole word, allowing a plural "s"/"es" suffix"""
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    for suffix in ("", "s", "es"):
+        tail = end + len(suffix)
+        if text[end:tail] == suffix and (tail >= len(text) or not text[tail].isalnum()):
+            return True
+    return False
+
+
+def _load_lexicon(path: str = LEXICON_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        lexicon = json.load(f)
+
+    entries: Dict[str, List[Tuple[str, Any]]] = {}
+    for group, terms in lexicon["groups"].items():
+        for term in terms:
+            entries.setdefault(term.lower(), []).append((HIT, group))
+    for group, terms in lexicon["exceptions"].items():
+        for term in terms:
+            entries.setdefault(term.lower(), []).append((SAFE, group))
+    for term, groups in lexicon["modifiers"].items():
+        entries.setdefault(term.lower(), []).append((MODIFIER, tuple(groups)))
+
+    patterns = list(entries)
+    return lexicon, AhoCorasick(patterns), [entries[p] for p in patterns]
+
+
+# Compiled once at import; scanning a full plan is a single pass over its text
+_LEXICON, _AUTOMATON, _PAYLOADS = _load_lexicon()
+GROUPS = tuple(_LEXICON["groups"])
+RESTRICTIONS = _LEXICON["restrictions"]
+
+
+def resolve_allergy_groups(allergy: str) -> List[str]:
+    """Lexicon groups covered by one free-text allergy, empty if it is not in the lexicon"""
+    key = allergy.strip().lower()
+    alias = _LEXICON["allergy_aliases"].get(key, key)
+    groups = alias if isinstance(alias, list) else [alias]
+    return [group for group in groups if group in _LEXICON["groups"]]
+
+
+def restriction_preferences(preferences: Iterable[str]) -> List[str]:
+    """Dietary preferences that exclude ingredients (vegetarian, gluten_free, ...)"""
+    return [p for p in (pref.strip().lower() for pref in preferences or []) if p in RESTRICTIONS]
+
+
+@lru_cache(maxsize=128)
+def _custom_automaton(terms: Tuple[str, ...]) -> AhoCorasick:
+    return AhoCorasick(list(terms))
+
+
+def _term_variants(term: str) -> List[str]:
+    """Singular and plural spellings of a free-text term ("strawberry" -> "strawberries")"""
+    variants = [term]
+    if term.endswith("ies"):
+        variants.append(term[:-3] + "y")
+    elif term.endswith("y"):
+        variants.append(term[:-1] + "ies")
+    elif term.endswith("s") and len(term) > 3:
+        variants.append(term[:-1])
+    return variants
+
+
+def _rules(allergies: Iterable[str], preferences: Iterable[str]) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """Map lexicon groups and unknown allergy terms to the reasons they are forbidden"""
+    group_reasons: Dict[str, List[str]] = {}
+    custom_terms: Dict[str, str] = {}
+    for allergy in allergies or []:
+        if not allergy or not allergy.strip():
+            continue
+        groups = resolve_allergy_groups(allergy)
+        if groups:
+            for group in groups:
+                group_reasons.setdefault(group, []).append(f"allergy: {allergy.strip().lower()}")
+        else:
+            term = allergy.strip().lower()
+            for variant in _term_variants(term):
+                custom_terms[variant] = f"allergy: {term}"
+    for preference in restriction_preferences(preferences):
+        for group in RESTRICTIONS[preference]:
+            group_reasons.setdefault(group, []).append(preference)
+    return group_reasons, custom_terms
+
+
+def _meal_segments(diet_plan: Dict[str, Any]):
+    """Yield (day index, meal type, meal, text) for every meal name and ingredient in a plan"""
+    for day_index, day in enumerate(diet_plan.get("weekly_plan", []) or []):
+        meals = day.get("meals", {}) if isinstance(day, dict) else {}
+        for meal_type, meal in meals.items():
+            if not isinstance(meal, dict):
+                continue
+            if isinstance(meal.get("name"), str):
+                yield day_index, meal_type, meal, meal["name"]
+            for ingredient in meal.get("ingredients", []) or []:
+                if isinstance(ingredient, str):
+                    yield day_index, meal_type, meal, ingredient
+
+
+def find_violations(
+    diet_plan: Dict[str, Any],
+    allergies: Iterable[str] = (),
+    dietary_preferences: Iterable[str] = ()
+) -> List[Dict[str, Any]]:
+    """Every meal ingredient (or meal name) in a plan that conflicts with allergies or restrictions"""
+    group_reasons, custom_terms = _rules(allergies, dietary_preferences)
+    if not group_reasons and not custom_terms:
+        return []
+
+    segments = list(_meal_segments(diet_plan))
+    if not segments:
+        return []
+    texts = [segment[3].lower() for segment in segments]
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        position += len(text) + 1
+    plan_text = "\n".join(texts)
+
+    # Per segment: group hits, safe spans and modifier-cleared groups
+    hits: Dict[int, List[Tuple[str, int, int, List[str]]]] = {}
+    safe_spans: Dict[int, List[Tuple[str, int, int]]] = {}
+    cleared: Dict[int, set] = {}
+
+    for start, end, index in _AUTOMATON.finditer(plan_text):
+        if not _is_word(plan_text, start, end):
+            continue
+        segment = bisect_right(offsets, start) - 1
+        for kind, value in _PAYLOADS[index]:
+            if kind == HIT and value in group_reasons:
+                hits.setdefault(segment, []).append((value, start, end, group_reasons[value]))
+            elif kind == SAFE:
+                safe_spans.setdefault(segment, []).append((value, start, end))
+            elif kind == MODIFIER:
+                cleared.setdefault(segment, set()).update(value)
+
+    if custom_terms:
+        automaton = _custom_automaton(tuple(sorted(custom_terms)))
+        for start, end, index in automaton.finditer(plan_text):
+            if _is_word(plan_text, start, end):
+                term = automaton.patterns[index]
+                hits.setdefault(bisect_right(offsets, start) - 1, []).append((None, start, end, [custom_terms[term]]))
+
+    violations = []
+    for segment, segment_hits in sorted(hits.items()):
+        terms: List[str] = []
+        reasons: List[str] = []
+        for group, start, end, hit_reasons in segment_hits:
+            if group is not None:
+                if group in cleared.get(segment, ()):
+                    continue
+                if any(g == group and s <= start and end <= e for g, s, e in safe_spans.get(segment, [])):
+                    continue
+            terms.append(plan_text[start:end])
+            reasons.extend(hit_reasons)
+        if not terms:
+            continue
+        day_index, meal_type, meal, text = segments[segment]
+        day = diet_plan["weekly_plan"][day_index]
+        violations.append({
+            "day": day.get("day", day_index + 1),
+            "day_index": day_index,
+            "day_name": day.get("day_name"),
+            "meal_type": meal_type,
+            "meal_name": meal.get("name"),
+            "ingredient": text,
+            "terms": list(dict.fromkeys(terms)),
+            "reasons": list(dict.fromkeys(reasons))
+        })
+    return violations
+
+
+def meal_violations(
+    meal: Dict[str, Any],
+    allergies: Iterable[str] = (),
+    dietary_preferences: Iterable[str] = (),
+    meal_type: str = "meal"
+) -> List[Dict[str, Any]]:
+    """``find_violations`` for a single meal"""
+    return find_violations({"weekly_plan": [{"meals": {meal_type: meal}}]}, allergies, dietary_preferences)
+
+
+def offending_meals(violations: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+    """Distinct (day index, meal type) pairs that need replacing"""
+    return list(dict.fromkeys((v["day_index"], v["meal_type"]) for v in violations))
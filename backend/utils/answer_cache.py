@@ -0,0 +1,227 @@
+import logging
+import math
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity a cached question must reach to be reused. Lexical vectors cannot tell
+# "vitamin C" from "vitamin D", so this stays high enough to match only near-duplicates
+SIMILARITY_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.85"))
+MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "5000"))
+TTL_DAYS = int(os.getenv("CHAT_CACHE_TTL_DAYS", "30"))
+
+# Entry norms are recomputed with the current IDF once this share of the entries was added since
+# they were last computed; until then a stored question still scores within about 1% of itself
+NORM_REFRESH_DRIFT = 0.05
+
+# Size of the hashed feature space
+FEATURE_BUCKETS = 1 << 18
+
+STOPWORDS = frozenset("""
+a about an and any are as at be but by can could do does for from how i if in into is it its me my of
+on or per please should so some than that the their there these this to tell was what when which who
+why will with would you your
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Health details that make an answer specific to the person asking
+_CONDITION = (
+    r"(?:diabet\w*|pre-?diabet\w*|pcos|pcod|hypertension|blood (?:pressure|sugar)|cholesterol|thyroid\w*|"
+    r"hypothyroid\w*|kidney\w*|liver|heart\w*|gout|ibs|crohn'?s|celiac|coeliac|anaemi\w*|anemi\w*|"
+    r"pregnan\w*|breastfeeding|allerg\w*|intoleran\w*|medications?|medicines?|meds|insulin|metformin|"
+    r"statins?|surgery|cancer|condition)"
+)
+# Questions about the asker's numbers, body or health are never answered from the cache. A bare
+# "I" or "my" is not enough: "What vitamins do I need?" has one answer for everybody
+_PERSONAL = re.compile(
+    r"\b\d+(?:\.\d+)?\s*(?:kg|kgs|kilos?|lb|lbs|pounds|cm|ft|feet|foot|inch|inches|years? old|yrs? old|yo)\b"
+    rf"|\bi(?:'m|m| am)\s+(?:\d|(?:[\w-]+\s+)?{_CONDITION})"
+    rf"|\bi(?:'ve| have| had| got| take| use| suffer)\b[\w\s'-]{{0,30}}?\b{_CONDITION}"
+    r"|\bi\s+(?:weigh|was diagnosed)\b"
+    rf"|\bmy\s+(?:[\w-]+\s+)?{_CONDITION}"
+    r"|\bmy\s+(?:weight|height|age|bmi|body fat|waist)\s+(?:is|was|of)\b"
+    r"|\bmy\s+(?:doctor|dietitian|test results|reports?|labs?|diet plan|plan|profile)\b"
+)
+
+
+def is_personal(question: str) -> bool:
+    """True when a question depends on details about the person asking"""
+    return bool(_PERSONAL.search(question.lower()))
+
+
+def _stem(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def _features(text: str) -> Counter:
+    """Hashed unigram and bigram counts, ignoring stopwords and plural "s" """
+    tokens = [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return Counter(zlib.crc32(gram.encode("utf-8")) % FEATURE_BUCKETS for gram in grams)
+
+
+class AnswerCache:
+    """TF-IDF vectors of answered questions, searched through an inverted index on hashed features.
+
+    Only entries sharing at least one feature with the query are scored, so lookups cost
+    a few postings lists rather than a scan of every cached question. Entries keep their term
+    weights without IDF and both sides are weighted with the current IDF at lookup; only the
+    entries' norms are kept between lookups, and refreshed as the IDF drifts with cache growth.
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self.vectors: Dict[int, Dict[int, float]] = {}
+        self.norms: Dict[int, float] = {}
+        self._added_since_refresh = 0
+        self.postings: Dict[int, set] = {}
+        self.document_frequency: Counter = Counter()
+        self._next_id = 0
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "lookup_ms_total": 0.0, "lookups": 0}
+        self.latency = {"hit_ms_total": 0.0, "miss_ms_total": 0.0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _idf(self, feature: int) -> float:
+        return math.log((1 + len(self.entries)) / (1 + self.document_frequency[feature])) + 1.0
+
+    @staticmethod
+    def _term_weights(counts: Counter) -> Dict[int, float]:
+        return {f: 1 + math.log(c) for f, c in counts.items()}
+
+    def _norm(self, weights: Dict[int, float]) -> float:
+        return math.sqrt(sum((w * self._idf(f)) ** 2 for f, w in weights.items())) or 1.0
+
+    def _refresh_norms(self):
+        self.norms = {entry_id: self._norm(weights) for entry_id, weights in self.vectors.items()}
+        self._added_since_refresh = 0
+
+    def add(self, question: str, answer: str, document: Optional[Dict[str, Any]] = None) -> int:
+        counts = _features(question)
+        entry_id = self._next_id
+        self._next_id += 1
+        self.document_frequency.update(counts.keys())
+        self.entries[entry_id] = {"question": question, "answer": answer, **(document or {})}
+        self.vectors[entry_id] = self._term_weights(counts)
+        self.norms[entry_id] = self._norm(self.vectors[entry_id])
+        for feature in counts:
+            self.postings.setdefault(feature, set()).add(entry_id)
+        if len(self.entries) > MAX_ENTRIES:
+            self._evict(min(self.entries))
+        # Counting additions rather than size also covers a full cache turning over
+        self._added_since_refresh += 1
+        if self._added_since_refresh > NORM_REFRESH_DRIFT * len(self.entries):
+            self._refresh_norms()
+        return entry_id
+
+    def _evict(self, entry_id: int):
+        vector = self.vectors.pop(entry_id)
+        self.norms.pop(entry_id)
+        self.entries.pop(entry_id)
+        for feature in vector:
+            self.document_frequency[feature] -= 1
+            postings = self.postings.get(feature)
+            if postings is not None:
+                postings.discard(entry_id)
+                if not postings:
+                    del self.postings[feature]
+
+    def search(self, question: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Best cached entry and its similarity, if above the threshold"""
+        started = time.perf_counter()
+        query = {f: (w, self._idf(f)) for f, w in self._term_weights(_features(question)).items()}
+        dots: Dict[int, float] = {}
+        for feature, (query_weight, idf) in query.items():
+            # One IDF factor for the query's weight, one for the entry's
+            factor = query_weight * idf * idf
+            for entry_id in self.postings.get(feature, ()):
+                dots[entry_id] = dots.get(entry_id, 0.0) + factor * self.vectors[entry_id][feature]
+        query_norm = math.sqrt(sum((w * idf) ** 2 for w, idf in query.values())) or 1.0
+        scores = {entry_id: dot / (query_norm * self.norms[entry_id]) for entry_id, dot in dots.items()}
+        self.stats["lookups"] += 1
+        self.stats["lookup_ms_total"] += (time.perf_counter() - started) * 1000
+
+        if not scores:
+            return None
+        entry_id, score = max(scores.items(), key=lambda item: item[1])
+        if score < SIMILARITY_THRESHOLD:
+            return None
+        return self.entries[entry_id], score
+
+    def record(self, outcome: str, elapsed_ms: float = 0.0):
+        """Count a hit, miss or bypass and the end-to-end time of that request"""
+        key = {"hit": "hits", "miss": "misses", "bypass": "bypassed"}[outcome]
+        self.stats[key] += 1
+        if outcome in ("hit", "miss"):
+            self.latency[f"{outcome}_ms_total"] += elapsed_ms
+
+    def metrics(self) -> Dict[str, Any]:
+        hits, misses = self.stats["hits"], self.stats["misses"]
+        answered = hits + misses
+        return {
+            "entries": len(self.entries),
+            "hits": hits,
+            "misses": misses,
+            "bypassed": self.stats["bypassed"],
+            "hit_rate": round(hits / answered, 4) if answered else None,
+            "avg_lookup_ms": round(self.stats["lookup_ms_total"] / self.stats["lookups"], 3) if self.stats["lookups"] else None,
+            "avg_hit_ms": round(self.latency["hit_ms_total"] / hits, 1) if hits else None,
+            "avg_miss_ms": round(self.latency["miss_ms_total"] / misses, 1) if misses else None,
+            "threshold": SIMILARITY_THRESHOLD
+        }
+
+
+_cache: Optional[AnswerCache] = None
+
+
+async def get_answer_cache(db) -> AnswerCache:
+    """Get the shared answer cache, loading recent entries from the database on first use"""
+    global _cache
+    if _cache is None:
+        cache = AnswerCache()
+        since = datetime.utcnow() - timedelta(days=TTL_DAYS)
+        cursor = db.chat_answer_cache.find({"created_at": {"$gte": since}}).sort("created_at", -1).limit(MAX_ENTRIES)
+        documents = await cursor.to_list(length=MAX_ENTRIES)
+        for document in reversed(documents):
+            cache.add(document["question"], document["answer"], {"_id": document["_id"]})
+        logger.info(f"Loaded {len(cache)} cached chatbot answers")
+        _cache = cache
+    return _cache
+
+
+async def lookup_answer(db, question: str, has_history: bool) -> Tuple[Optional[str], Optional[float], str]:
+    """Cached answer, its similarity and the outcome ("hit", "miss" or "bypass") for a question"""
+    if has_history or is_personal(question):
+        return None, None, "bypass"
+    cache = await get_answer_cache(db)
+    match = cache.search(question)
+    if not match:
+        return None, None, "miss"
+    entry, score = match
+    if entry.get("_id") is not None:
+        await db.chat_answer_cache.update_one(
+            {"_id": entry["_id"]},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}}
+        )
+    return entry["answer"], score, "hit"
+
+
+async def record_outcome(db, outcome: str, elapsed_ms: float):
+    """Count one answered question towards the cache metrics"""
+    (await get_answer_cache(db)).record(outcome, elapsed_ms)
+
+
+async def store_answer(db, question: str, answer: str, model: str):
+    """Add a freshly generated answer to the cache and persist it"""
+    cache = await get_answer_cache(db)
+    document = {"question": question, "answer": answer, "model": model, "hits": 0, "created_at": datetime.utcnow()}
+    result = await db.chat_answer_cache.insert_one(document)
+    cache.add(question, answer, {"_id": result.inserted_id})
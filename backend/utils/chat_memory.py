@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.llm_gateway import get_llm_gateway
+from utils.prompt_templates import estimate_tokens, get_template
+
+logger = logging.getLogger(__name__)
+
+# Messages kept per session document; older ones survive only through the summary
+MAX_STORED_MESSAGES = int(os.getenv("CHAT_MAX_STORED_MESSAGES", "40"))
+# Token budget for history sent with each question (summary plus recent turns)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1200"))
+# Most recent messages that are never folded into the summary
+RECENT_MESSAGES = 6
+# Fold older messages into the summary once this many are waiting
+SUMMARY_BATCH = 6
+
+SUMMARY_PROMPT = get_template("chat_summary")
+
+_summary_tasks = set()
+
+
+async def get_or_create_session(db: AsyncIOMotorDatabase, session_id: Optional[str]) -> Dict[str, Any]:
+    """Load a chat session, starting a new one when the id is missing or unknown"""
+    if session_id:
+        session = await db.chat_sessions.find_one({"_id": session_id})
+        if session:
+            return session
+    now = datetime.utcnow()
+    session = {
+        "_id": uuid.uuid4().hex,
+        "messages": [],
+        "next_seq": 0,
+        "summary": "",
+        "summary_through": -1,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.chat_sessions.insert_one(session)
+    return session
+
+
+def build_context(session: Dict[str, Any], budget: int = CONTEXT_TOKEN_BUDGET) -> List[Dict[str, str]]:
+    """Chat messages for the model: rolling summary first, then as many recent turns as fit the budget"""
+    context: List[Dict[str, str]] = []
+    remaining = budget
+    summary = session.get("summary")
+    if summary:
+        summary_message = {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+        remaining -= estimate_tokens(summary_message["content"])
+
+    # Messages already folded into the summary are not repeated
+    unsummarized = [m for m in session.get("messages", []) if m["seq"] > session.get("summary_through", -1)]
+    recent: List[Dict[str, str]] = []
+    for message in reversed(unsummarized):
+        tokens = message.get("tokens") or estimate_tokens(message["content"])
+        if tokens > remaining:
+            break
+        remaining -= tokens
+        recent.append({"role": message["role"], "content": message["content"]})
+
+    if summary:
+        context.append(summary_message)
+    context.extend(reversed(recent))
+    return context
+
+
+async def append_turn(db: AsyncIOMotorDatabase, session: Dict[str, Any], question: str, answer: str):
+    """Store a question/answer pair, keeping only the newest messages in the document"""
+    now = datetime.utcnow()
+    seq = session.get("next_seq", 0)
+    new_messages = [
+        {"seq": seq, "role": "user", "content": question, "tokens": estimate_tokens(question), "created_at": now},
+        {"seq": seq + 1, "role": "assistant", "content": answer, "tokens": estimate_tokens(answer), "created_at": now},
+    ]
+    await db.chat_sessions.update_one(
+        {"_id": session["_id"]},
+        {
+            "$push": {"messages": {"$each": new_messages, "$slice": -MAX_STORED_MESSAGES}},
+            "$inc": {"next_seq": 2},
+            "$set": {"updated_at": now}
+        }
+    )
+    session["messages"] = (session.get("messages", []) + new_messages)[-MAX_STORED_MESSAGES:]
+    session["next_seq"] = seq + 2
+
+    if _messages_to_summarize(session):
+        task = asyncio.create_task(update_summary(db, session["_id"]))
+        _summary_tasks.add(task)
+        task.add_done_callback(_summary_tasks.discard)
+
+
+def _messages_to_summarize(session: Dict[str, Any]) -> List[Dict[str, Any]]:
+    older = session.get("messages", [])[:-RECENT_MESSAGES]
+    pending = [m for m in older if m["seq"] > session.get("summary_through", -1)]
+    return pending if len(pending) >= SUMMARY_BATCH else []
+
+
+async def update_summary(db: AsyncIOMotorDatabase, session_id: str):
+    """Fold messages that have dropped out of the recent window into the rolling summary"""
+    try:
+        session = await db.chat_sessions.find_one({"_id": session_id})
+        pending = _messages_to_summarize(session or {})
+        if not pending:
+            return
+
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in pending)
+        messages = SUMMARY_PROMPT.render(summary=session.get('summary') or 'None', transcript=transcript)
+
+        # Background work: charged to the global budget only
+        completion = await get_llm_gateway().complete(
+            "chat_summary",
+            messages,
+        )
+        summary = completion.choices[0].message.content.strip()
+
+        # Guard on summary_through so two concurrent updates cannot both apply
+        await db.chat_sessions.update_one(
+            {"_id": session_id, "summary_through": session.get("summary_through", -1)},
+            {"$set": {"summary": summary, "summary_through": pending[-1]["seq"]}}
+        )
+        logger.info(f"Chat summary updated for session {session_id}")
+
+    except Exception as e:
+        logger.error(f"Error updating chat summary: {str(e)}")
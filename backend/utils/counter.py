@@ -15,3 +15,13 @@ async def get_next_sequence_value(db: AsyncIOMotorDatabase, sequence_name: str)
     
     # If this is the first time, the sequence_value will be 1
     return result["sequence_value"]
+
+async def reserve_sequence_values(db: AsyncIOMotorDatabase, sequence_name: str, count: int) -> int:
+    """Reserve ``count`` consecutive sequence values at once; returns the first of them"""
+    result = await db.counters.find_one_and_update(
+        {"_id": sequence_name},
+        {"$inc": {"sequence_value": count}},
+        upsert=True,
+        return_document=True
+    )
+    return result["sequence_value"] - count + 1
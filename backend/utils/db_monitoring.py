@@ -0,0 +1,230 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+MONITORING_ENABLED = os.getenv("MONGO_MONITORING_ENABLED", "true").lower() == "true"
+# Warn when one request sends more commands than this
+QUERY_WARN_COUNT = int(os.getenv("MONGO_QUERY_WARN_COUNT", "10"))
+# Warn when one request sends the same query shape this many times, the usual sign of an N+1 loop
+REPEATED_SHAPE_WARN_COUNT = int(os.getenv("MONGO_REPEATED_SHAPE_WARN_COUNT", "5"))
+# Explain each new query shape once and warn if its plan scans a whole collection
+EXPLAIN_ENABLED = os.getenv("MONGO_EXPLAIN_QUERY_SHAPES", "true").lower() == "true"
+MAX_EXPLAINED_SHAPES = 2000
+
+# Connection housekeeping rather than work done for a request
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo", "endSessions",
+    "saslStart", "saslContinue", "authenticate", "getnonce", "explain",
+}
+# Where each command keeps the filter its query plan depends on
+FILTER_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query"}
+
+
+def _shape(value: Any) -> Any:
+    """A filter with its values replaced, so queries differing only in values compare equal"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, list):
+        nested = [_shape(item) for item in value if isinstance(item, dict)]
+        return nested or "?"
+    return "?"
+
+
+def command_filter(command_name: str, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The filter a read or write command selects documents with, if it has one"""
+    if command_name in FILTER_FIELDS:
+        return command.get(FILTER_FIELDS[command_name]) or {}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        return pipeline[0]["$match"] if pipeline and "$match" in pipeline[0] else {}
+    if command_name == "update":
+        return (command.get("updates") or [{}])[0].get("q", {})
+    if command_name == "delete":
+        return (command.get("deletes") or [{}])[0].get("q", {})
+    return None
+
+
+def command_collection(command_name: str, command: Dict[str, Any]) -> str:
+    if command_name == "getMore":
+        return command.get("collection", "")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else ""
+
+
+def documents_returned(reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return 1 if reply["value"] else 0
+    n = reply.get("n", 0)
+    return n if isinstance(n, int) else 0
+
+
+class RequestQueries:
+    """Database commands sent while handling one request.
+
+    Motor runs commands on executor threads with a copy of the request's context, so the
+    listener finds this object through the context variable; the lock covers commands
+    from the same request running on different threads. One is created per request, so
+    it holds plain dicts rather than Counters.
+    """
+
+    __slots__ = ("route", "loop", "count", "seconds", "docs", "collscans", "commands", "shapes", "_in_flight", "_lock")
+
+    def __init__(self, route: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.route = route
+        self.loop = loop
+        self.count = 0
+        self.seconds = 0.0
+        self.docs = 0
+        self.collscans = 0
+        self.commands: Dict[str, int] = {}
+        self.shapes: Dict[Tuple, int] = {}
+        self._in_flight: Dict[Tuple, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def summary(self, limit: int = 5) -> str:
+        return ", ".join(f"{name} x{count}" for name, count in Counter(self.commands).most_common(limit))
+
+
+_current: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def start_request_queries(route: str) -> Optional[contextvars.Token]:
+    """Begin attributing database commands to a request; returns the token for finish_request_queries"""
+    if not MONITORING_ENABLED:
+        return None
+    return _current.set(RequestQueries(route, asyncio.get_running_loop()))
+
+
+def finish_request_queries(token: Optional[contextvars.Token]) -> Optional[RequestQueries]:
+    """Stop attributing commands to the request and warn about query-heavy or repetitive requests"""
+    if token is None:
+        return None
+    queries = _current.get()
+    _current.reset(token)
+    if queries is None:
+        return None
+
+    if queries.count > QUERY_WARN_COUNT:
+        logger.warning(
+            f"{queries.route} sent {queries.count} MongoDB commands ({queries.seconds * 1000:.1f} ms): {queries.summary()}"
+        )
+    if queries.shapes:
+        shape, repeats = max(queries.shapes.items(), key=lambda item: item[1])
+        if repeats >= REPEATED_SHAPE_WARN_COUNT:
+            logger.warning(f"Possible N+1 query on {queries.route}: same {shape[0]}.{shape[1]} query sent {repeats} times")
+    if queries.collscans:
+        logger.warning(f"{queries.route} ran {queries.collscans} MongoDB queries with a collection scan: {queries.summary()}")
+    return queries
+
+
+def current_request_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+class QueryPlanCache:
+    """Whether each query shape's winning plan is a collection scan, explained once per shape"""
+
+    def __init__(self):
+        self.collscan: Dict[Tuple, Optional[bool]] = {}
+
+    def check(self, shape: Tuple, database: str, collection: str, query: Dict[str, Any], sort: Optional[Dict[str, Any]], queries: RequestQueries) -> Optional[bool]:
+        """Known answer for the shape, or None after scheduling an explain on the request's event loop"""
+        if shape in self.collscan:
+            return self.collscan[shape]
+        if len(self.collscan) >= MAX_EXPLAINED_SHAPES or queries.loop is None:
+            return None
+        self.collscan[shape] = None
+        # An empty context keeps the explain itself from being counted against the request
+        queries.loop.call_soon_threadsafe(
+            lambda: asyncio.ensure_future(self._explain(shape, database, collection, query, sort, queries.route)),
+            context=contextvars.Context(),
+        )
+        return None
+
+    async def _explain(self, shape: Tuple, database: str, collection: str, query: Dict[str, Any], sort: Optional[Dict[str, Any]], route: str):
+        from database.config import client
+        explain = {"find": collection, "filter": query}
+        if sort:
+            explain["sort"] = sort
+        try:
+            result = await client[database].command({"explain": explain, "verbosity": "queryPlanner"})
+        except Exception as e:
+            logger.debug(f"Could not explain {collection} query: {str(e)}")
+            return
+        scans = _has_collscan(result.get("queryPlanner", {}).get("winningPlan", {}))
+        self.collscan[shape] = scans
+        if scans:
+            logger.warning(f"Query on {database}.{collection} from {route} scans the whole collection; filter shape {shape[2]}")
+
+
+def _has_collscan(plan: Any) -> bool:
+    if isinstance(plan, dict):
+        return plan.get("stage") == "COLLSCAN" or any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(item) for item in plan)
+    return False
+
+
+class RequestCommandListener(monitoring.CommandListener):
+    """Adds each command's duration, collection and returned documents to the current request"""
+
+    def __init__(self, plans: Optional[QueryPlanCache] = None):
+        self.plans = plans or QueryPlanCache()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        queries = _current.get()
+        if queries is None or event.command_name in IGNORED_COMMANDS:
+            return
+        collection = command_collection(event.command_name, event.command)
+        with queries._lock:
+            queries._in_flight[(event.connection_id, event.request_id)] = (event.command_name, collection)
+
+        query = command_filter(event.command_name, event.command)
+        if query is None:
+            return
+        sort = event.command.get("sort") if event.command_name == "find" else None
+        shape = (collection, event.command_name, json.dumps(_shape(query), sort_keys=True), json.dumps(_shape(sort or {}), sort_keys=True))
+        with queries._lock:
+            queries.shapes[shape] = queries.shapes.get(shape, 0) + 1
+        if EXPLAIN_ENABLED and query and self.plans.check(shape, event.database_name, collection, query, sort, queries):
+            with queries._lock:
+                queries.collscans += 1
+
+    def _finish(self, event, reply: Optional[Dict[str, Any]]):
+        queries = _current.get()
+        if queries is None:
+            return
+        with queries._lock:
+            started = queries._in_flight.pop((event.connection_id, event.request_id), None)
+            if started is None:
+                return
+            command_name, collection = started
+            queries.count += 1
+            queries.seconds += event.duration_micros / 1_000_000
+            name = f"{collection}.{command_name}" if collection else command_name
+            queries.commands[name] = queries.commands.get(name, 0) + 1
+            if reply:
+                queries.docs += documents_returned(reply)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, event.reply)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, None)
+
+
+def command_listeners():
+    """Listeners to pass to the MongoDB client; none when monitoring is off"""
+    return [RequestCommandListener()] if MONITORING_ENABLED else []
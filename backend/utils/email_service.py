@@ -21,8 +21,10 @@ NOTIFICATION_EMAIL = os.getenv("NOTIFICATION_EMAIL")
 if not all([MAIL_USERNAME, MAIL_PASSWORD, MAIL_FROM, NOTIFICATION_EMAIL]):
     raise ValueError("All email environment variables are required: MAIL_USERNAME, MAIL_PASSWORD, MAIL_FROM, NOTIFICATION_EMAIL")
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+# Local mail sinks, such as the load-test harness's, speak plain SMTP
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
 
 class EmailService:
     def __init__(self):
@@ -31,6 +33,7 @@ class EmailService:
         self.from_email = MAIL_FROM
         self.smtp_server = SMTP_SERVER
         self.smtp_port = SMTP_PORT
+        self.starttls = SMTP_STARTTLS
 
     def send_email(self, to_email: str, subject: str, html_content: str, text_content: str = None):
         """Send email with HTML content"""
@@ -51,7 +54,8 @@ class EmailService:
 
             # Send email
             with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
+                if self.starttls:
+                    server.starttls()
                 server.login(self.username, self.password)
                 server.send_message(msg)
 
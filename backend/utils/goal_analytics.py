@@ -0,0 +1,170 @@
+from typing import Dict, Any, List, Tuple
+
+
+def weight_trend_analytics(weight_logs: List[Dict[str, Any]], days: int) -> Dict[str, Any]:
+    """Fields of WeightTrendAnalytics for weight logs sorted oldest first"""
+    # Process weight entries for analytics
+    entries = []
+    bmi_trend = []
+    weights = []
+
+    for log in weight_logs:
+        entry = {
+            "date": log["logged_at"].isoformat(),
+            "weight": log["weight"],
+            "bmi": log.get("bmi"),
+            "notes": log.get("notes"),
+            "measurement_time": log["measurement_time"]
+        }
+        entries.append(entry)
+        weights.append(log["weight"])
+
+        if log.get("bmi"):
+            bmi_trend.append({
+                "date": log["logged_at"].isoformat(),
+                "bmi": log["bmi"]
+            })
+
+    # Calculate trends
+    trend = "stable"
+    total_change = 0
+    average_weekly_change = 0
+
+    if len(weights) >= 2:
+        total_change = weights[-1] - weights[0]
+        if total_change > 0.5:
+            trend = "increasing"
+        elif total_change < -0.5:
+            trend = "decreasing"
+
+        # Calculate average weekly change
+        weeks = days / 7
+        average_weekly_change = total_change / weeks if weeks > 0 else 0
+
+    # Find highest and lowest weights
+    highest_weight = {}
+    lowest_weight = {}
+
+    if weights:
+        max_weight = max(weights)
+        min_weight = min(weights)
+
+        for log in weight_logs:
+            if log["weight"] == max_weight and not highest_weight:
+                highest_weight = {
+                    "weight": log["weight"],
+                    "date": log["logged_at"].isoformat(),
+                    "bmi": log.get("bmi")
+                }
+
+            if log["weight"] == min_weight and not lowest_weight:
+                lowest_weight = {
+                    "weight": log["weight"],
+                    "date": log["logged_at"].isoformat(),
+                    "bmi": log.get("bmi")
+                }
+
+    # Identify weight loss and gain periods
+    weight_loss_periods = []
+    weight_gain_periods = []
+
+    if len(weight_logs) >= 2:
+        current_trend = None
+        trend_start = weight_logs[0]
+
+        for i in range(1, len(weight_logs)):
+            current_log = weight_logs[i]
+            prev_log = weight_logs[i-1]
+
+            if current_log["weight"] < prev_log["weight"]:
+                if current_trend != "loss":
+                    if current_trend == "gain" and trend_start:
+                        weight_gain_periods.append({
+                            "start_date": trend_start["logged_at"].isoformat(),
+                            "end_date": prev_log["logged_at"].isoformat(),
+                            "start_weight": trend_start["weight"],
+                            "end_weight": prev_log["weight"],
+                            "change": prev_log["weight"] - trend_start["weight"]
+                        })
+                    current_trend = "loss"
+                    trend_start = prev_log
+
+            elif current_log["weight"] > prev_log["weight"]:
+                if current_trend != "gain":
+                    if current_trend == "loss" and trend_start:
+                        weight_loss_periods.append({
+                            "start_date": trend_start["logged_at"].isoformat(),
+                            "end_date": prev_log["logged_at"].isoformat(),
+                            "start_weight": trend_start["weight"],
+                            "end_weight": prev_log["weight"],
+                            "change": prev_log["weight"] - trend_start["weight"]
+                        })
+                    current_trend = "gain"
+                    trend_start = prev_log
+
+    return {
+        "entries": entries,
+        "trend": trend,
+        "total_change": round(total_change, 1),
+        "average_weekly_change": round(average_weekly_change, 2),
+        "highest_weight": highest_weight,
+        "lowest_weight": lowest_weight,
+        "weight_loss_periods": weight_loss_periods,
+        "weight_gain_periods": weight_gain_periods,
+        "bmi_trend": bmi_trend if bmi_trend else None
+    }
+
+
+def weekly_summary(tracking_data: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Week totals and one summary per tracked day, from a week's goal_tracking documents"""
+    # Calculate weekly totals
+    total_calories_burned = 0
+    total_exercise_minutes = 0
+    total_completed_meals = 0
+    total_meals = 0
+    total_water_glasses = 0
+    active_days = 0
+    daily_summaries = []
+
+    for entry in tracking_data:
+        exercises = entry.get("exercises", [])
+        meals = entry.get("meals", [])
+
+        day_calories = sum(ex.get("calories_burned", 0) for ex in exercises)
+        day_minutes = sum(ex.get("duration_minutes", 0) for ex in exercises)
+        day_completed_meals = sum(1 for meal in meals if meal.get("completed", False))
+        # Days created before anything was logged store these as null
+        day_water = (entry.get("water_intake") or {}).get("glasses", 0)
+
+        total_calories_burned += day_calories
+        total_exercise_minutes += day_minutes
+        total_completed_meals += day_completed_meals
+        total_meals += len(meals)
+        total_water_glasses += day_water
+
+        if exercises:
+            active_days += 1
+
+        daily_summaries.append({
+            "date": entry["tracking_date"],
+            "calories_burned": day_calories,
+            "exercise_minutes": day_minutes,
+            "completed_meals": day_completed_meals,
+            "total_meals": len(meals),
+            "water_glasses": day_water,
+            "weight": (entry.get("weight_entry") or {}).get("weight"),
+            "mood": entry.get("mood")
+        })
+
+    meal_completion_rate = (total_completed_meals / total_meals * 100) if total_meals > 0 else 0
+    avg_daily_water = total_water_glasses / 7 if len(tracking_data) > 0 else 0
+
+    summary = {
+        "total_calories_burned": total_calories_burned,
+        "total_exercise_minutes": total_exercise_minutes,
+        "active_days": active_days,
+        "meal_completion_rate": round(meal_completion_rate, 1),
+        "average_daily_water": round(avg_daily_water, 1),
+        "days_tracked": len(tracking_data)
+    }
+    return summary, daily_summaries
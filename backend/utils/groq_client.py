@@ -1,4 +1,4 @@
-from groq import Groq
+from groq import Groq, AsyncGroq
 import logging
 import os
 from dotenv import load_dotenv
@@ -13,11 +13,25 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY environment variable is required")
 
+# Point at another OpenAI-compatible server, e.g. tools/fake_groq.py for load and failure testing
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
 # Initialize a single Groq client instance
 groq_client = Groq(
     api_key=GROQ_API_KEY,
+    base_url=GROQ_BASE_URL,
+)
+
+# Async client for streaming responses without blocking the event loop
+async_groq_client = AsyncGroq(
+    api_key=GROQ_API_KEY,
+    base_url=GROQ_BASE_URL,
 )
 
 def get_groq_client():
     """Get the shared Groq client instance"""
-    return groq_client 
\ No newline at end of file
+    return groq_client
+
+def get_async_groq_client():
+    """Get the shared async Groq client instance"""
+    return async_groq_client 
\ No newline at end of file
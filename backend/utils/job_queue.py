@@ -0,0 +1,256 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+# Job types clients may submit, and the handler each one runs as "module:function"
+JOB_HANDLERS = {
+    "diet_plan": "routes.dietplan:run_diet_plan_job",
+}
+# Token budget a job type draws from, checked before the job is queued
+JOB_BUDGETS = {
+    "diet_plan": "diet_plan",
+}
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job whose worker stops renewing its lease for this long is picked up again
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_RETRY_BASE_SECONDS = 5
+# Identical submissions within this window of a successful run get that run's result
+JOB_DEDUPE_SECONDS = int(os.getenv("JOB_DEDUPE_SECONDS", "600"))
+# Finished jobs are removed by a TTL index after this long
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_MAX_ACTIVE_PER_OWNER = int(os.getenv("JOB_MAX_ACTIVE_PER_OWNER", "3"))
+
+
+def job_key(job_type: str, owner: str, payload: Dict[str, Any]) -> str:
+    """Stable hash identifying identical submissions"""
+    normalized = json.dumps({"type": job_type, "owner": owner, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Indexes the queue relies on; safe to call on every start"""
+    # Only queued and running jobs carry active_key, so one identical job can be in flight at a time
+    await db.jobs.create_index("active_key", unique=True, sparse=True)
+    await db.jobs.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+    await db.jobs.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+    await db.jobs.create_index([("dedupe_key", ASCENDING), ("finished_at", ASCENDING)])
+    await db.jobs.create_index([("owner", ASCENDING), ("status", ASCENDING)])
+    await db.jobs.create_index("expires_at", expireAfterSeconds=0)
+
+
+async def find_duplicate_job(
+    db: AsyncIOMotorDatabase,
+    job_type: str,
+    owner: str,
+    payload: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """An identical job that is still in flight or succeeded within the dedupe window"""
+    key = job_key(job_type, owner, payload)
+    active = await db.jobs.find_one({"active_key": key})
+    if active:
+        return active
+    if JOB_DEDUPE_SECONDS <= 0:
+        return None
+    return await db.jobs.find_one(
+        {
+            "dedupe_key": key,
+            "status": SUCCEEDED,
+            "finished_at": {"$gte": datetime.utcnow() - timedelta(seconds=JOB_DEDUPE_SECONDS)},
+        },
+        sort=[("finished_at", -1)]
+    )
+
+
+async def count_active_jobs(db: AsyncIOMotorDatabase, owner: str) -> int:
+    """Queued and running jobs submitted by one owner"""
+    return await db.jobs.count_documents({"owner": owner, "status": {"$in": [QUEUED, RUNNING]}})
+
+
+async def submit_job(
+    db: AsyncIOMotorDatabase,
+    job_type: str,
+    owner: str,
+    payload: Dict[str, Any]
+) -> Tuple[Dict[str, Any], bool]:
+    """Queue a job, or return the identical job already queued, running or recently finished.
+
+    The second value is True when an existing job was returned.
+    """
+    key = job_key(job_type, owner, payload)
+    # Two attempts: an identical job may finish between the failed insert and the lookup
+    for _ in range(2):
+        duplicate = await find_duplicate_job(db, job_type, owner, payload)
+        if duplicate:
+            return duplicate, True
+
+        now = datetime.utcnow()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "type": job_type,
+            "owner": owner,
+            "payload": payload,
+            "dedupe_key": key,
+            "active_key": key,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": JOB_MAX_ATTEMPTS,
+            "available_at": now,
+            "created_at": now,
+        }
+        try:
+            await db.jobs.insert_one(job)
+            logger.info(f"Queued {job_type} job {job['_id']} for {owner}")
+            return job, False
+        except DuplicateKeyError:
+            continue
+    raise RuntimeError(f"Could not queue {job_type} job for {owner}")
+
+
+async def claim_next_job(
+    db: AsyncIOMotorDatabase,
+    worker_id: str,
+    job_types: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """Lease the oldest runnable job: a queued one, or a running one whose lease has expired"""
+    now = datetime.utcnow()
+    query = {
+        "$or": [
+            {"status": QUEUED, "available_at": {"$lte": now}},
+            {"status": RUNNING, "lease_until": {"$lt": now}, "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+        ]
+    }
+    if job_types:
+        query["type"] = {"$in": job_types}
+    return await db.jobs.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker_id": worker_id,
+                "started_at": now,
+                "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def renew_lease(db: AsyncIOMotorDatabase, job_id: str, worker_id: str) -> bool:
+    """Extend a running job's lease; False if another worker has taken it over"""
+    result = await db.jobs.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": RUNNING},
+        {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)}}
+    )
+    return result.matched_count == 1
+
+
+def _finished(status: str, **fields) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "$set": {
+            "status": status,
+            "finished_at": now,
+            "expires_at": now + timedelta(hours=JOB_RETENTION_HOURS),
+            **fields,
+        },
+        "$unset": {"active_key": "", "lease_until": ""},
+    }
+
+
+async def complete_job(db: AsyncIOMotorDatabase, job_id: str, worker_id: str, result: Any):
+    """Store a job's result; ignored if the lease was lost to another worker"""
+    await db.jobs.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": RUNNING},
+        _finished(SUCCEEDED, result=result, error=None)
+    )
+
+
+async def fail_job(db: AsyncIOMotorDatabase, job: Dict[str, Any], worker_id: str, error: str):
+    """Requeue a failed job with exponential backoff, or mark it failed after its last attempt"""
+    if job["attempts"] >= job["max_attempts"]:
+        update = _finished(FAILED, error=error)
+    else:
+        delay = JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+        update = {
+            "$set": {
+                "status": QUEUED,
+                "error": error,
+                "available_at": datetime.utcnow() + timedelta(seconds=delay),
+            },
+            "$unset": {"lease_until": "", "worker_id": ""},
+        }
+    await db.jobs.update_one({"_id": job["_id"], "worker_id": worker_id, "status": RUNNING}, update)
+
+
+async def defer_job(db: AsyncIOMotorDatabase, job: Dict[str, Any], worker_id: str, seconds: float, reason: str):
+    """Put a job back in the queue without using up an attempt, e.g. while its owner's budget refills"""
+    await db.jobs.update_one(
+        {"_id": job["_id"], "worker_id": worker_id, "status": RUNNING},
+        {
+            "$set": {
+                "status": QUEUED,
+                "error": reason,
+                "available_at": datetime.utcnow() + timedelta(seconds=seconds),
+            },
+            "$inc": {"attempts": -1},
+            "$unset": {"lease_until": "", "worker_id": ""},
+        }
+    )
+
+
+async def fail_abandoned_jobs(db: AsyncIOMotorDatabase) -> int:
+    """Mark failed the running jobs whose lease expired on their last attempt"""
+    result = await db.jobs.update_many(
+        {
+            "status": RUNNING,
+            "lease_until": {"$lt": datetime.utcnow()},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+        },
+        _finished(FAILED, error="Worker stopped responding")
+    )
+    return result.modified_count
+
+
+async def get_job(db: AsyncIOMotorDatabase, job_id: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """One job, optionally restricted to the owner who submitted it"""
+    query = {"_id": job_id}
+    if owner:
+        query["owner"] = owner
+    return await db.jobs.find_one(query, {"payload": 0, "dedupe_key": 0, "active_key": 0})
+
+
+async def queue_metrics(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Job counts by type and status, and the wait of the oldest runnable job"""
+    counts: Dict[str, Dict[str, int]] = {}
+    async for row in db.jobs.aggregate([{"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}}]):
+        counts.setdefault(row["_id"]["type"], {})[row["_id"]["status"]] = row["count"]
+
+    now = datetime.utcnow()
+    oldest = await db.jobs.find_one(
+        {"status": QUEUED, "available_at": {"$lte": now}}, {"available_at": 1}, sort=[("available_at", 1)]
+    )
+    return {
+        "depth": sum(by_status.get(QUEUED, 0) for by_status in counts.values()),
+        "running": sum(by_status.get(RUNNING, 0) for by_status in counts.values()),
+        "by_type": counts,
+        "oldest_wait_seconds": round((now - oldest["available_at"]).total_seconds(), 1) if oldest else 0.0,
+    }
@@ -0,0 +1,167 @@
+import asyncio
+import importlib
+import logging
+import os
+import socket
+import uuid
+from typing import Dict, Any, Callable, List, Optional, Set
+
+from database.config import get_database
+from utils.job_queue import (
+    JOB_HANDLERS, JOB_LEASE_SECONDS, claim_next_job, complete_job, defer_job, ensure_indexes,
+    fail_abandoned_jobs, fail_job, renew_lease
+)
+from utils.llm_gateway import BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+# Run workers inside the API process; set to false when worker.py runs them separately
+JOB_WORKERS_IN_PROCESS = os.getenv("JOB_WORKERS_IN_PROCESS", "true").lower() == "true"
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# A job deferred for a longer budget wait than this fails instead
+JOB_MAX_DEFER_SECONDS = 900
+# Running jobs get this long to finish on shutdown before they are handed back to the queue
+SHUTDOWN_GRACE_SECONDS = 20
+
+
+def get_handler(job_type: str) -> Callable:
+    """Import the handler for a job type; imported lazily so workers only load what they run"""
+    module_name, function_name = JOB_HANDLERS[job_type].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class JobWorkerPool:
+    """A fixed number of async workers that lease jobs from the queue and run them.
+
+    Each worker renews its lease while a job runs, so a job held by a crashed process is
+    picked up again once the lease runs out, and results from a worker that lost its
+    lease are discarded.
+    """
+
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY, job_types: Optional[List[str]] = None):
+        self.concurrency = concurrency
+        self.job_types = job_types
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self._stopping = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[asyncio.Task] = set()
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._work(n)) for n in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job workers ({self.worker_id})")
+
+    async def stop(self):
+        """Stop claiming jobs and wait briefly for running ones; unfinished jobs go back to the queue"""
+        self._stopping.set()
+        # Idle workers may be waiting on the database; only those running a job get the grace period
+        for task in self._tasks:
+            if task not in self._running:
+                task.cancel()
+        if self._running:
+            await asyncio.wait(self._running, timeout=SHUTDOWN_GRACE_SECONDS)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _sleep(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self, n: int):
+        db = get_database()
+        if n == 0:
+            # Created here rather than in start() so an unreachable database does not hold up startup
+            try:
+                await ensure_indexes(db)
+            except Exception as e:
+                logger.error(f"Error creating job queue indexes: {str(e)}")
+        while not self._stopping.is_set():
+            try:
+                if n == 0:
+                    await fail_abandoned_jobs(db)
+                job = await claim_next_job(db, self.worker_id, self.job_types)
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                await self._sleep(JOB_POLL_SECONDS)
+                continue
+            await self._run(db, job)
+
+    async def _heartbeat(self, db, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                if not await renew_lease(db, job_id, self.worker_id):
+                    logger.warning(f"Lost the lease on job {job_id}; its result will be discarded")
+                    return
+            except Exception as e:
+                logger.error(f"Error renewing lease on job {job_id}: {str(e)}")
+
+    async def _run(self, db, job: Dict[str, Any]):
+        current = asyncio.current_task()
+        self._running.add(current)
+        self.busy += 1
+        heartbeat = asyncio.create_task(self._heartbeat(db, job["_id"]))
+        try:
+            logger.info(f"Running {job['type']} job {job['_id']} (attempt {job['attempts']})")
+            result = await get_handler(job["type"])(job["payload"], job["owner"])
+            await complete_job(db, job["_id"], self.worker_id, result)
+            self.processed += 1
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without using up an attempt
+            await asyncio.shield(defer_job(db, job, self.worker_id, 0, "Worker shut down"))
+            raise
+        except BudgetExceeded as e:
+            if e.retry_after <= JOB_MAX_DEFER_SECONDS:
+                logger.info(f"Deferring job {job['_id']} for {e.retry_after}s until the token budget refills")
+                await defer_job(db, job, self.worker_id, e.retry_after, e.detail)
+            else:
+                self.failed += 1
+                await fail_job(db, {**job, "attempts": job["max_attempts"]}, self.worker_id, e.detail)
+        except Exception as e:
+            logger.error(f"Error running job {job['_id']}: {str(e)}")
+            self.failed += 1
+            await fail_job(db, job, self.worker_id, str(e))
+        finally:
+            heartbeat.cancel()
+            self.busy -= 1
+            self._running.discard(current)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def get_job_worker_pool() -> Optional[JobWorkerPool]:
+    """The in-process worker pool, if this process runs one"""
+    return _pool
+
+
+async def start_job_workers(concurrency: int = JOB_WORKER_CONCURRENCY) -> JobWorkerPool:
+    global _pool
+    _pool = JobWorkerPool(concurrency)
+    await _pool.start()
+    return _pool
+
+
+async def stop_job_workers():
+    global _pool
+    if _pool:
+        await _pool.stop()
+        _pool = None
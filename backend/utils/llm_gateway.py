@@ -0,0 +1,598 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request, status
+from groq import APIConnectionError, InternalServerError, RateLimitError
+from pymongo import ReturnDocument
+
+from utils.groq_client import get_async_groq_client
+from utils.llm_metrics import LLMCall, LLMMetrics, get_llm_metrics
+from utils.llm_resilience import CircuitBreaker, LatencyTracker, model_chain
+from utils.llm_sizing import MIN_MAX_TOKENS, OutputSizer, context_limit, prompt_allowance
+from utils.prompt_templates import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+from utils.security import verify_token
+
+logger = logging.getLogger(__name__)
+
+BUDGETS_ENABLED = os.getenv("LLM_BUDGETS_ENABLED", "true").lower() == "true"
+# "memory" keeps buckets per process; "mongo" shares them between workers through the llm_budgets collection
+BUDGET_STORE = os.getenv("LLM_BUDGET_STORE", "memory")
+# Reverse proxies in front of the API that append to X-Forwarded-For. With none the header is ignored,
+# since any client can send one; with N the client address is the Nth entry from the right
+TRUSTED_PROXY_COUNT = int(os.getenv("LLM_TRUSTED_PROXY_COUNT", "0"))
+# Ceiling on tokens spent by the whole deployment, refilled continuously
+GLOBAL_TOKENS_PER_MINUTE = int(os.getenv("LLM_GLOBAL_TOKENS_PER_MINUTE", "100000"))
+
+# Per-user buckets for each task: (burst capacity, tokens refilled per hour).
+# A call reserves its prompt estimate plus max_tokens, so the capacity must cover one full call
+TASK_BUDGETS: Dict[str, Tuple[int, int]] = {
+    "diet_plan": (20000, 40000),
+    "diet_plan_prefetch": (10000, 20000),
+    "chat": (8000, 30000),
+    "myth_cards": (10000, 30000),
+    "random_myth": (4000, 12000),
+    "quiz_question": (4000, 12000),
+    "tip_of_the_day": (4000, 12000),
+}
+DEFAULT_TASK_BUDGET = (8000, 24000)
+
+# Completion length assumed when a call does not set max_tokens
+DEFAULT_MAX_TOKENS = 1024
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+
+# Model, max_tokens and temperature for each task
+ROUTES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "llm_routes.json")
+
+# When set, every prompt sent is appended to this JSONL file for tools/evaluate_llm_routes.py to replay.
+# Chat prompts contain what users typed, so only enable it where keeping that is acceptable
+RECORD_PROMPTS_PATH = os.getenv("LLM_RECORD_PROMPTS_PATH")
+
+# Errors that say nothing about the request itself: worth trying the next model
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+
+class BudgetExceeded(HTTPException):
+    """Raised when a call would overdraw a token bucket; surfaces to the client as a 429"""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"AI usage limit reached ({scope}). Please try again in {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def _load_routes(path: str = ROUTES_PATH) -> Dict[str, Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+TASK_ROUTES = _load_routes()
+
+
+def get_route(task: str) -> Dict[str, Any]:
+    """Model, max_tokens and temperature configured for a task; unknown tasks get an empty route"""
+    return dict(TASK_ROUTES.get(task, {}))
+
+
+def record_prompt(task: str, messages: List[Dict[str, str]], params: Dict[str, Any]):
+    """Append a prompt to the replay log, if one is configured"""
+    if not RECORD_PROMPTS_PATH:
+        return
+    try:
+        with open(RECORD_PROMPTS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"task": task, "messages": messages, "params": params, "recorded_at": datetime.utcnow().isoformat()}) + "\n")
+    except OSError as e:
+        logger.error(f"Error recording prompt: {str(e)}")
+
+
+class LLMUnavailable(Exception):
+    """Raised when every model in the fallback chain failed or had its circuit open"""
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to ``capacity`` tokens, refilled at ``rate`` tokens per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float) -> float:
+        """Remove ``amount`` tokens; returns 0 on success or the seconds until they would be available"""
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def adjust(self, delta: float):
+        """Refund (positive) or charge (negative) tokens; a charge may leave the bucket in debt"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class MemoryBucketStore:
+    """Buckets held in this process"""
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, key: str, capacity: float, rate: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(capacity, rate)
+        return bucket
+
+    async def take(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        return self._bucket(key, capacity, rate).take(amount)
+
+    async def adjust(self, key: str, capacity: float, rate: float, delta: float):
+        self._bucket(key, capacity, rate).adjust(delta)
+
+
+class MongoBucketStore:
+    """Buckets kept in the llm_budgets collection so every worker draws from the same balance.
+
+    Refill and withdrawal happen in one pipeline update, so concurrent workers cannot
+    both spend the same tokens.
+    """
+
+    def __init__(self, db):
+        self.collection = db.llm_budgets
+
+    async def take(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed_seconds, rate]}]}]}
+        enough = {"$gte": ["$tokens", amount]}
+        document = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {"granted": enough, "tokens": {"$cond": [enough, {"$subtract": ["$tokens", amount]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if document["granted"]:
+            return 0.0
+        return (amount - document["tokens"]) / rate
+
+    async def adjust(self, key: str, capacity: float, rate: float, delta: float):
+        await self.collection.update_one(
+            {"_id": key},
+            [{"$set": {"tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, delta]}]}}}],
+        )
+
+
+@dataclass
+class Reservation:
+    task: str
+    amount: int
+    buckets: List[Tuple[str, float, float]] = field(default_factory=list)
+    settled: bool = False
+
+
+class TokenBudget:
+    """Per-user, per-task token buckets under one global bucket.
+
+    A call first reserves its worst case (estimated prompt plus max_tokens) from every
+    bucket that applies, then settles against the usage the provider reports, refunding
+    the tokens it did not use.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or MemoryBucketStore()
+        self.usage: Dict[str, Counter] = {}
+
+    def _buckets(self, task: str, user: Optional[str]) -> List[Tuple[str, str, float, float]]:
+        buckets = []
+        if user:
+            capacity, per_hour = TASK_BUDGETS.get(task, DEFAULT_TASK_BUDGET)
+            buckets.append(("user", f"{task}:{user}", capacity, per_hour / 3600))
+        buckets.append(("global", "global", GLOBAL_TOKENS_PER_MINUTE, GLOBAL_TOKENS_PER_MINUTE / 60))
+        return buckets
+
+    async def reserve(self, task: str, user: Optional[str], amount: int) -> Reservation:
+        """Take ``amount`` tokens from the user's task bucket and the global bucket, or raise BudgetExceeded"""
+        reservation = Reservation(task, amount)
+        if not BUDGETS_ENABLED:
+            return reservation
+        for scope, key, capacity, rate in self._buckets(task, user):
+            # A call larger than the bucket could never run, so it only has to wait for a full bucket
+            wait = await self.store.take(key, capacity, rate, min(amount, capacity))
+            if wait:
+                for taken_key, taken_capacity, taken_rate in reservation.buckets:
+                    await self.store.adjust(taken_key, taken_capacity, taken_rate, min(amount, taken_capacity))
+                self._count(task, "rejected")
+                logger.warning(f"LLM {scope} token budget exhausted for {task} ({user or 'system'})")
+                raise BudgetExceeded(scope, max(1, math.ceil(wait)))
+            reservation.buckets.append((key, capacity, rate))
+        return reservation
+
+    async def settle(self, reservation: Reservation, prompt_tokens: int, completion_tokens: int):
+        """Replace the reserved estimate with the tokens actually used"""
+        if reservation.settled:
+            return
+        used = prompt_tokens + completion_tokens
+        # Buckets leave the list once adjusted, so a settle that fails part way can be retried without refunding twice
+        while reservation.buckets:
+            key, capacity, rate = reservation.buckets[0]
+            await self.store.adjust(key, capacity, rate, min(reservation.amount, capacity) - used)
+            reservation.buckets.pop(0)
+        reservation.settled = True
+        self._count(reservation.task, "calls")
+        self._count(reservation.task, "prompt_tokens", prompt_tokens)
+        self._count(reservation.task, "completion_tokens", completion_tokens)
+
+    async def check(self, task: str, user: Optional[str], amount: int = 1):
+        """Raise BudgetExceeded if ``amount`` tokens are not available right now, without spending them"""
+        reservation = await self.reserve(task, user, amount)
+        for key, capacity, rate in reservation.buckets:
+            await self.store.adjust(key, capacity, rate, min(amount, capacity))
+
+    def _count(self, task: str, name: str, value: int = 1):
+        self.usage.setdefault(task, Counter())[name] += value
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        return {task: dict(counts) for task, counts in self.usage.items()}
+
+
+def _usage_counts(usage) -> Tuple[int, int]:
+    return (getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough prompt size, including a few tokens of per-message overhead"""
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+class LLMStream:
+    """Async iterator over a streamed completion that settles its reservation when it ends"""
+
+    def __init__(self, gateway: "LLMGateway", stream, task: str, model: str, reservation: Reservation, prompt_estimate: int, failed_prompt_tokens: int = 0, call: Optional[LLMCall] = None, started: Optional[float] = None):
+        self._gateway = gateway
+        self._stream = stream
+        self._reservation = reservation
+        self._prompt_estimate = prompt_estimate
+        self._failed_prompt_tokens = failed_prompt_tokens
+        self._streamed_chars = 0
+        self._finished = False
+        self._call = call or LLMCall(task, model, model=model, stream=True)
+        self._recorded = False
+        self._started = started or time.perf_counter()
+        self.task = task
+        self.model = model
+        self.usage = None
+        self.finish_reason = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        breaker = self._gateway.breaker(self.model)
+        try:
+            async for chunk in self._stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if self._call.ttft_ms is None:
+                        self._call.ttft_ms = (time.perf_counter() - self._started) * 1000
+                    self._streamed_chars += len(delta)
+                # Groq reports usage on the final chunk
+                chunk_usage = chunk.usage or (chunk.x_groq.usage if getattr(chunk, "x_groq", None) else None)
+                if chunk_usage:
+                    self.usage = chunk_usage
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    self.finish_reason = chunk.choices[0].finish_reason
+                yield chunk
+        except RETRYABLE_ERRORS:
+            breaker.record_failure()
+            self._call.outcome = "error"
+            raise
+        self._finished = True
+        breaker.record_success()
+        if self.usage is not None:
+            self._gateway.sizer.record(self.task, self.usage.completion_tokens, self.finish_reason == "length")
+        await self._settle()
+
+    async def _settle(self):
+        if self.usage is not None:
+            prompt_tokens, completion_tokens = _usage_counts(self.usage)
+        else:
+            # Stream cut short: charge what was generated so far
+            prompt_tokens, completion_tokens = self._prompt_estimate, (self._streamed_chars + 3) // 4
+        await self._gateway.budget.settle(self._reservation, prompt_tokens + self._failed_prompt_tokens, completion_tokens)
+        if not self._recorded:
+            self._recorded = True
+            if not self._finished and self._call.outcome == "ok":
+                self._call.outcome = "cancelled"
+            self._call.prompt_tokens, self._call.completion_tokens = prompt_tokens, completion_tokens
+            self._call.finish_reason = self.finish_reason
+            self._gateway._record(self._call, self._started)
+
+    async def close(self):
+        """Stop the upstream generation and settle for whatever was used.
+
+        Usually called while the request is being cancelled because the client left, so the
+        cleanup is shielded: otherwise every await in it would be cancelled again.
+        """
+        with anyio.CancelScope(shield=True):
+            try:
+                await self._stream.close()
+            finally:
+                if not self._finished:
+                    # An abandoned stream says nothing about the model's health
+                    self._gateway.breaker(self.model).release()
+                await self._settle()
+
+
+class LLMGateway:
+    """Single path for chat completions.
+
+    Every call is budgeted before it is sent and accounted from the provider's reported
+    usage once it returns. Calls that fail or hit an open circuit move down the fallback
+    chain to smaller models, and slow non-streamed calls are hedged with a duplicate request.
+    Raises LLMUnavailable when no model in the chain could answer, so routes can serve
+    their local fallbacks straight away.
+    """
+
+    def __init__(self, client=None, budget: Optional[TokenBudget] = None, metrics: Optional[LLMMetrics] = None):
+        # Retries happen here, through the fallback chain, rather than inside the client
+        self.client = client or get_async_groq_client().with_options(max_retries=0, timeout=REQUEST_TIMEOUT_SECONDS)
+        self.budget = budget or TokenBudget()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latency: Dict[Tuple[str, str], LatencyTracker] = {}
+        self.sizer = OutputSizer()
+        self.metrics = metrics or get_llm_metrics()
+
+    def _sized_params(self, task: str, overrides: Dict[str, Any], prompt_estimate: int) -> Dict[str, Any]:
+        """The task's route with overrides applied and max_tokens sized from recent outputs"""
+        params = {**get_route(task), **overrides}
+        max_tokens = params.get("max_tokens", DEFAULT_MAX_TOKENS)
+        if "max_tokens" not in overrides:
+            max_tokens = self.sizer.max_tokens(task, params.get("model"), max_tokens)
+        # Never ask for more output than fits next to the prompt
+        params["max_tokens"] = max(MIN_MAX_TOKENS, min(max_tokens, context_limit(params.get("model")) - prompt_estimate))
+        return params
+
+    def prompt_allowance(self, task: str) -> int:
+        """Estimated prompt tokens a call for ``task`` may use and still leave room for its output"""
+        route = get_route(task)
+        model = route.get("model")
+        return prompt_allowance(model, self.sizer.max_tokens(task, model, route.get("max_tokens", DEFAULT_MAX_TOKENS)))
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(model)
+        return self.breakers[model]
+
+    def _tracker(self, task: str, model: str) -> LatencyTracker:
+        if (task, model) not in self.latency:
+            self.latency[(task, model)] = LatencyTracker()
+        return self.latency[(task, model)]
+
+    def _record(self, call: LLMCall, started: float):
+        call.total_ms = (time.perf_counter() - started) * 1000
+        if not call.stream and call.outcome == "ok":
+            # A non-streamed answer arrives all at once
+            call.ttft_ms = call.total_ms
+        self.metrics.record_call(call)
+
+    async def _hedged_create(self, task: str, model: str, messages: List[Dict[str, str]], params: Dict[str, Any]):
+        """One completion from ``model``, duplicated if it runs past the usual latency; returns it and the attempt count"""
+        tracker = self._tracker(task, model)
+        delay = tracker.hedge_delay()
+        started = time.perf_counter()
+
+        def send():
+            return asyncio.create_task(
+                self.client.chat.completions.create(messages=messages, stream=False, **{**params, "model": model})
+            )
+
+        pending = {send()}
+        attempts = 1
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                tracker.hedges += 1
+                attempts = 2
+                logger.info(f"Hedging {task} on {model} after {delay * 1000:.0f} ms")
+                pending.add(send())
+
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        tracker.record(time.perf_counter() - started)
+                        return attempt.result(), attempts
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+
+    async def complete(self, task: str, messages: List[Dict[str, str]], user: Optional[str] = None, budget: Optional[str] = None, **overrides):
+        """Chat completion for ``task`` on behalf of ``user`` (None for background work).
+
+        Model, max_tokens and temperature come from the task's route unless overridden; the
+        call is charged to the ``budget`` bucket, which defaults to the task itself.
+        """
+        prompt_estimate = estimate_prompt_tokens(messages)
+        params = self._sized_params(task, overrides, prompt_estimate)
+        record_prompt(task, messages, params)
+        reservation = await self.budget.reserve(budget or task, user, prompt_estimate + params["max_tokens"])
+        call = LLMCall(task, params["model"])
+        started = time.perf_counter()
+        # Failed and losing hedged attempts are charged for the prompt, which the provider may have processed
+        wasted_prompt_tokens = 0
+        for model in model_chain(params["model"]):
+            breaker = self.breaker(model)
+            if not breaker.allow():
+                logger.info(f"Skipping {model} for {task}: circuit open")
+                call.path.append(f"{model}:open")
+                continue
+            try:
+                completion, attempts = await self._hedged_create(task, model, messages, params)
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure()
+                wasted_prompt_tokens += prompt_estimate
+                call.attempts += 1
+                call.path.append(f"{model}:{type(e).__name__}")
+                logger.warning(f"{model} failed for {task}: {type(e).__name__}")
+                continue
+            except Exception as e:
+                # The provider answered, so the model is healthy; the request itself was bad
+                breaker.record_success()
+                await self.budget.settle(reservation, wasted_prompt_tokens + prompt_estimate, 0)
+                call.attempts += 1
+                call.path.append(f"{model}:{type(e).__name__}")
+                call.outcome = "error"
+                self._record(call, started)
+                raise
+            except BaseException:
+                # Cancelled mid-call: no verdict on the model, but the probe slot and reservation must be freed
+                breaker.release()
+                with anyio.CancelScope(shield=True):
+                    await self.budget.settle(reservation, wasted_prompt_tokens + prompt_estimate, 0)
+                call.attempts += 1
+                call.path.append(f"{model}:cancelled")
+                call.outcome = "cancelled"
+                self._record(call, started)
+                raise
+            breaker.record_success()
+            if model != params["model"]:
+                logger.info(f"Served {task} with fallback model {model}")
+            prompt_tokens, completion_tokens = _usage_counts(completion.usage)
+            self.sizer.record(task, completion_tokens, completion.choices[0].finish_reason == "length")
+            wasted_prompt_tokens += (attempts - 1) * prompt_estimate
+            await self.budget.settle(reservation, prompt_tokens + wasted_prompt_tokens, completion_tokens)
+            call.attempts += attempts
+            call.hedged = attempts > 1
+            call.path.append(f"{model}:{'hedged' if call.hedged else 'ok'}")
+            call.model = model
+            call.prompt_tokens, call.completion_tokens = prompt_tokens, completion_tokens
+            call.finish_reason = completion.choices[0].finish_reason
+            self._record(call, started)
+            return completion
+
+        await self.budget.settle(reservation, wasted_prompt_tokens, 0)
+        call.outcome = "unavailable"
+        self._record(call, started)
+        raise LLMUnavailable(f"No model available for {task}")
+
+    async def stream(self, task: str, messages: List[Dict[str, str]], user: Optional[str] = None, budget: Optional[str] = None, **overrides) -> LLMStream:
+        """Streamed chat completion; iterate the result and close it when done.
+
+        Falls back to the next model only while opening the stream; streams are not hedged.
+        """
+        prompt_estimate = estimate_prompt_tokens(messages)
+        params = self._sized_params(task, overrides, prompt_estimate)
+        record_prompt(task, messages, params)
+        reservation = await self.budget.reserve(budget or task, user, prompt_estimate + params["max_tokens"])
+        call = LLMCall(task, params["model"], stream=True)
+        started = time.perf_counter()
+        wasted_prompt_tokens = 0
+        for model in model_chain(params["model"]):
+            breaker = self.breaker(model)
+            if not breaker.allow():
+                logger.info(f"Skipping {model} for {task}: circuit open")
+                call.path.append(f"{model}:open")
+                continue
+            try:
+                stream = await self.client.chat.completions.create(messages=messages, stream=True, **{**params, "model": model})
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure()
+                wasted_prompt_tokens += prompt_estimate
+                call.attempts += 1
+                call.path.append(f"{model}:{type(e).__name__}")
+                logger.warning(f"{model} failed to stream {task}: {type(e).__name__}")
+                continue
+            except Exception as e:
+                breaker.record_success()
+                await self.budget.settle(reservation, wasted_prompt_tokens + prompt_estimate, 0)
+                call.attempts += 1
+                call.path.append(f"{model}:{type(e).__name__}")
+                call.outcome = "error"
+                self._record(call, started)
+                raise
+            except BaseException:
+                breaker.release()
+                with anyio.CancelScope(shield=True):
+                    await self.budget.settle(reservation, wasted_prompt_tokens + prompt_estimate, 0)
+                call.attempts += 1
+                call.path.append(f"{model}:cancelled")
+                call.outcome = "cancelled"
+                self._record(call, started)
+                raise
+            if model != params["model"]:
+                logger.info(f"Streaming {task} from fallback model {model}")
+            call.attempts += 1
+            call.path.append(f"{model}:ok")
+            call.model = model
+            return LLMStream(self, stream, task, model, reservation, prompt_estimate, wasted_prompt_tokens, call, started)
+
+        await self.budget.settle(reservation, wasted_prompt_tokens, 0)
+        call.outcome = "unavailable"
+        self._record(call, started)
+        raise LLMUnavailable(f"No model available for {task}")
+
+    def resilience_status(self) -> Dict[str, Any]:
+        """Circuit state per model, latency/hedging figures per task and model, and output sizes per task"""
+        return {
+            "breakers": {model: breaker.status() for model, breaker in self.breakers.items()},
+            "latency": {f"{task}:{model}": tracker.status() for (task, model), tracker in self.latency.items()},
+            "output_tokens": self.sizer.status(),
+        }
+
+
+def requester_key(request: Request) -> str:
+    """Budget key for routes open to anonymous callers: the account when a valid token is sent, else the client address"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            return verify_token(authorization[7:].strip())
+        except HTTPException:
+            pass
+    forwarded = request.headers.get("x-forwarded-for")
+    if TRUSTED_PROXY_COUNT and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",")]
+        # Entries left of the ones our proxies appended are whatever the client sent
+        return f"ip:{addresses[-min(TRUSTED_PROXY_COUNT, len(addresses))]}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get the shared LLM gateway, creating it on first use"""
+    global _gateway
+    if _gateway is None:
+        store = None
+        if BUDGET_STORE == "mongo":
+            # Imported here because the database client is only connected once the app starts
+            from database.config import get_database
+            store = MongoBucketStore(get_database())
+        _gateway = LLMGateway(budget=TokenBudget(store))
+        logger.info(f"LLM gateway ready ({BUDGET_STORE} token budgets, {'enabled' if BUDGETS_ENABLED else 'disabled'})")
+    return _gateway
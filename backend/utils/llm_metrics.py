@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Per-minute rollups of every call go to the llm_metrics collection, kept for the retention period
+PERSIST_ENABLED = os.getenv("LLM_METRICS_PERSIST", "true").lower() == "true"
+FLUSH_SECONDS = float(os.getenv("LLM_METRICS_FLUSH_SECONDS", "30"))
+RETENTION_DAYS = int(os.getenv("LLM_METRICS_RETENTION_DAYS", "14"))
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 40000, 60000, math.inf)
+
+# Groq list prices in USD per million (input, output) tokens; update when they change
+PRICES_PER_MILLION = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+PARSE_OK = "ok"
+PARSE_INVALID_JSON = "invalid_json"
+PARSE_INVALID_SHAPE = "invalid_shape"
+
+
+def call_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """List price of one call in USD; 0 for models without a known price"""
+    input_price, output_price = PRICES_PER_MILLION.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def bucket_label(ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if ms <= bound:
+            return "le_inf" if bound == math.inf else f"le_{bound}"
+    return "le_inf"
+
+
+def bucket_percentile(buckets: Dict[str, int], p: float) -> Optional[float]:
+    """Upper bound of the bucket holding the p-th percentile; None for an empty or open-ended answer"""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    target = total * p / 100
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += buckets.get(bucket_label(bound), 0)
+        if seen >= target:
+            return None if bound == math.inf else bound
+    return None
+
+
+@dataclass
+class LLMCall:
+    """What happened on one gateway call, from reservation to the last token"""
+    task: str
+    requested_model: str
+    model: Optional[str] = None
+    stream: bool = False
+    outcome: str = "ok"  # ok, error, unavailable or cancelled
+    attempts: int = 0  # requests sent, counting hedges and failed models
+    hedged: bool = False
+    path: List[str] = field(default_factory=list)  # model:result for every model tried
+    ttft_ms: Optional[float] = None
+    total_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    finish_reason: Optional[str] = None
+
+    @property
+    def fallback(self) -> bool:
+        return self.model is not None and self.model != self.requested_model
+
+
+class TaskStats:
+    """Running totals and latency histograms for one task since the process started"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.models: Counter = Counter()
+        self.parse: Counter = Counter()
+        self.cost_usd = 0.0
+        self.total_ms: Counter = Counter()
+        self.ttft_ms: Counter = Counter()
+
+    def add(self, call: LLMCall):
+        self.counts["calls"] += 1
+        self.counts[call.outcome] += 1
+        self.counts["fallbacks"] += call.fallback
+        self.counts["hedged"] += call.hedged
+        self.counts["retries"] += sum(not step.endswith((":ok", ":hedged", ":open")) for step in call.path)
+        self.counts["truncated"] += call.finish_reason == "length"
+        self.counts["prompt_tokens"] += call.prompt_tokens
+        self.counts["completion_tokens"] += call.completion_tokens
+        if call.model:
+            self.models[call.model] += 1
+        self.cost_usd += call_cost(call.model, call.prompt_tokens, call.completion_tokens)
+        if call.outcome == "ok":
+            self.total_ms[bucket_label(call.total_ms)] += 1
+            if call.ttft_ms is not None:
+                self.ttft_ms[bucket_label(call.ttft_ms)] += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **dict(self.counts),
+            "models": dict(self.models),
+            "parse": dict(self.parse),
+            "cost_usd": round(self.cost_usd, 6),
+            "total_ms": latency_summary(self.total_ms),
+            "ttft_ms": latency_summary(self.ttft_ms),
+        }
+
+
+def latency_summary(buckets: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "count": sum(buckets.values()),
+        "p50": bucket_percentile(buckets, 50),
+        "p95": bucket_percentile(buckets, 95),
+        "p99": bucket_percentile(buckets, 99),
+        "buckets": dict(buckets),
+    }
+
+
+class LLMMetrics:
+    """Per-task call statistics for the metrics endpoint, plus per-minute rollups waiting to be stored"""
+
+    def __init__(self):
+        self.tasks: Dict[str, TaskStats] = {}
+        self._pending: Dict[Tuple[datetime, str, str], Counter] = {}
+        self._indexed = False
+
+    def _task(self, task: str) -> TaskStats:
+        if task not in self.tasks:
+            self.tasks[task] = TaskStats()
+        return self.tasks[task]
+
+    def _rollup(self, task: str, model: Optional[str]) -> Counter:
+        minute = datetime.utcnow().replace(second=0, microsecond=0)
+        key = (minute, task, model or "none")
+        if key not in self._pending:
+            self._pending[key] = Counter()
+        return self._pending[key]
+
+    def record_call(self, call: LLMCall):
+        self._task(call.task).add(call)
+        rollup = self._rollup(call.task, call.model or call.requested_model)
+        rollup["calls"] += 1
+        rollup[call.outcome] += 1
+        rollup["fallbacks"] += call.fallback
+        rollup["hedged"] += call.hedged
+        rollup["prompt_tokens"] += call.prompt_tokens
+        rollup["completion_tokens"] += call.completion_tokens
+        rollup["truncated"] += call.finish_reason == "length"
+        rollup["cost_micro_usd"] += round(call_cost(call.model, call.prompt_tokens, call.completion_tokens) * 1_000_000)
+        if call.outcome == "ok":
+            rollup[f"total_ms.{bucket_label(call.total_ms)}"] += 1
+            if call.ttft_ms is not None:
+                rollup[f"ttft_ms.{bucket_label(call.ttft_ms)}"] += 1
+
+        ttft = f" ttft_ms={call.ttft_ms:.0f}" if call.ttft_ms is not None else ""
+        logger.info(
+            f"LLM call task={call.task} model={call.model} outcome={call.outcome} total_ms={call.total_ms:.0f}{ttft} "
+            f"tokens={call.prompt_tokens}/{call.completion_tokens} finish={call.finish_reason} path={','.join(call.path)}"
+        )
+
+    def record_parse(self, task: str, outcome: str, model: Optional[str] = None):
+        """Whether a task's output could be used: ok, invalid_json or invalid_shape"""
+        self._task(task).parse[outcome] += 1
+        self._rollup(task, model)[f"parse.{outcome}"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {task: stats.status() for task, stats in self.tasks.items()}
+
+    async def flush(self, db):
+        """Add the pending rollups to the llm_metrics collection"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne(
+                {"_id": f"{minute.isoformat()}|{task}|{model}"},
+                {
+                    "$inc": dict(counts),
+                    "$setOnInsert": {
+                        "minute": minute,
+                        "task": task,
+                        "model": model,
+                        "expires_at": minute + timedelta(days=RETENTION_DAYS),
+                    },
+                },
+                upsert=True,
+            )
+            for (minute, task, model), counts in pending.items()
+        ]
+        try:
+            if not self._indexed:
+                await db.llm_metrics.create_index([("task", 1), ("minute", 1)])
+                await db.llm_metrics.create_index("expires_at", expireAfterSeconds=0)
+                self._indexed = True
+            await db.llm_metrics.bulk_write(operations, ordered=False)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            for key, counts in pending.items():
+                self._pending.setdefault(key, Counter()).update(counts)
+            raise
+
+
+async def metrics_history(db, since: datetime, until: datetime, task: Optional[str] = None) -> Dict[str, Any]:
+    """Stored rollups between two times, summed per task and model"""
+    query: Dict[str, Any] = {"minute": {"$gte": since, "$lt": until}}
+    if task:
+        query["task"] = task
+    totals: Dict[str, Dict[str, Any]] = {}
+    async for doc in db.llm_metrics.find(query, {"_id": 0, "minute": 0, "expires_at": 0}):
+        key = f"{doc['task']}:{doc['model']}"
+        entry = totals.setdefault(key, {
+            "task": doc["task"], "model": doc["model"], "counts": Counter(),
+            "parse": Counter(), "total_ms": Counter(), "ttft_ms": Counter(),
+        })
+        for name, value in doc.items():
+            if name in ("task", "model"):
+                continue
+            if isinstance(value, dict):
+                entry[name].update(value)
+            else:
+                entry["counts"][name] += value
+
+    return {
+        key: {
+            "task": entry["task"],
+            "model": entry["model"],
+            **{name: value for name, value in entry["counts"].items() if name != "cost_micro_usd"},
+            "cost_usd": round(entry["counts"]["cost_micro_usd"] / 1_000_000, 6),
+            "parse": dict(entry["parse"]),
+            "total_ms": latency_summary(entry["total_ms"]),
+            "ttft_ms": latency_summary(entry["ttft_ms"]),
+        }
+        for key, entry in sorted(totals.items())
+    }
+
+
+_metrics = LLMMetrics()
+_flush_task: Optional[asyncio.Task] = None
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """Process-wide LLM call metrics"""
+    return _metrics
+
+
+async def _flush_loop():
+    from database.config import get_database
+    while True:
+        await asyncio.sleep(FLUSH_SECONDS)
+        try:
+            await _metrics.flush(get_database())
+        except Exception as e:
+            logger.error(f"Error storing LLM metrics: {str(e)}")
+
+
+def start_metrics_flush():
+    """Store rollups every FLUSH_SECONDS while the app runs"""
+    global _flush_task
+    if PERSIST_ENABLED and _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_metrics_flush():
+    """Stop the flush loop and store what is left"""
+    global _flush_task
+    if _flush_task is None:
+        return
+    _flush_task.cancel()
+    _flush_task = None
+    from database.config import get_database
+    try:
+        await asyncio.wait_for(_metrics.flush(get_database()), timeout=5)
+    except Exception as e:
+        logger.error(f"Error storing LLM metrics on shutdown: {str(e)}")
@@ -0,0 +1,143 @@
+import copy
+import json
+import logging
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from utils.llm_metrics import PARSE_INVALID_JSON, PARSE_INVALID_SHAPE, PARSE_OK, get_llm_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove the markdown code fences models sometimes wrap JSON in"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text.replace("```json", "").replace("```", "")
+    elif text.startswith("```"):
+        text = text.replace("```", "")
+    return text.strip()
+
+
+def parse_json_output(text: str) -> Any:
+    """Parse a model's JSON answer; raises json.JSONDecodeError when it is not valid JSON"""
+    return json.loads(strip_code_fences(text))
+
+
+def _require(data: Any, fields, what: str):
+    if not isinstance(data, dict) or not all(field in data for field in fields):
+        raise ValueError(f"Missing required fields in {what}")
+
+
+def _check_tip(data: Any):
+    _require(data, ["title", "tip", "category", "difficulty", "benefits"], "tip data")
+
+
+def _check_quiz(data: Any):
+    _require(data, ["question", "options", "correct_answer", "explanation"], "quiz data")
+    if len(data["options"]) != 4:
+        raise ValueError("Quiz must have exactly 4 options")
+
+
+def _check_myth(data: Any):
+    _require(data, ["myth", "fact", "explanation"], "myth data")
+
+
+def _check_myth_cards(data: Any):
+    if not isinstance(data, dict) or not isinstance(data.get("myths"), list):
+        raise ValueError("Invalid myths data structure")
+    for myth in data["myths"]:
+        _require(myth, ["id", "myth", "fact", "explanation"], "myth data")
+
+
+def _check_diet_plan(data: Any):
+    _require(data, ["plan_summary", "weekly_plan", "nutrition_tips", "meal_prep_suggestions"], "diet plan")
+    if not isinstance(data["weekly_plan"], list) or len(data["weekly_plan"]) < 3:
+        raise ValueError("Weekly plan must have at least 3 days")
+
+
+def _check_diet_plan_retry(data: Any):
+    _require(data, ["weekly_plan"], "diet plan")
+    if not isinstance(data["weekly_plan"], list) or not data["weekly_plan"]:
+        raise ValueError("Weekly plan must have at least 1 day")
+
+
+# Shape each task's JSON answer must have to be usable
+OUTPUT_CHECKS: Dict[str, Callable[[Any], None]] = {
+    "tip_of_the_day": _check_tip,
+    "quiz_question": _check_quiz,
+    "random_myth": _check_myth,
+    "myth_cards": _check_myth_cards,
+    "diet_plan": _check_diet_plan,
+    "diet_plan_retry": _check_diet_plan_retry,
+}
+
+
+def check_output(task: str, data: Any):
+    """Raise ValueError if parsed output does not have the shape ``task`` needs"""
+    check = OUTPUT_CHECKS.get(task)
+    if check:
+        check(data)
+
+
+def validate_output(task: str, text: str) -> Tuple[Optional[Any], Optional[str]]:
+    """Parsed output and None, or None and the reason the raw text is unusable for ``task``"""
+    try:
+        data = parse_json_output(text)
+        check_output(task, data)
+        return data, None
+    except (json.JSONDecodeError, ValueError) as e:
+        return None, str(e)
+
+
+def parse_task_output(task: str, text: str, model: Optional[str] = None) -> Any:
+    """Parse and check ``task``'s output, counting the outcome in the LLM metrics.
+
+    Raises json.JSONDecodeError or ValueError like parse_json_output and check_output.
+    """
+    metrics = get_llm_metrics()
+    try:
+        data = parse_json_output(text)
+    except json.JSONDecodeError:
+        metrics.record_parse(task, PARSE_INVALID_JSON, model)
+        raise
+    try:
+        check_output(task, data)
+    except ValueError:
+        metrics.record_parse(task, PARSE_INVALID_SHAPE, model)
+        raise
+    metrics.record_parse(task, PARSE_OK, model)
+    return data
+
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def parse_diet_plan(text: str, task: str = "diet_plan") -> Dict[str, Any]:
+    """Parse a diet plan answer for ``task``, repairing truncation and padding it to seven days.
+
+    Raises json.JSONDecodeError or ValueError when the plan cannot be used.
+    """
+    text = strip_code_fences(text)
+
+    # Try to fix truncated JSON by finding the last complete object
+    if text.count('{') > text.count('}'):
+        # JSON is truncated, try to find the last complete object
+        last_brace = text.rfind('}')
+        if last_brace > 0:
+            text = text[:last_brace + 1]
+            logger.info("Fixed truncated JSON response")
+
+    plan = json.loads(text)
+    check_output(task, plan)
+
+    # If we have less than 7 days, pad with additional days
+    if len(plan["weekly_plan"]) < 7:
+        logger.info(f"Padding diet plan from {len(plan['weekly_plan'])} to 7 days")
+        while len(plan["weekly_plan"]) < 7:
+            # Copy the last day and modify it slightly
+            last_day = copy.deepcopy(plan["weekly_plan"][-1])
+            last_day["day"] = len(plan["weekly_plan"]) + 1
+            last_day["day_name"] = DAY_NAMES[len(plan["weekly_plan"])]
+            plan["weekly_plan"].append(last_day)
+
+    return plan
@@ -0,0 +1,120 @@
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a model's circuit, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# A duplicate request is sent once a call has been waiting longer than this percentile of recent calls
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Hedging starts only after this many successful calls have been timed for a task and model
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Hedged requests double the cost of a call, so only this share of calls may be hedged
+HEDGE_MAX_FRACTION = float(os.getenv("LLM_HEDGE_MAX_FRACTION", "0.1"))
+LATENCY_WINDOW = 200
+
+# Models tried in order when the requested one fails or its circuit is open
+FALLBACK_CHAIN = [
+    model.strip()
+    for model in os.getenv("LLM_FALLBACK_CHAIN", "llama-3.3-70b-versatile,llama-3.1-8b-instant").split(",")
+    if model.strip()
+]
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Stops calls to a model after repeated failures, then lets a single probe through once the cooldown ends"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may be sent to this model now"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release(self):
+        """Let another probe through after one ended without a verdict"""
+        self.probe_in_flight = False
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.times_opened}
+
+
+class LatencyTracker:
+    """Recent successful call latencies for one task and model, used to decide when to hedge"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before sending a duplicate request, or None when this call must not be hedged"""
+        self.calls += 1
+        if len(self.samples) < HEDGE_MIN_SAMPLES or self.hedges >= self.calls * HEDGE_MAX_FRACTION:
+            return None
+        return self.percentile(HEDGE_PERCENTILE)
+
+    def status(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "calls": self.calls,
+            "hedges": self.hedges,
+        }
+
+
+def model_chain(model: str) -> List[str]:
+    """The requested model followed by the smaller models configured after it in the fallback chain"""
+    if model in FALLBACK_CHAIN:
+        return FALLBACK_CHAIN[FALLBACK_CHAIN.index(model):]
+    return [model]
@@ -0,0 +1,112 @@
+import logging
+import math
+import os
+from collections import Counter
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SIZING_ENABLED = os.getenv("LLM_ADAPTIVE_MAX_TOKENS", "true").lower() == "true"
+# max_tokens is set to this percentile of recent completion lengths, times the margin
+SIZING_PERCENTILE = float(os.getenv("LLM_SIZING_PERCENTILE", "99"))
+SIZING_MARGIN = float(os.getenv("LLM_SIZING_MARGIN", "1.15"))
+# Until a task has this many completions on record, its configured max_tokens is used as is
+SIZING_MIN_SAMPLES = int(os.getenv("LLM_SIZING_MIN_SAMPLES", "30"))
+MIN_MAX_TOKENS = 64
+
+# Histogram resolution, and the sample count at which old counts are halved so recent outputs dominate
+BUCKET_TOKENS = 32
+HISTOGRAM_DECAY_AT = 2000
+
+# Context windows and completion caps per model, from Groq's model list
+MODEL_CONTEXT_TOKENS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+}
+MODEL_MAX_COMPLETION_TOKENS = {
+    "llama-3.3-70b-versatile": 32768,
+    "llama-3.1-8b-instant": 131072,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Lower per-request ceiling for accounts whose rate limits cap prompt plus max_tokens below the window
+CONTEXT_LIMIT_OVERRIDE = int(os.getenv("LLM_CONTEXT_LIMIT_TOKENS", "0")) or None
+# Share of the limit a request may plan to use; prompt sizes are estimates, so keep some slack
+CONTEXT_HEADROOM = 0.9
+
+
+def context_limit(model: Optional[str]) -> int:
+    """Tokens one request to ``model`` may use for prompt and completion together"""
+    window = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    return min(window, CONTEXT_LIMIT_OVERRIDE) if CONTEXT_LIMIT_OVERRIDE else window
+
+
+def prompt_allowance(model: Optional[str], max_tokens: int) -> int:
+    """Estimated prompt tokens that still leave room for ``max_tokens`` of output"""
+    return int(context_limit(model) * CONTEXT_HEADROOM) - max_tokens
+
+
+class OutputHistogram:
+    """Completion lengths for one task, in BUCKET_TOKENS-wide buckets"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.total = 0
+        self.truncated = 0
+
+    def add(self, tokens: int, truncated: bool = False):
+        self.counts[tokens // BUCKET_TOKENS] += 1
+        self.total += 1
+        self.truncated += truncated
+        if self.total >= HISTOGRAM_DECAY_AT:
+            self.counts = Counter({bucket: count // 2 for bucket, count in self.counts.items() if count // 2})
+            self.total = sum(self.counts.values())
+            self.truncated //= 2
+
+    def percentile(self, p: float) -> Optional[int]:
+        """Upper edge of the bucket holding the p-th percentile"""
+        if not self.total:
+            return None
+        target = self.total * p / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return (bucket + 1) * BUCKET_TOKENS
+        return (max(self.counts) + 1) * BUCKET_TOKENS
+
+
+class OutputSizer:
+    """Chooses max_tokens per task from the completion lengths seen so far.
+
+    A limit far above real outputs makes the provider and our token budget hold capacity
+    that is never used; one below them truncates JSON and forces a retry. Truncated
+    completions are recorded at the limit they hit, so a task that keeps truncating
+    pushes its p99, and with it the next limit, upwards.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, OutputHistogram] = {}
+
+    def record(self, task: str, completion_tokens: int, truncated: bool = False):
+        if task not in self.histograms:
+            self.histograms[task] = OutputHistogram()
+        self.histograms[task].add(completion_tokens, truncated)
+
+    def max_tokens(self, task: str, model: Optional[str], configured: int) -> int:
+        """max_tokens for the next call: the configured value until enough outputs are on record"""
+        histogram = self.histograms.get(task)
+        if not SIZING_ENABLED or histogram is None or histogram.total < SIZING_MIN_SAMPLES:
+            return configured
+        sized = math.ceil(histogram.percentile(SIZING_PERCENTILE) * SIZING_MARGIN)
+        return max(MIN_MAX_TOKENS, min(sized, MODEL_MAX_COMPLETION_TOKENS.get(model, configured)))
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            task: {
+                "samples": histogram.total,
+                "truncated": histogram.truncated,
+                "p50_tokens": histogram.percentile(50),
+                "p99_tokens": histogram.percentile(99),
+            }
+            for task, histogram in self.histograms.items()
+        }
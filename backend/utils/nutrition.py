@@ -0,0 +1,179 @@
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+    'very_active': 1.9
+}
+DEFAULT_ACTIVITY_MULTIPLIER = 1.55
+
+# Daily calorie adjustment relative to maintenance, per primary goal
+GOAL_CALORIE_ADJUSTMENTS = {
+    'weight_loss': -500,
+    'weight_gain': 500,
+}
+
+# Share of calories from (protein, carbs, fat) per primary goal
+MACRO_RATIOS = {
+    'weight_loss': (0.30, 0.40, 0.30),
+    'weight_gain': (0.20, 0.50, 0.30),
+    'muscle_gain': (0.30, 0.45, 0.25),
+}
+DEFAULT_MACRO_RATIOS = (0.20, 0.50, 0.30)
+CALORIES_PER_GRAM = (4.0, 4.0, 9.0)
+
+# Energy in one kilogram of body weight change
+KCAL_PER_KG = 7700.0
+
+FORMULAS = ("harris_benedict", "mifflin_st_jeor")
+
+
+def bmi(weight: float, height: float) -> Optional[float]:
+    """Body mass index from weight in kg and height in cm"""
+    if not weight or not height:
+        return None
+    return weight / ((height / 100) ** 2)
+
+
+def bmr_harris_benedict(weight: float, height: float, age: float, gender: str) -> float:
+    """Basal metabolic rate using the revised Harris-Benedict equation"""
+    if gender.lower() == 'male':
+        return 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
+    return 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+
+
+def bmr_mifflin_st_jeor(weight: float, height: float, age: float, gender: str) -> float:
+    """Basal metabolic rate using the Mifflin-St Jeor equation"""
+    base = (10 * weight) + (6.25 * height) - (5 * age)
+    return base + 5 if gender.lower() == 'male' else base - 161
+
+
+def tdee(bmr: float, activity_level: str) -> int:
+    """Total daily energy expenditure (maintenance calories)"""
+    return int(bmr * ACTIVITY_MULTIPLIERS.get(activity_level, DEFAULT_ACTIVITY_MULTIPLIER))
+
+
+def calorie_target(maintenance_calories: int, primary_goal: str) -> int:
+    """Daily calorie target for a goal given maintenance calories"""
+    return maintenance_calories + GOAL_CALORIE_ADJUSTMENTS.get(primary_goal, 0)
+
+
+def macro_split(daily_calories: float, primary_goal: str) -> Dict[str, int]:
+    """Protein, carbohydrate and fat grams for a calorie target"""
+    ratios = MACRO_RATIOS.get(primary_goal, DEFAULT_MACRO_RATIOS)
+    protein, carbs, fat = (
+        int(round(daily_calories * ratio / kcal))
+        for ratio, kcal in zip(ratios, CALORIES_PER_GRAM)
+    )
+    return {"protein_grams": protein, "carbs_grams": carbs, "fat_grams": fat}
+
+
+def weeks_to_target(weight: float, target_weight: float, daily_calorie_delta: float) -> Optional[float]:
+    """Weeks needed to reach a target weight at a constant daily calorie surplus or deficit.
+
+    Returns None when the calorie delta points away from the target or is zero.
+    """
+    weight_change = target_weight - weight
+    if abs(weight_change) < 1e-9:
+        return 0.0
+    if daily_calorie_delta == 0 or (weight_change > 0) != (daily_calorie_delta > 0):
+        return None
+    return abs(weight_change) * KCAL_PER_KG / (abs(daily_calorie_delta) * 7)
+
+
+def calculate_targets(
+    age: float,
+    gender: str,
+    weight: float,
+    height: float,
+    activity_level: str,
+    primary_goal: str,
+    target_weight: Optional[float] = None,
+    formula: str = "harris_benedict"
+) -> Dict[str, Any]:
+    """BMI, BMR, maintenance calories, calorie target, macros and timeline for one profile"""
+    if formula == "mifflin_st_jeor":
+        bmr = bmr_mifflin_st_jeor(weight, height, age, gender)
+    else:
+        bmr = bmr_harris_benedict(weight, height, age, gender)
+    maintenance_calories = tdee(bmr, activity_level)
+    daily_calories = calorie_target(maintenance_calories, primary_goal)
+
+    return {
+        "bmi": bmi(weight, height),
+        "bmr": bmr,
+        "maintenance_calories": maintenance_calories,
+        "daily_calories": daily_calories,
+        **macro_split(daily_calories, primary_goal),
+        "weeks_to_target": (
+            weeks_to_target(weight, target_weight, daily_calories - maintenance_calories)
+            if target_weight is not None else None
+        ),
+    }
+
+
+def calculate_targets_batch(
+    ages: np.ndarray,
+    genders: List[str],
+    weights: np.ndarray,
+    heights: np.ndarray,
+    activity_levels: List[str],
+    primary_goals: List[str],
+    target_weights: Optional[np.ndarray] = None,
+    formula: str = "harris_benedict"
+) -> Dict[str, np.ndarray]:
+    """Vectorized ``calculate_targets`` over many profiles; returns one array per field.
+
+    Produces the same values as the scalar path, with NaN where the scalar
+    path returns None. Pass NaN in ``target_weights`` for profiles without a target.
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    male = np.array([g.lower() == 'male' for g in genders], dtype=bool)
+
+    if formula == "mifflin_st_jeor":
+        bmr = (10 * weights) + (6.25 * heights) - (5 * ages) + np.where(male, 5.0, -161.0)
+    else:
+        bmr = np.where(
+            male,
+            88.362 + (13.397 * weights) + (4.799 * heights) - (5.677 * ages),
+            447.593 + (9.247 * weights) + (3.098 * heights) - (4.330 * ages),
+        )
+
+    multipliers = np.array(
+        [ACTIVITY_MULTIPLIERS.get(level, DEFAULT_ACTIVITY_MULTIPLIER) for level in activity_levels]
+    )
+    maintenance_calories = np.trunc(bmr * multipliers).astype(np.int64)
+    adjustments = np.array([GOAL_CALORIE_ADJUSTMENTS.get(goal, 0) for goal in primary_goals], dtype=np.int64)
+    daily_calories = maintenance_calories + adjustments
+
+    ratios = np.array([MACRO_RATIOS.get(goal, DEFAULT_MACRO_RATIOS) for goal in primary_goals]).reshape(-1, 3)
+    macros = np.rint(daily_calories[:, None] * ratios / np.array(CALORIES_PER_GRAM)).astype(np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi_values = np.where(heights > 0, weights / (heights / 100) ** 2, np.nan)
+
+        weeks = np.full(len(weights), np.nan)
+        if target_weights is not None:
+            target_weights = np.asarray(target_weights, dtype=np.float64)
+            weight_change = target_weights - weights
+            delta = (daily_calories - maintenance_calories).astype(np.float64)
+            reachable = (delta != 0) & (np.sign(weight_change) == np.sign(delta))
+            weeks = np.where(reachable, np.abs(weight_change) * KCAL_PER_KG / (np.abs(delta) * 7), np.nan)
+            weeks = np.where(np.abs(weight_change) < 1e-9, 0.0, weeks)
+
+    return {
+        "bmi": bmi_values,
+        "bmr": bmr,
+        "maintenance_calories": maintenance_calories,
+        "daily_calories": daily_calories,
+        "protein_grams": macros[:, 0],
+        "carbs_grams": macros[:, 1],
+        "fat_grams": macros[:, 2],
+        "weeks_to_target": weeks,
+    }
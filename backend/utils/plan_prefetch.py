@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from database.config import get_database
+from utils.plan_store import get_latest_plan, save_plan, count_plans_since
+
+logger = logging.getLogger(__name__)
+
+# Speculative generation spends LLM tokens on plans that may never be opened, so it is opt-in
+PREFETCH_ENABLED = os.getenv("PLAN_PREFETCH_ENABLED", "false").lower() == "true"
+DAILY_BUDGET = int(os.getenv("PLAN_PREFETCH_DAILY_BUDGET", "2"))
+# Wait this long after a profile change so a burst of edits produces a single job
+PREFETCH_DELAY_SECONDS = float(os.getenv("PLAN_PREFETCH_DELAY_SECONDS", "60"))
+
+# Health profile fields that feed into plan generation
+PLAN_RELEVANT_FIELDS = ("weight", "height", "allergies", "dietary_restrictions", "health_conditions")
+
+_pending: Dict[str, asyncio.Task] = {}
+_versions: Dict[str, int] = {}
+_slot: Optional[asyncio.Semaphore] = None
+
+
+def _get_slot() -> asyncio.Semaphore:
+    """Prefetch jobs run one at a time so they never crowd out user-initiated generations"""
+    global _slot
+    if _slot is None:
+        _slot = asyncio.Semaphore(1)
+    return _slot
+
+
+def _comparable(field: str, value: Any) -> Any:
+    if field == "health_conditions":
+        return sorted(
+            (c.get("condition_name", "") if isinstance(c, dict) else str(c)).strip().lower()
+            for c in value or []
+        )
+    if field in ("allergies", "dietary_restrictions"):
+        return sorted(str(v).strip().lower() for v in value or [])
+    return value
+
+
+def changed_plan_fields(old_profile: Dict[str, Any], new_profile: Dict[str, Any]) -> List[str]:
+    """Plan-relevant health profile fields whose values differ between two profiles"""
+    return [
+        field for field in PLAN_RELEVANT_FIELDS
+        if field in new_profile
+        and _comparable(field, old_profile.get(field)) != _comparable(field, new_profile.get(field))
+    ]
+
+
+def apply_profile_changes(plan_data: Dict[str, Any], profile: Dict[str, Any], changed: List[str]) -> Dict[str, Any]:
+    """Plan inputs from a previous request with the changed profile fields carried over"""
+    merged = dict(plan_data)
+    if "weight" in changed and profile.get("weight"):
+        merged["weight"] = profile["weight"]
+    if "height" in changed and profile.get("height"):
+        merged["height"] = profile["height"]
+    if "allergies" in changed:
+        merged["allergies"] = list(profile.get("allergies") or [])
+    if "dietary_restrictions" in changed:
+        merged["dietaryPreferences"] = list(profile.get("dietary_restrictions") or [])
+    if "health_conditions" in changed:
+        merged["healthConditions"] = _comparable("health_conditions", profile.get("health_conditions"))
+    return merged
+
+
+def schedule_plan_prefetch(email: str, old_profile: Dict[str, Any], new_profile: Dict[str, Any]) -> bool:
+    """Queue a background plan generation if plan-relevant profile fields changed.
+
+    A newer change for the same user cancels any job that is still queued or running.
+    """
+    if not PREFETCH_ENABLED:
+        return False
+    changed = changed_plan_fields(old_profile or {}, new_profile or {})
+    if not changed:
+        return False
+
+    version = _versions.get(email, 0) + 1
+    _versions[email] = version
+    pending = _pending.get(email)
+    if pending and not pending.done():
+        pending.cancel()
+        logger.info(f"Cancelled stale plan prefetch for {email}")
+
+    task = asyncio.create_task(_run_prefetch(email, new_profile, changed, version))
+    _pending[email] = task
+    task.add_done_callback(lambda done: _pending.pop(email, None) if _pending.get(email) is done else None)
+    logger.info(f"Scheduled plan prefetch for {email} (changed: {', '.join(changed)})")
+    return True
+
+
+async def _run_prefetch(email: str, profile: Dict[str, Any], changed: List[str], version: int):
+    try:
+        await asyncio.sleep(PREFETCH_DELAY_SECONDS)
+        async with _get_slot():
+            if _versions.get(email) != version:
+                return
+            db = get_database()
+
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            if await count_plans_since(db, email, "prefetch", today) >= DAILY_BUDGET:
+                logger.info(f"Daily plan prefetch budget used up for {email}")
+                return
+
+            latest = await get_latest_plan(db, email)
+            if not latest or not latest.get("plan_data"):
+                # Goals and activity level only come from a plan request, so there is nothing to go on yet
+                return
+            plan_data = apply_profile_changes(latest["plan_data"], profile, changed)
+
+            # Imported here because the route module builds the prompts and depends on this package
+            from routes.dietplan import create_diet_plan
+            # Drawn from its own bucket so prefetching never eats into the user's own plan budget
+            diet_plan = await create_diet_plan(plan_data, email, budget="diet_plan_prefetch")
+
+            if _versions.get(email) != version:
+                return
+            if "user_info" not in diet_plan:
+                logger.info(f"Discarding fallback plan from prefetch for {email}")
+                return
+            await save_plan(db, email, diet_plan, plan_data, source="prefetch")
+            logger.info(f"Prefetched diet plan stored for {email}")
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Plan prefetch error for {email}: {str(e)}")
@@ -0,0 +1,162 @@
+import logging
+import os
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from utils.nutrition import ACTIVITY_MULTIPLIERS, DEFAULT_ACTIVITY_MULTIPLIER, calculate_targets
+from utils.shopping_list import build_shopping_list, parse_ingredient
+
+logger = logging.getLogger(__name__)
+
+# Plans further than this from the request (in scaled feature units) are not reused
+MAX_DISTANCE = float(os.getenv("PLAN_REUSE_MAX_DISTANCE", "1.5"))
+
+# Numeric features and the difference treated as "one unit" for each
+FEATURE_SCALE = np.array([
+    10.0,   # age, years
+    10.0,   # weight, kg
+    10.0,   # height, cm
+    0.2,    # activity multiplier
+    10.0,   # target weight, kg
+    1.0,    # gender (0 female, 1 male)
+], dtype=np.float64)
+
+_LEADING_NUMBER = re.compile(r"^(\d+(?:\.\d+)?)(?=\s)")
+
+
+def plan_features(plan_data: Dict[str, Any]) -> np.ndarray:
+    """Scaled numeric feature vector for a plan request"""
+    weight = float(plan_data.get("weight") or 70)
+    values = [
+        float(plan_data.get("age") or 25),
+        weight,
+        float(plan_data.get("height") or 170),
+        ACTIVITY_MULTIPLIERS.get(plan_data.get("activityLevel"), DEFAULT_ACTIVITY_MULTIPLIER),
+        float(plan_data.get("targetWeight") or weight),
+        1.0 if str(plan_data.get("gender", "")).lower() == "male" else 0.0,
+    ]
+    return np.array(values, dtype=np.float64) / FEATURE_SCALE
+
+
+def plan_signature(plan_data: Dict[str, Any]) -> Tuple:
+    """Categorical inputs that must match exactly for a plan to be reusable"""
+    def normalized(field: str) -> Tuple[str, ...]:
+        return tuple(sorted({str(v).strip().lower() for v in plan_data.get(field) or [] if str(v).strip()}))
+
+    return (
+        str(plan_data.get("primaryGoal") or "").lower(),
+        normalized("allergies"),
+        normalized("dietaryPreferences"),
+        normalized("healthConditions"),
+    )
+
+
+class PlanSimilarityIndex:
+    """Stored plans bucketed by categorical signature, searched by distance over numeric features"""
+
+    def __init__(self):
+        self._ids: Dict[Tuple, List[str]] = {}
+        self._features: Dict[Tuple, np.ndarray] = {}
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids.values())
+
+    def add(self, plan_id: str, plan_data: Dict[str, Any]):
+        signature = plan_signature(plan_data)
+        features = plan_features(plan_data)[None, :]
+        self._ids.setdefault(signature, []).append(plan_id)
+        existing = self._features.get(signature)
+        self._features[signature] = features if existing is None else np.vstack([existing, features])
+
+    def nearest(self, plan_data: Dict[str, Any], exclude: Tuple[str, ...] = ()) -> Optional[Tuple[str, float]]:
+        """Closest stored plan id with the same signature, with its distance, if within MAX_DISTANCE"""
+        signature = plan_signature(plan_data)
+        features = self._features.get(signature)
+        if features is None:
+            return None
+        distances = np.sqrt(((features - plan_features(plan_data)) ** 2).sum(axis=1))
+        for row in np.argsort(distances):
+            if distances[row] > MAX_DISTANCE:
+                break
+            plan_id = self._ids[signature][row]
+            if plan_id not in exclude:
+                return plan_id, float(distances[row])
+        return None
+
+
+_index: Optional[PlanSimilarityIndex] = None
+
+
+async def get_plan_index(db) -> PlanSimilarityIndex:
+    """Get the shared plan index, loading completed plans from the database on first use"""
+    global _index
+    if _index is None:
+        index = PlanSimilarityIndex()
+        cursor = db.diet_plans.find({"status": {"$ne": "pending"}}, {"plan_data": 1})
+        async for document in cursor:
+            if document.get("plan_data"):
+                index.add(str(document["_id"]), document["plan_data"])
+        logger.info(f"Loaded {len(index)} stored plans into the similarity index")
+        _index = index
+    return _index
+
+
+def index_plan(plan_id: str, plan_data: Dict[str, Any]):
+    """Add a newly stored plan to the index if it has been loaded"""
+    if _index is not None:
+        _index.add(plan_id, plan_data)
+
+
+def _scale_ingredient(ingredient: str, factor: float) -> str:
+    match = _LEADING_NUMBER.match(ingredient)
+    if not match:
+        return ingredient
+    scaled = float(match.group(1)) * factor
+    if parse_ingredient(ingredient).dimension not in ("mass", "volume"):
+        # Countable items ("2 eggs", "1 slice") move in half units
+        scaled = max(0.5, round(scaled * 2) / 2)
+    text = str(int(round(scaled))) if scaled >= 10 else f"{scaled:.1f}".rstrip("0").rstrip(".")
+    return text + ingredient[match.end():]
+
+
+def rescale_plan(diet_plan: Dict[str, Any], plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a stored plan with portions and summary rescaled to the requester's calorie target"""
+    targets = calculate_targets(
+        plan_data.get("age", 25), plan_data.get("gender", "female"), plan_data.get("weight", 70),
+        plan_data.get("height", 170), plan_data.get("activityLevel", "moderate"),
+        plan_data.get("primaryGoal", "weight_loss"), plan_data.get("targetWeight", 65)
+    )
+    summary = dict(diet_plan.get("plan_summary", {}))
+    source_calories = float(summary.get("daily_calories") or 0)
+    factor = targets["daily_calories"] / source_calories if source_calories > 0 else 1.0
+
+    weekly_plan = []
+    for day in diet_plan.get("weekly_plan", []):
+        meals = {}
+        for meal_type, meal in day.get("meals", {}).items():
+            meal = dict(meal)
+            for field in ("calories", "protein", "carbs", "fat"):
+                if isinstance(meal.get(field), (int, float)):
+                    meal[field] = int(round(meal[field] * factor))
+            meal["ingredients"] = [
+                _scale_ingredient(i, factor) if isinstance(i, str) else i for i in meal.get("ingredients", [])
+            ]
+            meals[meal_type] = meal
+        day = {**day, "meals": meals}
+        day["total_calories"] = sum(m.get("calories", 0) for m in meals.values() if isinstance(m.get("calories"), int))
+        weekly_plan.append(day)
+
+    summary.update({
+        "daily_calories": targets["daily_calories"],
+        "protein_grams": targets["protein_grams"],
+        "carbs_grams": targets["carbs_grams"],
+        "fat_grams": targets["fat_grams"],
+    })
+    return {
+        **{k: v for k, v in diet_plan.items() if k not in ("user_info", "validation")},
+        "plan_summary": summary,
+        "weekly_plan": weekly_plan,
+        "shopping_list": build_shopping_list(weekly_plan),
+    }
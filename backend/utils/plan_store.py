@@ -0,0 +1,124 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.plan_similarity import index_plan
+
+# Request fields that change what a generated plan looks like
+PLAN_INPUT_FIELDS = (
+    "age", "gender", "weight", "height", "activityLevel", "primaryGoal", "targetWeight",
+    "dietaryPreferences", "allergies", "healthConditions"
+)
+
+
+def plan_key(plan_data: Dict[str, Any]) -> str:
+    """Stable hash of the plan inputs, used to match stored plans to new requests"""
+    normalized = {}
+    for field in PLAN_INPUT_FIELDS:
+        value = plan_data.get(field)
+        if isinstance(value, list):
+            value = sorted(str(v).strip().lower() for v in value)
+        elif isinstance(value, str):
+            value = value.strip().lower()
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        normalized[field] = value
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _plan_document(email: str, plan: Dict[str, Any], plan_data: Dict[str, Any], source: str) -> Dict[str, Any]:
+    return {
+        "email": email,
+        "plan_key": plan_key(plan_data),
+        "plan_data": {field: plan_data.get(field) for field in PLAN_INPUT_FIELDS if field in plan_data},
+        "plan": plan,
+        "source": source,
+        "consumed": source == "request",
+        "status": "ready",
+        "created_at": datetime.utcnow()
+    }
+
+
+async def save_plan(
+    db: AsyncIOMotorDatabase,
+    email: str,
+    plan: Dict[str, Any],
+    plan_data: Dict[str, Any],
+    source: str = "request"
+) -> str:
+    """Store a generated plan with the inputs it was generated from"""
+    result = await db.diet_plans.insert_one(_plan_document(email, plan, plan_data, source))
+    plan_id = str(result.inserted_id)
+    index_plan(plan_id, plan_data)
+    return plan_id
+
+
+async def create_pending_plan(
+    db: AsyncIOMotorDatabase,
+    email: str,
+    provisional_plan: Dict[str, Any],
+    plan_data: Dict[str, Any]
+) -> str:
+    """Store a provisional plan that a personalized plan will replace once generated"""
+    document = _plan_document(email, provisional_plan, plan_data, "request")
+    document["status"] = "pending"
+    result = await db.diet_plans.insert_one(document)
+    return str(result.inserted_id)
+
+
+async def complete_plan(
+    db: AsyncIOMotorDatabase,
+    plan_id: str,
+    plan: Dict[str, Any],
+    plan_data: Optional[Dict[str, Any]] = None
+):
+    """Replace a pending plan with its personalized version; pass plan_data to make it reusable"""
+    await db.diet_plans.update_one(
+        {"_id": ObjectId(plan_id)},
+        {"$set": {"plan": plan, "status": "ready", "completed_at": datetime.utcnow()}}
+    )
+    if plan_data:
+        index_plan(plan_id, plan_data)
+
+
+async def get_plan(db: AsyncIOMotorDatabase, plan_id: str, email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """One stored plan, optionally restricted to a user"""
+    if not ObjectId.is_valid(plan_id):
+        return None
+    query = {"_id": ObjectId(plan_id)}
+    if email:
+        query["email"] = email
+    return await db.diet_plans.find_one(query, {"plan_data": 0})
+
+
+async def get_latest_plan(db: AsyncIOMotorDatabase, email: str) -> Optional[Dict[str, Any]]:
+    """Most recent stored plan document for a user"""
+    return await db.diet_plans.find_one({"email": email}, sort=[("created_at", -1)])
+
+
+async def list_plans(db: AsyncIOMotorDatabase, email: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Recent stored plans for a user, newest first"""
+    cursor = db.diet_plans.find({"email": email}, {"plan_data": 0}).sort("created_at", -1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def claim_prefetched_plan(
+    db: AsyncIOMotorDatabase,
+    email: str,
+    plan_data: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Take an unused prefetched plan generated for exactly these inputs, if one is waiting"""
+    return await db.diet_plans.find_one_and_update(
+        {"email": email, "plan_key": plan_key(plan_data), "source": "prefetch", "consumed": False},
+        {"$set": {"consumed": True, "consumed_at": datetime.utcnow()}},
+        sort=[("created_at", -1)]
+    )
+
+
+async def count_plans_since(db: AsyncIOMotorDatabase, email: str, source: str, since: datetime) -> int:
+    """Number of plans of one source stored for a user since a point in time"""
+    return await db.diet_plans.count_documents({"email": email, "source": source, "created_at": {"$gte": since}})
@@ -0,0 +1,119 @@
+import logging
+import os
+import re
+from string import Template
+from typing import Dict, Any, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "prompts")
+
+# Separates the fixed system message from the user message template in a prompt file
+USER_MARKER = "\n=== user ===\n"
+
+# Parts of a system message that may be left out when a request would not otherwise fit
+_OPTIONAL_SECTION = re.compile(r"<<optional (\w+)>>\n(.*?)<</optional>>\n?", re.S)
+
+# Per-message overhead added to the text estimate, as in the LLM gateway
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+class PromptTemplate:
+    """A fixed system message plus a user message template holding the request-specific values.
+
+    The system message never contains variables, so every request for a template starts
+    with byte-identical text and the provider can reuse its cached prefix. Sections marked
+    ``<<optional name>>`` in it are only dropped when a request would not fit otherwise.
+    """
+
+    def __init__(self, name: str, system: str, user: str):
+        self.name = name
+        self._system_source = system
+        self.optional_sections = tuple(match.group(1) for match in _OPTIONAL_SECTION.finditer(system))
+        self.system = self.system_without(())
+        self.user = Template(user)
+        self.variables = tuple(self.user.get_identifiers())
+        self.system_tokens = estimate_tokens(system)
+        self.user_template_tokens = estimate_tokens(user)
+
+    def render_user(self, **values: Any) -> str:
+        """User message with the variables filled in; missing variables raise KeyError"""
+        return self.user.substitute({key: "" if value is None else value for key, value in values.items()})
+
+    def render(self, **values: Any) -> List[Dict[str, str]]:
+        """Chat messages for this template: the fixed system message, then the user message"""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.render_user(**values)},
+        ]
+
+    def system_without(self, dropped: Iterable[str]) -> str:
+        """System message with the named optional sections left out"""
+        dropped = set(dropped)
+        return _OPTIONAL_SECTION.sub(lambda match: "" if match.group(1) in dropped else match.group(2), self._system_source)
+
+    def system_within(self, token_limit: int) -> str:
+        """System message within ``token_limit`` estimated tokens, dropping optional sections from the last one up"""
+        system = self.system
+        dropped: List[str] = []
+        remaining = list(self.optional_sections)
+        while estimate_tokens(system) > token_limit and remaining:
+            dropped.append(remaining.pop())
+            system = self.system_without(dropped)
+        if dropped:
+            logger.warning(f"Prompt {self.name} near the context limit; dropped {', '.join(dropped)}")
+        return system
+
+    def render_within(self, token_limit: int, **values: Any) -> List[Dict[str, str]]:
+        """Like render, but drops optional system sections while the prompt exceeds ``token_limit`` estimated tokens"""
+        user = self.render_user(**values)
+        system = self.system_within(token_limit - estimate_tokens(user) - 2 * MESSAGE_OVERHEAD_TOKENS)
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+
+
+def _load_templates(path: str = PROMPTS_DIR) -> Dict[str, PromptTemplate]:
+    templates = {}
+    for filename in sorted(os.listdir(path)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(path, filename), "r", encoding="utf-8") as f:
+            text = f.read()
+        if USER_MARKER not in text:
+            raise ValueError(f"Prompt template {filename} has no user section")
+        system, user = text.split(USER_MARKER, 1)
+        name = filename[:-len(".txt")]
+        templates[name] = PromptTemplate(name, system.rstrip("\n"), user.rstrip("\n"))
+    return templates
+
+
+# Compiled once at import so every request reuses the same system strings
+TEMPLATES = _load_templates()
+logger.info(
+    "Loaded prompt templates: "
+    + ", ".join(f"{t.name} ({t.system_tokens} system tokens)" for t in TEMPLATES.values())
+)
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Get a compiled prompt template by name"""
+    return TEMPLATES[name]
+
+
+def template_token_counts() -> Dict[str, Dict[str, Any]]:
+    """Estimated token counts of every template's fixed and variable parts"""
+    return {
+        name: {
+            "system_tokens": template.system_tokens,
+            "user_template_tokens": template.user_template_tokens,
+            "variables": list(template.variables),
+        }
+        for name, template in TEMPLATES.items()
+    }
@@ -0,0 +1,193 @@
+import heapq
+import json
+import logging
+import os
+import re
+from typing import Dict, Any, List, Iterable, Optional
+
+import numpy as np
+
+from utils.allergen_validator import resolve_allergy_groups
+
+logger = logging.getLogger(__name__)
+
+RECIPES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "recipes.json")
+
+MACRO_FIELDS = ("calories", "protein", "carbs", "fat")
+MEAL_SLOTS = ("breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner")
+ALLERGENS = ("nuts", "shellfish", "dairy", "eggs", "soy", "wheat", "fish", "sesame")
+DIETS = (
+    "vegetarian", "vegan", "pescatarian", "keto", "paleo", "mediterranean",
+    "low_carb", "gluten_free", "dairy_free", "low_sodium", "high_protein", "balanced"
+)
+
+# Rough "one unit of difference" per macro so distances are comparable across
+# dimensions: 100 kcal is treated like 10 g protein, 15 g carbs or 7 g fat
+MACRO_SCALE = np.array([100.0, 10.0, 15.0, 7.0], dtype=np.float32)
+
+LEAF_SIZE = 8
+
+_LEADING_NUMBER = re.compile(r"\s*(\d+(?:\.\d+)?)")
+
+
+def macro_value(value: Any) -> Optional[float]:
+    """A macro as a number; plans from the model sometimes say "25g" or "350 kcal". None when there is no number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = _LEADING_NUMBER.match(value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def meal_macros(meal: Dict[str, Any]) -> List[Optional[float]]:
+    """The meal's MACRO_FIELDS values, None where missing or unreadable"""
+    return [macro_value(meal.get(field)) for field in MACRO_FIELDS]
+
+
+def _bitmask(values: Iterable[str], vocabulary: tuple) -> int:
+    mask = 0
+    for value in values:
+        if value in vocabulary:
+            mask |= 1 << vocabulary.index(value)
+    return mask
+
+
+def allergen_mask(allergies: Iterable[str]) -> int:
+    """Bitmask of catalogue allergens named in a user's free-text allergy list"""
+    groups = []
+    for allergy in allergies or []:
+        groups.extend(resolve_allergy_groups(allergy))
+    return _bitmask(groups, ALLERGENS)
+
+
+def diet_mask(preferences: Iterable[str]) -> int:
+    """Bitmask of catalogue diets named in a user's dietary preferences"""
+    return _bitmask((p.strip().lower() for p in preferences or []), DIETS)
+
+
+class MacroKDTree:
+    """Static KD-tree over a point array, stored as a permutation of row indices.
+
+    Each subrange ``[lo, hi)`` of ``order`` is a node whose median row sits at
+    ``(lo + hi) // 2`` and splits on ``split_dim`` of that position.
+    """
+
+    def __init__(self, points: np.ndarray):
+        self.points = points
+        self.order = np.arange(len(points), dtype=np.int32)
+        self.split_dim = np.zeros(len(points), dtype=np.int8)
+        self._build(0, len(points))
+
+    def _build(self, lo: int, hi: int):
+        if hi - lo <= LEAF_SIZE:
+            return
+        rows = self.order[lo:hi]
+        dim = int(np.argmax(np.ptp(self.points[rows], axis=0)))
+        mid = (hi - lo) // 2
+        partitioned = rows[np.argpartition(self.points[rows, dim], mid)]
+        self.order[lo:hi] = partitioned
+        self.split_dim[lo + mid] = dim
+        self._build(lo, lo + mid)
+        self._build(lo + mid + 1, hi)
+
+    def query(self, point: np.ndarray, k: int, allowed: np.ndarray) -> List[tuple]:
+        """Return up to ``k`` (distance, row) pairs nearest to ``point`` among ``allowed`` rows"""
+        heap: List[tuple] = []  # max-heap of (-squared distance, row)
+
+        def consider(rows: np.ndarray):
+            rows = rows[allowed[rows]]
+            if not len(rows):
+                return
+            dists = ((self.points[rows] - point) ** 2).sum(axis=1)
+            for dist, row in zip(dists.tolist(), rows.tolist()):
+                if len(heap) < k:
+                    heapq.heappush(heap, (-dist, row))
+                elif dist < -heap[0][0]:
+                    heapq.heapreplace(heap, (-dist, row))
+
+        def search(lo: int, hi: int):
+            if hi - lo <= LEAF_SIZE:
+                consider(self.order[lo:hi])
+                return
+            mid = (lo + hi) // 2
+            dim = self.split_dim[mid]
+            consider(self.order[mid:mid + 1])
+            diff = float(point[dim] - self.points[self.order[mid], dim])
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            search(*near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                search(*far)
+
+        if k > 0 and len(self.points):
+            search(0, len(self.points))
+        return sorted((float(np.sqrt(-d)), row) for d, row in heap)
+
+
+class RecipeCatalogue:
+    """Recipe records plus column arrays used for filtering and the macro index"""
+
+    def __init__(self, recipes: List[Dict[str, Any]]):
+        self.records = [
+            {key: value for key, value in recipe.items() if key not in ("meal_types", "allergens", "diets")}
+            for recipe in recipes
+        ]
+        self.names = np.array([recipe["name"].lower() for recipe in recipes])
+        self.macros = np.array(
+            [[float(recipe.get(field, 0) or 0) for field in MACRO_FIELDS] for recipe in recipes],
+            dtype=np.float32
+        ).reshape(-1, len(MACRO_FIELDS))
+        self.slot_mask = np.array([_bitmask(r.get("meal_types", []), MEAL_SLOTS) for r in recipes], dtype=np.uint8)
+        self.allergen_mask = np.array([_bitmask(r.get("allergens", []), ALLERGENS) for r in recipes], dtype=np.uint16)
+        self.diet_mask = np.array([_bitmask(r.get("diets", []), DIETS) for r in recipes], dtype=np.uint16)
+        self.tree = MacroKDTree(self.macros / MACRO_SCALE)
+
+    @classmethod
+    def from_file(cls, path: str = RECIPES_PATH) -> "RecipeCatalogue":
+        with open(path, "r", encoding="utf-8") as f:
+            recipes = json.load(f)["recipes"]
+        logger.info(f"Loaded {len(recipes)} recipes into the swap index")
+        return cls(recipes)
+
+    def __len__(self):
+        return len(self.records)
+
+    def nearest(
+        self,
+        meal: Dict[str, Any],
+        k: int = 5,
+        meal_type: Optional[str] = None,
+        allergies: Iterable[str] = (),
+        preferences: Iterable[str] = (),
+        exclude_names: Iterable[str] = ()
+    ) -> List[Dict[str, Any]]:
+        """Return the ``k`` catalogue meals closest to ``meal`` in macro space that pass the filters"""
+        allowed = (self.allergen_mask & allergen_mask(allergies)) == 0
+        wanted_diets = diet_mask(preferences)
+        if wanted_diets:
+            allowed &= (self.diet_mask & wanted_diets) == wanted_diets
+        if meal_type in MEAL_SLOTS:
+            allowed &= (self.slot_mask & (1 << MEAL_SLOTS.index(meal_type))) != 0
+        excluded = [name.lower() for name in exclude_names if name]
+        if meal.get("name"):
+            excluded.append(meal["name"].lower())
+        if excluded:
+            allowed &= ~np.isin(self.names, excluded)
+
+        point = np.array([value or 0 for value in meal_macros(meal)], dtype=np.float32) / MACRO_SCALE
+        return [
+            {**self.records[row], "distance": round(distance, 3)}
+            for distance, row in self.tree.query(point, k, allowed)
+        ]
+
+
+_catalogue: Optional[RecipeCatalogue] = None
+
+
+def get_recipe_catalogue() -> RecipeCatalogue:
+    """Get the shared recipe catalogue, loading it on first use"""
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = RecipeCatalogue.from_file()
+    return _catalogue
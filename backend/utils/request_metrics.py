@@ -0,0 +1,347 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from starlette.responses import Response
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.db_monitoring import RequestQueries, finish_request_queries, start_request_queries
+
+logger = logging.getLogger(__name__)
+
+# With several uvicorn workers, point this at a directory every worker shares and that is
+# emptied before they start; each worker writes its figures there and /metrics adds them up
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+SNAPSHOT_SECONDS = float(os.getenv("REQUEST_METRICS_SNAPSHOT_SECONDS", "1"))
+
+# Request latency buckets in seconds; LLM-backed routes take up to a minute
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# MongoDB commands per request; a route whose requests land in the top buckets probably loops over queries
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+# Resolved path -> route template; cleared when full so ids in paths cannot grow it without bound
+ROUTE_CACHE_SIZE = 4096
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RouteResolver:
+    """Maps request paths to the route template they match, e.g. /api/jobs/{job_id}"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self._static: Optional[Dict[str, str]] = None
+        self._dynamic = []
+        self._cache: Dict[str, str] = {}
+
+    def _build(self):
+        self._static = {}
+        for route in self.routes:
+            if not isinstance(route, BaseRoute) or not hasattr(route, "path_regex"):
+                continue
+            if route.param_convertors:
+                self._dynamic.append((route.path_regex, route.path))
+            else:
+                self._static[route.path] = route.path
+
+    def resolve(self, path: str) -> str:
+        template = self._cache.get(path)
+        if template is not None:
+            return template
+        if self._static is None:
+            self._build()
+        template = self._static.get(path)
+        if template is None:
+            template = next((t for regex, t in self._dynamic if regex.match(path)), UNMATCHED_ROUTE)
+        if len(self._cache) >= ROUTE_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[path] = template
+        return template
+
+
+class RouteSeries:
+    """In-flight count, latency histogram and database use for one method and route"""
+
+    __slots__ = ("in_progress", "buckets", "sum", "query_buckets", "db_commands", "db_seconds", "db_documents", "db_collscans")
+
+    def __init__(self):
+        self.in_progress = 0
+        # One slot per bucket bound plus +Inf; counts are per bucket, made cumulative on export
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.query_buckets = [0] * (len(QUERY_COUNT_BUCKETS) + 1)
+        self.db_commands = 0
+        self.db_seconds = 0.0
+        self.db_documents = 0
+        self.db_collscans = 0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def observe_queries(self, queries: RequestQueries):
+        self.query_buckets[bisect_left(QUERY_COUNT_BUCKETS, queries.count)] += 1
+        self.db_commands += queries.count
+        self.db_seconds += queries.seconds
+        self.db_documents += queries.docs
+        self.db_collscans += queries.collscans
+
+    def to_dict(self, live: bool = True) -> Dict[str, Any]:
+        row = {name: getattr(self, name) for name in self.__slots__}
+        if not live:
+            row["in_progress"] = 0
+        return row
+
+
+class RequestStats:
+    """This process's request figures, kept in plain Python numbers.
+
+    Requests are handled on the event loop thread, so no locking is needed, and turning
+    the numbers into Prometheus metrics is left to scrape time.
+    """
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str], RouteSeries] = {}
+        self.statuses: Counter = Counter()
+
+    def route_series(self, method: str, route: str) -> RouteSeries:
+        series = self.series.get((method, route))
+        if series is None:
+            series = self.series[(method, route)] = RouteSeries()
+        return series
+
+    def snapshot(self, live: bool = True) -> Dict[str, List]:
+        return {
+            "series": [
+                {"method": method, "route": route, **series.to_dict(live)}
+                for (method, route), series in self.series.items()
+            ],
+            "statuses": [[method, route, status, count] for (method, route, status), count in self.statuses.items()],
+        }
+
+
+def merge_snapshots(snapshots: List[Dict[str, List]]) -> Dict[str, Dict[Tuple, Any]]:
+    """Add up snapshots from several processes"""
+    series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    statuses: Counter = Counter()
+    for snapshot in snapshots:
+        for row in snapshot["series"]:
+            key = (row["method"], row["route"])
+            if key not in series:
+                series[key] = {name: list(value) if isinstance(value, list) else value for name, value in row.items()}
+                continue
+            merged = series[key]
+            for name, value in row.items():
+                if isinstance(value, list):
+                    merged[name] = [a + b for a, b in zip(merged[name], value)]
+                elif name not in ("method", "route"):
+                    merged[name] += value
+        for method, route, status, count in snapshot["statuses"]:
+            statuses[(method, route, status)] += count
+    return {"series": series, "statuses": statuses}
+
+
+_stats = RequestStats()
+
+
+def get_request_stats() -> RequestStats:
+    return _stats
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(MULTIPROC_DIR, f"requests_{pid}.json")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _collected_snapshots() -> List[Dict[str, List]]:
+    """This process's live figures plus the latest snapshot of every other worker"""
+    snapshots = [_stats.snapshot()]
+    if not MULTIPROC_DIR:
+        return snapshots
+    own_path = _snapshot_path(os.getpid())
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, "requests_*.json")):
+        if path == own_path:
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Requests a crashed worker was handling will never finish
+        if not _pid_alive(int(os.path.basename(path)[len("requests_"):-len(".json")])):
+            for row in snapshot["series"]:
+                row["in_progress"] = 0
+        snapshots.append(snapshot)
+    return snapshots
+
+
+class RequestMetricsCollector:
+    """Exposes the request figures to prometheus_client at scrape time"""
+
+    def collect(self):
+        merged = merge_snapshots(_collected_snapshots())
+        labels = ["method", "route"]
+
+        requests = CounterMetricFamily("http_requests", "HTTP requests handled", labels=labels + ["status"])
+        for (method, route, status), count in sorted(merged["statuses"].items()):
+            requests.add_metric([method, route, str(status)], count)
+
+        latency = HistogramMetricFamily(
+            "http_request_duration_seconds", "Time from request to the end of the response body", labels=labels
+        )
+        in_progress = GaugeMetricFamily("http_requests_in_progress", "HTTP requests being handled", labels=labels)
+        commands_per_request = HistogramMetricFamily(
+            "mongo_commands_per_request", "MongoDB commands sent while handling one request", labels=labels
+        )
+        commands = CounterMetricFamily("mongo_commands", "MongoDB commands sent for requests", labels=labels)
+        db_seconds = CounterMetricFamily(
+            "mongo_command_duration_seconds", "Time requests spent waiting on MongoDB commands", labels=labels
+        )
+        documents = CounterMetricFamily("mongo_documents_returned", "Documents MongoDB returned to requests", labels=labels)
+        collscans = CounterMetricFamily("mongo_collscans", "Request queries whose plan scans a whole collection", labels=labels)
+        for (method, route), row in sorted(merged["series"].items()):
+            latency.add_metric([method, route], _cumulative(LATENCY_BUCKETS, row["buckets"]), row["sum"])
+            in_progress.add_metric([method, route], row["in_progress"])
+            if row["db_commands"] or sum(row["query_buckets"][1:]):
+                commands_per_request.add_metric(
+                    [method, route], _cumulative(QUERY_COUNT_BUCKETS, row["query_buckets"]), row["db_commands"]
+                )
+                commands.add_metric([method, route], row["db_commands"])
+                db_seconds.add_metric([method, route], row["db_seconds"])
+                documents.add_metric([method, route], row["db_documents"])
+                collscans.add_metric([method, route], row["db_collscans"])
+
+        yield requests
+        yield latency
+        yield in_progress
+        yield commands_per_request
+        yield commands
+        yield db_seconds
+        yield documents
+        yield collscans
+
+
+def _cumulative(bounds, counts) -> List[Tuple[str, int]]:
+    cumulative, seen = [], 0
+    for bound, count in zip([*bounds, "+Inf"], counts):
+        seen += count
+        cumulative.append((str(bound), seen))
+    return cumulative
+
+
+_collector = RequestMetricsCollector()
+REGISTRY.register(_collector)
+
+
+class RequestMetricsMiddleware:
+    """Counts requests and times them per route template, status code and method.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streamed responses pass
+    through untouched and are timed until their last chunk.
+    """
+
+    def __init__(self, app: ASGIApp, routes=None, stats: Optional[RequestStats] = None):
+        self.app = app
+        self._routes = routes
+        self._resolver: Optional[RouteResolver] = None
+        self.stats = stats or _stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self._resolver is None:
+            # Routes are only complete once the app has started, after the middleware was built
+            self._resolver = RouteResolver(self._routes if self._routes is not None else scope["app"].routes)
+        method = scope["method"]
+        route = self._resolver.resolve(scope["path"])
+        series = self.stats.route_series(method, route)
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        series.in_progress += 1
+        queries_token = start_request_queries(route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            series.observe(time.perf_counter() - started)
+            series.in_progress -= 1
+            queries = finish_request_queries(queries_token)
+            if queries is not None:
+                series.observe_queries(queries)
+            self.stats.statuses[(method, route, status_code)] += 1
+
+
+def metrics_response() -> Response:
+    """Current metrics in the Prometheus text format, summed over all workers in multiprocess mode"""
+    if MULTIPROC_DIR:
+        # Process-level collectors would only describe the worker that happened to serve the scrape
+        registry = CollectorRegistry()
+        registry.register(_collector)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def write_snapshot(live: bool = True):
+    """Write this worker's figures where the other workers' /metrics can read them"""
+    path = _snapshot_path(os.getpid())
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(_stats.snapshot(live), f)
+    os.replace(f"{path}.tmp", path)
+
+
+_snapshot_task: Optional[asyncio.Task] = None
+
+
+async def _snapshot_loop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_SECONDS)
+        try:
+            write_snapshot()
+        except OSError as e:
+            logger.error(f"Error writing request metrics snapshot: {str(e)}")
+
+
+def start_snapshots():
+    """Share this worker's figures every SNAPSHOT_SECONDS when running in multiprocess mode"""
+    global _snapshot_task
+    if MULTIPROC_DIR and _snapshot_task is None:
+        _snapshot_task = asyncio.create_task(_snapshot_loop())
+
+
+def stop_snapshots():
+    """Write the final figures, with nothing in flight, so the worker's counts outlive it"""
+    global _snapshot_task
+    if _snapshot_task is None:
+        return
+    _snapshot_task.cancel()
+    _snapshot_task = None
+    try:
+        write_snapshot(live=False)
+    except OSError as e:
+        logger.error(f"Error writing request metrics snapshot: {str(e)}")
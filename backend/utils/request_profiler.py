@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Set
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database.config import get_database
+from utils.request_metrics import RouteResolver
+from utils.security import SECRET_KEY
+
+logger = logging.getLogger(__name__)
+
+# The middleware is only installed when this is on, so requests pay nothing otherwise
+PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "false").lower() == "true"
+# Share of requests profiled without a signed header, e.g. 0.001
+SAMPLE_RATE = float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0"))
+SAMPLE_INTERVAL_MS = float(os.getenv("REQUEST_PROFILING_INTERVAL_MS", "5"))
+# Stop sampling long requests and streams after this long
+MAX_PROFILE_SECONDS = float(os.getenv("REQUEST_PROFILING_MAX_SECONDS", "60"))
+RETENTION_DAYS = int(os.getenv("REQUEST_PROFILING_RETENTION_DAYS", "7"))
+
+TOKEN_HEADER = "x-profile-token"
+REQUEST_ID_HEADER = "x-request-id"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_token(minutes: int = 15) -> str:
+    """A token that turns on profiling for requests carrying it until it expires"""
+    expires = int(time.time()) + minutes * 60
+    return f"{expires}.{_signature(expires)}"
+
+
+def verify_profile_token(token: Optional[str]) -> bool:
+    if not token or "." not in token:
+        return False
+    expires, signature = token.split(".", 1)
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(int(expires)))
+
+
+def _signature(expires: int) -> str:
+    return hmac.new(SECRET_KEY.encode("utf-8"), f"profile:{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(BACKEND_DIR):
+        path = os.path.relpath(path, BACKEND_DIR)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's call stack on a timer and counts identical stacks.
+
+    The result is in the folded format flamegraph.pl and speedscope read. Sampling the
+    event loop thread shows whatever it runs, so requests handled at the same time as the
+    profiled one appear too, and time spent waiting on I/O shows up under select.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float = SAMPLE_INTERVAL_MS, max_seconds: float = MAX_PROFILE_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.max_samples = int(max_seconds / self.interval)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and self.samples < self.max_samples:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class RequestProfilerMiddleware:
+    """Profiles requests that carry a valid X-Profile-Token header, or a random SAMPLE_RATE share.
+
+    One request per process is profiled at a time; others pass straight through. The
+    profile is saved to the request_profiles collection after the response has been sent,
+    keyed by route and request id, and the id is returned in the X-Profile-Id header.
+    """
+
+    def __init__(self, app: ASGIApp, routes=None):
+        self.app = app
+        self._routes = routes
+        self._resolver: Optional[RouteResolver] = None
+        self._busy = False
+        self._saving: Set[asyncio.Task] = set()
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        token_header = TOKEN_HEADER.encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == token_header:
+                return "token" if verify_profile_token(value.decode("latin-1")) else None
+        if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self._resolver is None:
+            self._resolver = RouteResolver(self._routes if self._routes is not None else scope["app"].routes)
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER.encode("latin-1"), b"").decode("latin-1") or uuid.uuid4().hex
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", request_id)
+            await send(message)
+
+        self._busy = True
+        sampler = StackSampler(threading.get_ident())
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            self._busy = False
+            profile = {
+                "request_id": request_id,
+                "method": scope["method"],
+                "route": self._resolver.resolve(scope["path"]),
+                "path": scope["path"],
+                "status": status_code,
+                "trigger": trigger,
+                "started_at": started_at,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "interval_ms": SAMPLE_INTERVAL_MS,
+                "samples": sampler.samples,
+                "folded": sampler.folded(),
+                "expires_at": started_at + timedelta(days=RETENTION_DAYS),
+            }
+            task = asyncio.create_task(save_profile(profile))
+            self._saving.add(task)
+            task.add_done_callback(self._saving.discard)
+
+
+_indexed = False
+
+
+async def save_profile(profile: Dict[str, Any]):
+    global _indexed
+    try:
+        db = get_database()
+        if not _indexed:
+            await db.request_profiles.create_index([("route", 1), ("started_at", -1)])
+            await db.request_profiles.create_index("request_id")
+            await db.request_profiles.create_index("expires_at", expireAfterSeconds=0)
+            _indexed = True
+        await db.request_profiles.insert_one(profile)
+        logger.info(
+            f"Profiled {profile['method']} {profile['route']} ({profile['duration_ms']} ms, "
+            f"{profile['samples']} samples) as {profile['request_id']}"
+        )
+    except Exception as e:
+        logger.error(f"Error saving request profile {profile['request_id']}: {str(e)}")
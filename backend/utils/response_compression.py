@@ -0,0 +1,93 @@
+"""Gzip and Brotli compression for large responses, chosen from the request's Accept-Encoding."""
+import gzip
+import os
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.response_encoding import parse_accept
+
+COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true"
+# Smaller bodies go out as they are; compressing them saves less than the header overhead and CPU it costs
+COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_GZIP_LEVEL", "6"))
+# 11 is meant for static files; 4-6 compresses better than gzip at a similar cost
+BROTLI_QUALITY = int(os.getenv("RESPONSE_COMPRESSION_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/cbor", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """"br" or "gzip", whichever the client rates higher (Brotli on a tie), else "".
+
+    Codings the header does not name take the rating of "*"; q=0 refuses a coding even when "*" allows it.
+    """
+    ratings = {}
+    for coding, q in parse_accept(accept_encoding):
+        ratings.setdefault(coding, q)
+    wildcard = ratings.get("*", 0.0)
+    best, best_q = "", 0.0
+    for coding in ("br", "gzip"):
+        q = ratings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress complete responses of compressible types above COMPRESSION_MIN_BYTES.
+
+    Only responses that declare a Content-Length are held back to be compressed; event streams and
+    other streamed responses (chat, job events) pass through as soon as they start.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                content_type = headers.get("content-type", "")
+                length = headers.get("content-length")
+                candidate = (content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith("text/event-stream")
+                             and length is not None and "content-encoding" not in headers)
+                if candidate:
+                    # Even when this client gets it uncompressed, so caches keep the variants apart
+                    headers.add_vary_header("Accept-Encoding")
+                if candidate and encoding and int(length) >= COMPRESSION_MIN_BYTES:
+                    start_message = message
+                    return
+                passthrough = True
+                await send(message)
+                return
+            passthrough = True
+            body = message.get("body", b"")
+            if not message.get("more_body", False):
+                body = compress(body, encoding)
+                headers = MutableHeaders(scope=start_message)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
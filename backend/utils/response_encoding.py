@@ -0,0 +1,131 @@
+"""Response encoding: JSON, or MessagePack/CBOR when the client asks for it, plus precompiled serializers for hot endpoints.
+
+With FAST_RESPONSES on, JSON is encoded with orjson, and handlers that use a ResponseSerializer
+return their raw documents validated and encoded in one pass by pydantic-core, instead of FastAPI
+validating them against response_model again and encoding them through jsonable_encoder.
+
+ContentNegotiationMiddleware picks the body format from the Accept header for the whole request;
+both the default response class and ResponseSerializer encode with it. Error responses stay JSON.
+"""
+import json
+import os
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Tuple
+
+import cbor2
+import msgpack
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() == "true"
+
+JSON_MEDIA_TYPE = "application/json"
+# Binary formats take the same JSON-compatible data as JSON, so dates are ISO strings in every format
+BINARY_ENCODERS: Dict[str, Callable[[Any], bytes]] = {
+    "application/msgpack": msgpack.packb,
+    "application/cbor": cbor2.dumps,
+}
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": "application/msgpack", "application/vnd.msgpack": "application/msgpack"}
+
+_response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON_MEDIA_TYPE)
+
+
+def parse_accept(header: str) -> List[Tuple[str, float]]:
+    """Accept-style header -> [(lower-cased value, q), ...] in the order given"""
+    choices = []
+    for part in header.split(","):
+        value, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        choices.append((value.strip().lower(), q))
+    return choices
+
+
+def negotiate(accept: str) -> str:
+    """The media type to answer an Accept header with: the best-rated of JSON and the binary formats, JSON by default"""
+    best, best_q = JSON_MEDIA_TYPE, 0.0
+    for media_type, q in parse_accept(accept):
+        media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+        # Ties go to the type listed first
+        if (media_type == JSON_MEDIA_TYPE or media_type in BINARY_ENCODERS) and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def encode(data: Any, media_type: str) -> bytes:
+    """Encode JSON-compatible ``data`` in the given format"""
+    if media_type in BINARY_ENCODERS:
+        return BINARY_ENCODERS[media_type](data)
+    if FAST_RESPONSES:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    # What JSONResponse does
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class DefaultResponse(JSONResponse):
+    """The app's default_response_class: JSON, or the format the request negotiated"""
+
+    def render(self, content: Any) -> bytes:
+        media_type = _response_media_type.get()
+        if media_type != JSON_MEDIA_TYPE:
+            self.media_type = media_type
+        return encode(content, media_type)
+
+
+class ContentNegotiationMiddleware:
+    """Choose the response format from the Accept header for the rest of the request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = b""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value
+                break
+        media_type = negotiate(accept.decode("latin-1")) if accept else JSON_MEDIA_TYPE
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).add_vary_header("Accept")
+            await send(message)
+
+        token = _response_media_type.set(media_type)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _response_media_type.reset(token)
+
+
+class ResponseSerializer:
+    """A response shape compiled once, for turning documents into response bodies without model instances"""
+
+    def __init__(self, response_type: Any):
+        self.adapter = TypeAdapter(response_type)
+
+    def dump(self, data: Any, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+        """Validate ``data`` (dicts are fine) against the shape and encode it"""
+        value = self.adapter.validate_python(data)
+        if media_type in BINARY_ENCODERS:
+            return BINARY_ENCODERS[media_type](self.adapter.dump_python(value, mode="json"))
+        return self.adapter.dump_json(value)
+
+    def respond(self, data: Any) -> Any:
+        """The encoded response on the fast path; otherwise ``data`` itself, for FastAPI to check against response_model"""
+        if not FAST_RESPONSES:
+            return data
+        media_type = _response_media_type.get()
+        return Response(content=self.dump(data, media_type), media_type=media_type)
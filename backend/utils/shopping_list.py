@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import re
+from typing import Dict, Any, List, NamedTuple, Optional
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "ingredient_lexicon.json")
+
+CATEGORY_ORDER = ("proteins", "vegetables", "fruits", "grains", "dairy", "others")
+
+UNICODE_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅛": 0.125}
+
+_QUANTITY = re.compile(
+    r"^(?P<qty>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?(?:\s*(?:-|to)\s*\d+(?:\.\d+)?)?|[½⅓⅔¼¾⅛])\s*(?P<rest>.*)$"
+)
+_PARENTHESES = re.compile(r"\([^)]*\)")
+_TRAILING_NOTES = re.compile(r"\b(?:to taste|for garnish|for serving|optional|as needed)\b.*$")
+_WORD = re.compile(r"[a-z][a-z\-']*")
+
+
+class ParsedIngredient(NamedTuple):
+    name: str
+    amount: Optional[float]  # in the dimension's base unit (g, ml or count)
+    dimension: str           # "mass", "volume", "count" or a countable unit such as "slice"
+
+
+def _load_lexicon(path: str = LEXICON_PATH) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        lexicon = json.load(f)
+
+    unit_aliases = {}
+    for unit in lexicon["units"].values():
+        for alias in unit["aliases"]:
+            unit_aliases[alias] = (unit["dimension"], float(unit["factor"]))
+
+    keyword_categories = [
+        (keyword, category)
+        for category, keywords in lexicon["categories"].items()
+        for keyword in keywords
+    ]
+    # Longest keyword wins so "sweet potato" is matched before "potato"
+    keyword_categories.sort(key=lambda item: len(item[0]), reverse=True)
+
+    return {
+        "units": unit_aliases,
+        "descriptors": frozenset(lexicon["descriptors"]),
+        "synonyms": lexicon["synonyms"],
+        "plural_exceptions": frozenset(lexicon["plural_exceptions"]),
+        "keywords": [(re.compile(rf"\b{re.escape(k)}(?:e?s)?\b"), c) for k, c in keyword_categories],
+        "overrides": lexicon["category_overrides"],
+        "default_category": lexicon["default_category"],
+        "excluded": frozenset(lexicon.get("excluded", [])),
+    }
+
+
+_LEXICON = _load_lexicon()
+
+
+def _parse_quantity(text: str) -> float:
+    text = text.strip()
+    if text in UNICODE_FRACTIONS:
+        return UNICODE_FRACTIONS[text]
+    range_parts = re.split(r"\s*(?:-|to)\s*", text)
+    if len(range_parts) == 2:
+        # Buy for the upper end of a range such as "2-3"
+        return float(range_parts[1])
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += float(numerator) / float(denominator) if float(denominator) else 0.0
+        else:
+            total += float(part)
+    return total
+
+
+def _singular(word: str) -> str:
+    if word in _LEXICON["plural_exceptions"] or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "oes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(text: str) -> str:
+    """Canonical ingredient name: lowercase, no descriptors, singular, synonyms resolved"""
+    words = [w for w in _WORD.findall(text.lower()) if w not in _LEXICON["descriptors"]]
+    if not words:
+        return text.strip().lower()
+    name = " ".join(words)
+    if name in _LEXICON["plural_exceptions"]:
+        return _LEXICON["synonyms"].get(name, name)
+    words[-1] = _singular(words[-1])
+    name = " ".join(words)
+    return _LEXICON["synonyms"].get(name, name)
+
+
+def parse_ingredient(text: str) -> ParsedIngredient:
+    """Split an ingredient string such as "1/2 cup rolled oats" into name, amount and dimension"""
+    cleaned = _PARENTHESES.sub(" ", text.replace(" ", " ")).strip().lower()
+    cleaned = cleaned.split(",")[0]
+    cleaned = _TRAILING_NOTES.sub("", cleaned).strip()
+    # "1½ cups" -> "1 ½ cups"
+    cleaned = re.sub(r"(\d)([½⅓⅔¼¾⅛])", r"\1 \2", cleaned)
+
+    amount = None
+    dimension = "count"
+    match = _QUANTITY.match(cleaned)
+    if match:
+        quantity = match.group("qty")
+        rest = match.group("rest")
+        # Mixed unicode fraction such as "1 ½"
+        extra = re.match(r"^([½⅓⅔¼¾⅛])\s*(.*)$", rest)
+        if extra:
+            amount = _parse_quantity(quantity) + UNICODE_FRACTIONS[extra.group(1)]
+            rest = extra.group(2)
+        else:
+            amount = _parse_quantity(quantity)
+        cleaned = rest
+
+        tokens = cleaned.split(None, 1)
+        if tokens:
+            unit = tokens[0].rstrip(".")
+            if unit in _LEXICON["units"]:
+                dimension, factor = _LEXICON["units"][unit]
+                amount *= factor
+                cleaned = tokens[1] if len(tokens) > 1 else ""
+            elif len(tokens) > 1:
+                # Unit written after the name, as in "2 garlic cloves"
+                head, _, last = cleaned.rpartition(" ")
+                if last in _LEXICON["units"] and _LEXICON["units"][last][0] not in ("mass", "volume"):
+                    dimension, factor = _LEXICON["units"][last]
+                    amount *= factor
+                    cleaned = head
+
+    return ParsedIngredient(normalize_name(cleaned), amount, dimension)
+
+
+def categorize(name: str) -> str:
+    """Shopping list category for a normalized ingredient name"""
+    if name in _LEXICON["overrides"]:
+        return _LEXICON["overrides"][name]
+    for pattern, category in _LEXICON["keywords"]:
+        if pattern.search(name):
+            return category
+    return _LEXICON["default_category"]
+
+
+def _plural(word: str) -> str:
+    if word.endswith("s"):
+        return word
+    if word.endswith("y") and word[-2:-1] not in "aeiou":
+        return word[:-1] + "ies"
+    if word.endswith(("tomato", "potato", "ch", "sh")):
+        return word + "es"
+    return word + "s"
+
+
+def _round_fraction(value: float, step: float) -> str:
+    rounded = max(step, round(value / step) * step)
+    whole = int(rounded)
+    fraction = rounded - whole
+    fractions = {0.25: "1/4", 0.5: "1/2", 0.75: "3/4"}
+    if fraction < 1e-9:
+        return str(whole)
+    text = fractions.get(round(fraction, 2), f"{fraction:.2f}")
+    return f"{whole} {text}" if whole else text
+
+
+def format_amount(amount: float, dimension: str) -> str:
+    """Human-friendly quantity for a merged amount in base units"""
+    if dimension == "mass":
+        if amount >= 1000:
+            return f"{amount / 1000:.1f} kg"
+        return f"{int(math.ceil(amount / 5) * 5)} g"
+    if dimension == "volume":
+        if amount >= 2000:
+            return f"{amount / 1000:.1f} l"
+        if amount >= 60:
+            cups = _round_fraction(amount / 240, 0.25)
+            return f"{cups} cup" if cups in ("1", "1/4", "1/2", "3/4") else f"{cups} cups"
+        if amount >= 15:
+            return f"{_round_fraction(amount / 15, 0.5)} tbsp"
+        return f"{_round_fraction(amount / 5, 0.25)} tsp"
+    count = int(math.ceil(amount - 1e-9))
+    if dimension == "count":
+        return str(count)
+    return f"{count} {dimension if count == 1 else _plural(dimension)}"
+
+
+def build_shopping_list(weekly_plan: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Aggregate every meal ingredient in a weekly plan into a categorized shopping list"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for day in weekly_plan or []:
+        meals = day.get("meals", {}) if isinstance(day, dict) else {}
+        for meal in meals.values():
+            if not isinstance(meal, dict):
+                continue
+            for ingredient in meal.get("ingredients", []):
+                if not isinstance(ingredient, str) or not ingredient.strip():
+                    continue
+                parsed = parse_ingredient(ingredient)
+                if not parsed.name or parsed.name in _LEXICON["excluded"]:
+                    continue
+                amounts = totals.setdefault(parsed.name, {})
+                if parsed.amount is not None:
+                    amounts[parsed.dimension] = amounts.get(parsed.dimension, 0.0) + parsed.amount
+
+    shopping_list: Dict[str, List[str]] = {}
+    for name in sorted(totals):
+        amounts = totals[name]
+        if not amounts:
+            item = name
+        elif list(amounts) == ["count"]:
+            count = int(math.ceil(amounts["count"] - 1e-9))
+            item = f"{count} {name if count == 1 else _plural(name)}"
+        elif len(amounts) == 1:
+            dimension, amount = next(iter(amounts.items()))
+            item = f"{format_amount(amount, dimension)} {name}"
+        else:
+            item = f"{name} ({' + '.join(format_amount(a, d) for d, a in amounts.items())})"
+        shopping_list.setdefault(categorize(name), []).append(item)
+
+    return {category: shopping_list[category] for category in CATEGORY_ORDER if category in shopping_list}
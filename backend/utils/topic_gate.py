@@ -0,0 +1,162 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Any, Iterable, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+LEXICON_PATH = os.path.join(DATA_DIR, "topic_gate.json")
+SAMPLES_PATH = os.path.join(DATA_DIR, "topic_gate_samples.jsonl")
+
+ON_TOPIC, OFF_TOPIC, SMALL_TALK = "on_topic", "off_topic", "small_talk"
+# Junk that never reaches the LLM, whatever the conversation so far
+EMPTY, GIBBERISH, SPAM, ABUSE = "empty", "gibberish", "spam", "abuse"
+LABELS = (ON_TOPIC, OFF_TOPIC, SMALL_TALK, EMPTY, GIBBERISH, SPAM, ABUSE)
+
+# Messages whose off-topic score beats the on-topic score by this margin are answered locally
+OFF_TOPIC_MARGIN = float(os.getenv("TOPIC_GATE_MARGIN", "0"))
+
+# Letters in a message of at least this many with less entropy than this are a run like "aaaa" or "hahaha"
+MIN_ENTROPY_LETTERS = 4
+MIN_LETTER_ENTROPY = float(os.getenv("TOPIC_GATE_MIN_ENTROPY", "1.5"))
+# Share of longer words that look like keyboard mashing for a message without nutrition terms to be gibberish
+GIBBERISH_WORD_SHARE = 0.5
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_URL = re.compile(r"https?://|www\.|\b[a-z0-9-]+\.(?:com|net|org|info|biz|ru|xyz|top|io|ly|co)\b", re.IGNORECASE)
+# No vowels at all, or runs of consonants or vowels no English word has
+_MASHED_WORD = re.compile(r"^[^aeiouy]+$|[^aeiouy]{5,}|[aeiou]{4,}")
+
+
+class GateDecision(NamedTuple):
+    label: str
+    on_score: float
+    off_score: float
+    response: str = None
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def _grams(text: str) -> List[str]:
+    tokens = [_stem(t) for t in _TOKEN.findall(text.lower().replace("'", ""))]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _load_lexicon(path: str = LEXICON_PATH) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        lexicon = json.load(f)
+
+    def stemmed(weights: Dict[str, float]) -> Dict[str, float]:
+        return {" ".join(_stem(w) for w in term.split()): weight for term, weight in weights.items()}
+
+    return {
+        "on_topic": stemmed(lexicon["on_topic"]),
+        "off_topic": stemmed(lexicon["off_topic"]),
+        "small_talk": frozenset(" ".join(_TOKEN.findall(p.lower().replace("'", ""))) for p in lexicon["small_talk"]),
+        "abuse": frozenset(" ".join(_stem(w) for w in term.split()) for term in lexicon["abuse"]),
+        "spam": frozenset(" ".join(_stem(w) for w in term.split()) for term in lexicon["spam"]),
+        "responses": lexicon["responses"],
+    }
+
+
+# Compiled once at import
+_LEXICON = _load_lexicon()
+
+# Decisions made on live traffic, by label
+decision_counts: Counter = Counter()
+
+
+def score(text: str) -> Tuple[float, float]:
+    """Summed on-topic and off-topic weights of the unigrams and bigrams in a message"""
+    grams = _grams(text)
+    on = sum(_LEXICON["on_topic"].get(g, 0) for g in grams)
+    off = sum(_LEXICON["off_topic"].get(g, 0) for g in grams)
+    return on, off
+
+
+def _letter_entropy(text: str) -> float:
+    letters = [c for c in text.lower() if c.isalpha()]
+    counts = Counter(letters)
+    return -sum(n / len(letters) * math.log2(n / len(letters)) for n in counts.values()) if letters else 0.0
+
+
+def is_gibberish(text: str) -> bool:
+    """Repeated characters or keyboard mashing rather than words"""
+    letters = sum(c.isalpha() for c in text)
+    if letters >= MIN_ENTROPY_LETTERS and _letter_entropy(text) < MIN_LETTER_ENTROPY:
+        return True
+    words = [w for w in re.findall(r"[a-z]+", text.lower()) if len(w) >= 4]
+    return bool(words) and sum(bool(_MASHED_WORD.search(w)) for w in words) / len(words) >= GIBBERISH_WORD_SHARE
+
+
+def classify(text: str, has_history: bool = False) -> GateDecision:
+    """Decide whether a message should reach the LLM.
+
+    Messages without any signal are let through: a missed off-topic question only costs
+    one LLM call, while a blocked nutrition question fails the user. Links, abuse, spam words
+    and gibberish are only caught in messages without nutrition terms, so "is it dumb to skip
+    breakfast" or a question about a linked sodium study still gets answered.
+    """
+    if not _TOKEN.search(text.lower()):
+        return GateDecision(EMPTY, 0, 0, _LEXICON["responses"][EMPTY])
+    on, off = score(text)
+    grams = set(_grams(text))
+    if on == 0 and (_URL.search(text) or grams & _LEXICON["spam"]):
+        return GateDecision(SPAM, on, off, _LEXICON["responses"][SPAM])
+    if on == 0 and grams & _LEXICON["abuse"]:
+        return GateDecision(ABUSE, on, off, _LEXICON["responses"][ABUSE])
+    normalized = " ".join(_TOKEN.findall(text.lower().replace("'", "")))
+    if on == 0 and normalized in _LEXICON["small_talk"] and not has_history:
+        return GateDecision(SMALL_TALK, on, off, _LEXICON["responses"][SMALL_TALK])
+    if off > on + OFF_TOPIC_MARGIN:
+        return GateDecision(OFF_TOPIC, on, off, _LEXICON["responses"][OFF_TOPIC])
+    if on == 0 and is_gibberish(text):
+        return GateDecision(GIBBERISH, on, off, _LEXICON["responses"][GIBBERISH])
+    return GateDecision(ON_TOPIC, on, off)
+
+
+def load_samples(path: str = SAMPLES_PATH) -> List[Dict[str, str]]:
+    """Labelled messages bundled for evaluating the gate"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(samples: Iterable[Dict[str, str]]) -> Dict[str, Any]:
+    """Per-label precision and recall of ``classify`` on labelled samples, plus the misclassified ones"""
+    samples = list(samples)
+    labels = LABELS
+    confusion = {expected: {predicted: 0 for predicted in labels} for expected in labels}
+    errors = []
+    for sample in samples:
+        predicted = classify(sample["text"]).label
+        confusion[sample["label"]][predicted] += 1
+        if predicted != sample["label"]:
+            errors.append({"text": sample["text"], "expected": sample["label"], "predicted": predicted})
+
+    metrics = {}
+    for label in labels:
+        true_positive = confusion[label][label]
+        predicted_total = sum(confusion[expected][label] for expected in labels)
+        actual_total = sum(confusion[label].values())
+        metrics[label] = {
+            "precision": round(true_positive / predicted_total, 4) if predicted_total else None,
+            "recall": round(true_positive / actual_total, 4) if actual_total else None,
+            "support": actual_total,
+        }
+    correct = sum(confusion[label][label] for label in labels)
+    return {
+        "accuracy": round(correct / len(samples), 4) if samples else None,
+        "labels": metrics,
+        "confusion": confusion,
+        "errors": errors,
+    }
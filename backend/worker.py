@@ -0,0 +1,45 @@
+"""Run background job workers in their own process, apart from the API.
+
+Usage (from the backend directory):
+    python worker.py [--concurrency 4]
+
+Start the API with JOB_WORKERS_IN_PROCESS=false so LLM-heavy jobs only run here.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from database.config import connect_to_mongo, close_mongo_connection
+from utils.job_worker import JOB_WORKER_CONCURRENCY, start_job_workers, stop_job_workers
+from utils.llm_metrics import start_metrics_flush, stop_metrics_flush
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run(concurrency: int):
+    await connect_to_mongo()
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    start_metrics_flush()
+    await start_job_workers(concurrency)
+    await stopping.wait()
+    logger.info("Stopping job workers")
+    await stop_job_workers()
+    await stop_metrics_flush()
+    await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,7 @@ const NutritionChatbot = ({ onNavigate }: NutritionChatbotProps) => {
   const [inputText, setInputText] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [isTyping, setIsTyping] = useState(false);
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -53,35 +54,76 @@ const NutritionChatbot = ({ onNavigate }: NutritionChatbotProps) => {
     setIsTyping(true);
 
     try {
-      const response = await fetch('http://localhost:8000/api/chatbot/nutrition-advice', {
+      const token = localStorage.getItem('access_token');
+      const response = await fetch('http://localhost:8000/api/chatbot/nutrition-advice/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          // Signed-in users get their own chat budget instead of sharing their network's
+          ...(token ? { 'Authorization': `Bearer ${token}` } : {}),
         },
         body: JSON.stringify({
           message: userMessage,
-          context: "nutrition_diet_health"
+          context: "nutrition_diet_health",
+          session_id: sessionId
         }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        
-        // Simulate typing delay for better UX
-        setTimeout(() => {
-          const botMessage: Message = {
-            id: Date.now().toString(),
-            text: data.response,
-            sender: 'bot',
-            timestamp: new Date()
-          };
-          setMessages(prev => [...prev, botMessage]);
-          setIsTyping(false);
-          setIsLoading(false);
-        }, 1000);
-      } else {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to get response');
       }
+
+      const botMessageId = Date.now().toString();
+      let botText = '';
+      let buffer = '';
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+
+      // Each server-sent event is "event: <name>\ndata: <json>" followed by a blank line
+      const handleEvent = (rawEvent: string) => {
+        const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+        const dataLine = rawEvent.match(/^data: (.*)$/m)?.[1];
+        if (!eventName || !dataLine) return;
+        const data = JSON.parse(dataLine);
+
+        if (eventName === 'session') {
+          setSessionId(data.session_id);
+        } else if (eventName === 'token') {
+          const isFirstToken = botText === '';
+          botText += data.text;
+          if (isFirstToken) {
+            setIsTyping(false);
+            setMessages(prev => [...prev, {
+              id: botMessageId,
+              text: botText,
+              sender: 'bot',
+              timestamp: new Date()
+            }]);
+          } else {
+            const text = botText;
+            setMessages(prev => prev.map(message =>
+              message.id === botMessageId ? { ...message, text } : message
+            ));
+          }
+        } else if (eventName === 'error') {
+          throw new Error(data.detail);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() ?? '';
+        events.forEach(handleEvent);
+      }
+
+      if (!botText) {
+        throw new Error('Empty response');
+      }
+      setIsTyping(false);
+      setIsLoading(false);
     } catch (error) {
       console.error('Chatbot error:', error);
       const errorMessage: Message = {
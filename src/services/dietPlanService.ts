@@ -54,14 +54,8 @@ export interface DietPlan {
     water_glasses: number;
   };
   weekly_plan: DayPlan[];
-  shopping_list: {
-    proteins: string[];
-    vegetables: string[];
-    fruits: string[];
-    grains: string[];
-    dairy: string[];
-    others: string[];
-  };
+  // Categories present depend on the plan's ingredients
+  shopping_list: Partial<Record<'proteins' | 'vegetables' | 'fruits' | 'grains' | 'dairy' | 'others', string[]>>;
   nutrition_tips: string[];
   meal_prep_suggestions: string[];
   user_info?: {
@@ -72,6 +66,19 @@ export interface DietPlan {
   };
 }
 
+export interface JobStatus {
+  job_id: string;
+  type: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  attempts: number;
+  result?: unknown;
+  error?: string | null;
+}
+
+const JOB_POLL_INTERVAL_MS = 2000;
+// Generous, since a job may wait in the queue or be retried before it finishes
+const JOB_TIMEOUT_MS = 5 * 60 * 1000;
+
 class DietPlanService {
   private getAuthHeaders() {
     const token = localStorage.getItem('access_token');
@@ -83,32 +90,46 @@ class DietPlanService {
 
   async generateDietPlan(planData: DietPlanData): Promise<DietPlan> {
     try {
-      const response = await axios.post(
-        `${API_BASE_URL}/dietplan/generate`,
-        planData,
-        {
+      // Generation runs as a background job so a proxy timeout cannot cut it off
+      const submitted = await axios.post(
+        `${API_BASE_URL}/jobs`,
+        { type: 'diet_plan', payload: planData },
+        { headers: this.getAuthHeaders(), timeout: 15000 }
+      );
+      const jobId: string = submitted.data.job_id;
+
+      const deadline = Date.now() + JOB_TIMEOUT_MS;
+      while (Date.now() < deadline) {
+        const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`, {
           headers: this.getAuthHeaders(),
-          timeout: 60000 // 60 second timeout for AI generation
+          timeout: 15000
+        });
+        const job: JobStatus = response.data;
+        if (job.status === 'succeeded') {
+          console.log('Received diet plan from backend:', job.result);
+          return job.result as DietPlan;
         }
-      );
-      
-      // Get the diet plan from response
-      const dietPlan = response.data;
-      console.log('Received diet plan from backend:', dietPlan);
-      
-      return dietPlan;
+        if (job.status === 'failed') {
+          throw new Error(job.error || 'Diet plan generation failed');
+        }
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      }
+      throw new Error('timeout');
     } catch (error) {
       console.error('Error generating diet plan:', error);
       if (axios.isAxiosError(error)) {
         if (error.response?.status === 401 || error.response?.status === 403) {
           throw new Error('Authentication required. Please log in to generate diet plans.');
         }
+        if (error.response?.status === 429) {
+          throw new Error(error.response.data?.detail || 'AI usage limit reached. Please try again later.');
+        }
         if (error.response?.status === 500) {
           throw new Error('AI service temporarily unavailable. Please try again in a few moments.');
         }
-        if (error.code === 'ECONNABORTED') {
-          throw new Error('Request timed out. AI generation is taking longer than expected. Please try again.');
-        }
+      }
+      if (error instanceof Error && error.message === 'timeout') {
+        throw new Error('Request timed out. AI generation is taking longer than expected. Please try again.');
       }
       
       // Re-throw the error instead of returning fallback data